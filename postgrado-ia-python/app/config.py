@@ -19,16 +19,70 @@ class Config:
     
     # Database Settings
     VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./chroma_db")
+    VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "embedded")  # embedded | http | flat
+    FLAT_INDEX_PATH = os.getenv("FLAT_INDEX_PATH", "./flat_index")
+    FLAT_INDEX_QUANTIZATION = os.getenv("FLAT_INDEX_QUANTIZATION", "none")  # none | float16 | int8
+    FLAT_INDEX_RESCORE_FACTOR = int(os.getenv("FLAT_INDEX_RESCORE_FACTOR", 4))  # float32 candidates per result
+    CHROMADB_HOST = os.getenv("CHROMADB_HOST", "localhost")
+    CHROMADB_PORT = int(os.getenv("CHROMADB_PORT", 8000))
+    CHROMADB_SSL = os.getenv("CHROMADB_SSL", "false").lower() == "true"
+    CHROMADB_POOL_SIZE = int(os.getenv("CHROMADB_POOL_SIZE", 10))  # keep-alive connections
+    CHROMADB_CONNECT_TIMEOUT = float(os.getenv("CHROMADB_CONNECT_TIMEOUT", 2))
+    CHROMADB_READ_TIMEOUT = float(os.getenv("CHROMADB_READ_TIMEOUT", 30))
+    CHROMADB_MAX_RETRIES = int(os.getenv("CHROMADB_MAX_RETRIES", 3))
     
     # LLM Settings
     LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4")
     TEMPERATURE = float(os.getenv("TEMPERATURE", 0.3))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", 1000))
     RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", 5))
+    SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", 4))
+    MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", 3000))
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "vector")  # vector | hybrid
+    HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", 20))
+    EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", 0)) or None  # seconds, lexical fallback
+    MMR_ENABLED = os.getenv("MMR_ENABLED", "false").lower() == "true"
+    MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", 0.5))  # 1.0 relevance only, 0.0 diversity only
+    MMR_FETCH_K = int(os.getenv("MMR_FETCH_K", 20))
+    QUERY_COALESCING = os.getenv("QUERY_COALESCING", "true").lower() == "true"  # share identical in-flight queries
+    
+    # Batch Query Settings
+    BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", 50))
+    BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", 4))
+    
+    # Answer Cache Settings
+    ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", 0.05))
+    ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 3600))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+    ANSWER_CACHE_MAX_BYTES = int(os.getenv("ANSWER_CACHE_MAX_BYTES", 52428800))  # 50MB
+    
+    # Embedding Settings
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.db")
+    EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", 10000))
+    CHUNK_EMBEDDING_CACHE_PATH = os.getenv("CHUNK_EMBEDDING_CACHE_PATH", "./cache/chunk_embeddings.db")
+    CHUNK_EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("CHUNK_EMBEDDING_CACHE_MEMORY_ENTRIES", 1000))
     
     # Ingestion Settings
     CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
     CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 1))  # processes parsing PDFs in directory ingestion
+    INGEST_STREAM_BATCH_SIZE = int(os.getenv("INGEST_STREAM_BATCH_SIZE", 256))  # chunks stored at a time while a PDF is read
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 100))  # chunks per embeddings request
+    EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", 50000))
+    EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+    EMBEDDING_RPM = int(os.getenv("EMBEDDING_RPM", 0)) or None  # provider requests/minute, None = unlimited
+    EMBEDDING_TPM = int(os.getenv("EMBEDDING_TPM", 0)) or None  # provider tokens/minute, None = unlimited
+    EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+    INGEST_JOB_WORKERS = int(os.getenv("INGEST_JOB_WORKERS", 2))  # background ingestions at once
+    INGEST_JOBS_DB_PATH = os.getenv("INGEST_JOBS_DB_PATH", "./cache/jobs.db")
+    INGEST_UPLOAD_DIR = os.getenv("INGEST_UPLOAD_DIR", "./cache/uploads")  # files of pending jobs
+    WATCH_DIR = os.getenv("WATCH_DIR")  # folder kept in sync with the knowledge base, None = disabled
+    WATCH_DEBOUNCE_SECONDS = float(os.getenv("WATCH_DEBOUNCE_SECONDS", 2))
+    WATCH_MAX_BATCH_DELAY = float(os.getenv("WATCH_MAX_BATCH_DELAY", 30))
+    WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", 5))  # seconds, when inotify is unavailable
+    WATCH_FORCE_POLLING = os.getenv("WATCH_FORCE_POLLING", "false").lower() == "true"
     
     # API Keys (from environment)
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -2,7 +2,40 @@
 RAG Engine Module - Contains ingestion and query logic
 """
 
-from .ingest import PDFIngestionEngine
+from .answer_cache import SemanticAnswerCache
+from .coalescing import SingleFlight
+from .embedding_cache import CachedDocumentEmbeddings, CachedEmbeddings, EmbeddingCache
+from .embedding_scheduler import EmbeddingScheduler
+from .flat_index import FlatIndex, FlatVectorStore
+from .ingest import IngestTransaction, PDFChunkStream, PDFIngestionEngine
+from .jobs import IngestionJobQueue
+from .lexical_index import BM25Index
+from .metadata_index import MetadataIndex
 from .query import RAGQueryEngine
+from .resources import EngineResources
+from .text_splitter import LinearTextSplitter
+from .vector_backend import PooledSession, create_http_client
+from .watcher import DirectoryWatcher
 
-__all__ = ["PDFIngestionEngine", "RAGQueryEngine"]
+__all__ = [
+    "BM25Index",
+    "CachedDocumentEmbeddings",
+    "CachedEmbeddings",
+    "DirectoryWatcher",
+    "EmbeddingCache",
+    "EmbeddingScheduler",
+    "EngineResources",
+    "FlatIndex",
+    "FlatVectorStore",
+    "IngestTransaction",
+    "IngestionJobQueue",
+    "LinearTextSplitter",
+    "MetadataIndex",
+    "PDFChunkStream",
+    "PDFIngestionEngine",
+    "PooledSession",
+    "RAGQueryEngine",
+    "SemanticAnswerCache",
+    "SingleFlight",
+    "create_http_client",
+]
@@ -0,0 +1,227 @@
+"""
+Semantic Answer Cache - Serves stored answers for semantically equivalent questions
+"""
+
+import copy
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable, Iterable, List, Optional, Set
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """A cached response together with the chunks it was built from."""
+
+    embedding: np.ndarray
+    response: dict
+    sources: Set[str] = field(default_factory=set)
+    chunk_ids: Set[str] = field(default_factory=set)
+    scope: Hashable = ()
+    created_at: float = field(default_factory=time.time)
+    size_bytes: int = 0
+
+
+class SemanticAnswerCache:
+    """
+    LRU/TTL answer cache keyed by the query embedding.
+
+    A lookup returns a stored answer when the new question lies within
+    ``max_distance`` (cosine distance) of a cached question asked within
+    the same scope (e.g. the same metadata filters). Entries are
+    evicted by age, by count and by an approximate memory cap, and are
+    invalidated when the chunks they were built from change.
+    """
+
+    def __init__(
+        self,
+        max_distance: float = 0.05,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 1000,
+        max_bytes: int = 50 * 1024 * 1024
+    ):
+        """
+        Initialize the answer cache.
+
+        Args:
+            max_distance: Maximum cosine distance for a cache hit (0.0-2.0)
+            ttl_seconds: Time to live of an entry in seconds
+            max_entries: Maximum number of cached answers
+            max_bytes: Approximate memory cap for all entries
+        """
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._next_key = 0
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: Iterable[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _remove(self, key: int) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+    def _expire(self, now: float) -> None:
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry.created_at > self.ttl_seconds
+        ]
+        for key in expired:
+            self._remove(key)
+        self.evictions += len(expired)
+
+    def lookup(self, embedding: Iterable[float], scope: Hashable = ()) -> Optional[dict]:
+        """
+        Find a cached answer for a semantically equivalent question.
+
+        Args:
+            embedding: Embedding of the incoming question
+            scope: Scope the question was asked in; only answers stored
+                with the same scope are returned
+
+        Returns:
+            Optional[dict]: Copy of the cached response, or None on a miss
+        """
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._expire(time.time())
+
+            keys = [key for key, entry in self._entries.items() if entry.scope == scope]
+            if not keys:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([self._entries[key].embedding for key in keys])
+            distances = 1.0 - matrix @ query
+            best = int(np.argmin(distances))
+
+            if distances[best] > self.max_distance:
+                self.misses += 1
+                return None
+
+            key = keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self._entries[key].response)
+
+    def store(
+        self,
+        embedding: Iterable[float],
+        response: dict,
+        sources: Iterable[str] = (),
+        chunk_ids: Iterable[str] = (),
+        scope: Hashable = ()
+    ) -> None:
+        """
+        Cache a response.
+
+        Args:
+            embedding: Embedding of the question that produced the response
+            response: Response dict returned by the query engine
+            sources: Source files of the chunks used to build the answer
+            chunk_ids: IDs of the chunks used to build the answer
+            scope: Scope the question was asked in
+        """
+        vector = self._normalize(embedding)
+        size_bytes = vector.nbytes + len(
+            json.dumps(response, ensure_ascii=False, default=str).encode("utf-8")
+        )
+        if size_bytes > self.max_bytes:
+            return
+
+        entry = CachedAnswer(
+            embedding=vector,
+            response=copy.deepcopy(response),
+            sources=set(sources),
+            chunk_ids=set(chunk_ids),
+            scope=scope,
+            size_bytes=size_bytes
+        )
+
+        with self._lock:
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            self._total_bytes += size_bytes
+
+            # Evict least recently used entries beyond the caps
+            while (
+                len(self._entries) > self.max_entries
+                or self._total_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(
+        self,
+        sources: Iterable[str] = (),
+        chunk_ids: Iterable[str] = ()
+    ) -> int:
+        """
+        Drop every answer built from the given sources or chunks.
+
+        Args:
+            sources: Source files whose chunks changed
+            chunk_ids: IDs of chunks that were added, replaced or removed
+
+        Returns:
+            int: Number of invalidated entries
+        """
+        sources = set(sources)
+        chunk_ids = set(chunk_ids)
+
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if entry.sources & sources or entry.chunk_ids & chunk_ids
+            ]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers")
+        return len(stale)
+
+    def on_chunks_changed(self, source: str, chunk_ids: List[str]) -> None:
+        """Ingestion listener: invalidate answers built from a changed file."""
+        self.invalidate(sources=[source], chunk_ids=chunk_ids)
+
+    def clear(self) -> None:
+        """Remove every cached answer."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        """Return cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
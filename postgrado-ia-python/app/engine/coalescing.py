@@ -0,0 +1,117 @@
+"""
+Request Coalescing - Single-flight execution of identical in-flight requests
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """A computation in flight on a worker thread."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+
+
+class SingleFlight:
+    """
+    Shares one in-flight computation among concurrent callers with the same key.
+
+    The first caller for a key (the leader) runs the computation; callers
+    arriving before it finishes wait for it and receive the same result.
+    Nothing is cached once the computation completes.
+    """
+
+    def __init__(self):
+        """Initialize the single-flight group."""
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run ``fn`` once for all concurrent callers with the same key.
+
+        Args:
+            key: Identity of the request
+            fn: Computation to run
+
+        Returns:
+            Any: Result of the shared computation
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await ``factory()`` once for all concurrent callers with the same key.
+
+        The computation runs as its own task, so a cancelled caller (e.g. a
+        client that disconnected) does not cancel it for the others.
+
+        Args:
+            key: Identity of the request
+            factory: Returns the coroutine to run
+
+        Returns:
+            Any: Result of the shared computation
+        """
+        with self._lock:
+            task = self._tasks.get(key)
+            if task is None:
+                task = asyncio.ensure_future(factory())
+                self._tasks[key] = task
+                task.add_done_callback(lambda _: self._forget(key, task))
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+
+    def stats(self) -> dict:
+        """Return coalescing counters."""
+        with self._lock:
+            requests = self.executions + self.coalesced
+            return {
+                "in_flight": len(self._calls) + len(self._tasks),
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "saved_ratio": self.coalesced / requests if requests else 0.0
+            }
@@ -0,0 +1,137 @@
+"""
+Context Packer - Fills a token budget with the most relevant retrieved chunks
+"""
+
+import logging
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import List, Optional
+
+from .retrieval import CONTEXT_SEPARATOR, RetrievedChunk
+
+logger = logging.getLogger(__name__)
+
+# Rough characters-per-token ratio used when no tokenizer is available
+APPROX_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model_name: str):
+    """Load the tiktoken encoding of a model once per process (None if unavailable)."""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model_name)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Tokenizer unavailable for {model_name}, approximating token counts: {e}")
+        return None
+
+
+class TokenCounter:
+    """Counts and truncates text with the model's tokenizer."""
+
+    def __init__(self, model_name: str = "gpt-4"):
+        """
+        Initialize the token counter.
+
+        Args:
+            model_name: LLM model whose tokenizer should be used
+        """
+        self.model_name = model_name
+        self._encoding = _load_encoding(model_name)
+
+    def count(self, text: str) -> int:
+        """Return the number of tokens in a text."""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return (len(text) + APPROX_CHARS_PER_TOKEN - 1) // APPROX_CHARS_PER_TOKEN
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Return the longest prefix of a text that fits in ``max_tokens``."""
+        if self._encoding is not None:
+            return self._encoding.decode(self._encoding.encode(text)[:max_tokens])
+        return text[:max_tokens * APPROX_CHARS_PER_TOKEN]
+
+
+@dataclass
+class PackedContext:
+    """Context selected for the prompt."""
+
+    text: str = ""
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    context_tokens: int = 0
+    truncated: int = 0
+    dropped: int = 0
+
+
+class ContextPacker:
+    """
+    Packs retrieved chunks into a token budget by relevance.
+
+    Chunks are taken in decreasing ``rank_score`` order (the fused score in
+    hybrid retrieval); a chunk that does not fit is truncated to the
+    remaining budget, or dropped when the remainder is too small to be
+    useful. ``min_score`` applies to the similarity.
+    """
+
+    def __init__(
+        self,
+        token_counter: TokenCounter,
+        max_context_tokens: int = 3000,
+        min_chunk_tokens: int = 50,
+        min_score: Optional[float] = None
+    ):
+        """
+        Initialize the context packer.
+
+        Args:
+            token_counter: Tokenizer of the generation model
+            max_context_tokens: Token budget for the retrieved context
+            min_chunk_tokens: Smallest useful truncated chunk
+            min_score: Drop chunks scoring below this similarity
+        """
+        self.token_counter = token_counter
+        self.max_context_tokens = max_context_tokens
+        self.min_chunk_tokens = min_chunk_tokens
+        self.min_score = min_score
+        self._separator_tokens = token_counter.count(CONTEXT_SEPARATOR)
+
+    def pack(self, chunks: List[RetrievedChunk]) -> PackedContext:
+        """
+        Select and truncate chunks to fit the token budget.
+
+        Args:
+            chunks: Retrieved chunks
+
+        Returns:
+            PackedContext: Context text and the chunks it contains
+        """
+        packed = PackedContext()
+        parts = []
+
+        for chunk in sorted(chunks, key=lambda c: c.rank_score, reverse=True):
+            if self.min_score is not None and chunk.score < self.min_score:
+                packed.dropped += 1
+                continue
+
+            separator_tokens = self._separator_tokens if parts else 0
+            available = self.max_context_tokens - packed.context_tokens - separator_tokens
+            text = chunk.document.page_content
+            tokens = self.token_counter.count(text)
+
+            if tokens > available:
+                if available < self.min_chunk_tokens:
+                    packed.dropped += 1
+                    continue
+                text = self.token_counter.truncate(text, available)
+                tokens = self.token_counter.count(text)
+                packed.truncated += 1
+
+            parts.append(text)
+            packed.chunks.append(chunk)
+            packed.context_tokens += separator_tokens + tokens
+
+        packed.text = CONTEXT_SEPARATOR.join(parts)
+        return packed
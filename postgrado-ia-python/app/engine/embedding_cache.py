@@ -0,0 +1,402 @@
+"""
+Embedding Cache - In-process LRU plus SQLite store for query embeddings
+"""
+
+import os
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Keys per SELECT ... IN (...) query, below SQLite's bound-parameter limit
+SQLITE_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a text for cache lookups (Unicode NFC, collapsed whitespace)."""
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+class EmbeddingCache:
+    """
+    Two-level embedding cache keyed by model name and text.
+
+    Lookups hit an in-process LRU first and fall back to a SQLite table,
+    so embeddings survive restarts and are shared by every engine in the
+    process.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = "./cache/embeddings.db",
+        max_memory_entries: int = 10000
+    ):
+        """
+        Initialize the embedding cache.
+
+        Args:
+            db_path: Path of the SQLite store (None keeps the cache in memory only)
+            max_memory_entries: Maximum number of embeddings held in the LRU
+        """
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._init_db()
+
+    def _init_db(self):
+        """Open (or create) the SQLite store."""
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY,"
+                " model TEXT NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+            logger.info(f"Embedding cache store opened at {self.db_path}")
+        except Exception as e:
+            logger.warning(f"Could not open embedding cache store: {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Build the cache key for a model and an (already normalized) text."""
+        return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """
+        Look up an embedding.
+
+        Args:
+            model: Embedding model name
+            text: Normalized text
+
+        Returns:
+            Optional[List[float]]: Cached embedding, or None on a miss
+        """
+        key = self.make_key(model, text)
+
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector.tolist()
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                    return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def put(self, model: str, text: str, embedding: List[float]):
+        """
+        Store an embedding.
+
+        Args:
+            model: Embedding model name
+            text: Normalized text
+            embedding: Embedding vector
+        """
+        key = self.make_key(model, text)
+        vector = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            self._remember(key, vector)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    (key, model, vector.tobytes())
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist embedding: {e}")
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up several embeddings with one store query per batch of keys.
+
+        Args:
+            model: Embedding model name
+            texts: Texts to look up
+
+        Returns:
+            List[Optional[List[float]]]: Cached embedding or None, per text
+        """
+        keys = [self.make_key(model, text) for text in texts]
+        found = {}
+
+        with self._lock:
+            pending = []
+            for key in dict.fromkeys(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                else:
+                    pending.append(key)
+
+            if self._conn is not None:
+                for start in range(0, len(pending), SQLITE_BATCH_SIZE):
+                    batch = pending[start:start + SQLITE_BATCH_SIZE]
+                    rows = self._conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})",
+                        batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        vector = np.frombuffer(blob, dtype=np.float32)
+                        self._remember(key, vector)
+                        found[key] = vector
+
+            from_store = set(pending)
+            results = []
+            for key in keys:
+                vector = found.get(key)
+                if vector is None:
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    if key in from_store:
+                        self.disk_hits += 1
+                    else:
+                        self.memory_hits += 1
+                    results.append(vector.tolist())
+            return results
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]):
+        """
+        Store several embeddings in one transaction.
+
+        Args:
+            model: Embedding model name
+            texts: Texts the embeddings belong to
+            embeddings: Embedding vectors
+        """
+        rows = [
+            (self.make_key(model, text), model, np.asarray(embedding, dtype=np.float32))
+            for text, embedding in zip(texts, embeddings)
+        ]
+
+        with self._lock:
+            for key, _, vector in rows:
+                self._remember(key, vector)
+            if self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                    [(key, model, vector.tobytes()) for key, model, vector in rows]
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist embeddings: {e}")
+
+    def stats(self) -> dict:
+        """Return cache counters."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        """Close the SQLite store."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated query embeddings from an EmbeddingCache.
+
+    A single instance can be shared by the ingestion and query engines.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model_name: Optional[str] = None
+    ):
+        """
+        Initialize the cached embeddings.
+
+        Args:
+            embeddings: Underlying embeddings client
+            cache: Cache shared across engines
+            model_name: Model name used in cache keys (defaults to the client's model)
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", "unknown")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search documents."""
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text, reusing a cached embedding when available."""
+        text = normalize_text(text)
+        cached = self.cache.get(self.model_name, text)
+        if cached is not None:
+            return cached
+
+        embedding = self.embeddings.embed_query(text)
+        self.cache.put(self.model_name, text, embedding)
+        return embedding
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search documents with the async client."""
+        return await self.embeddings.aembed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed query text with the async client, reusing cached embeddings.
+
+        Cache reads and writes may hit SQLite, so they run in the default
+        executor instead of blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        text = normalize_text(text)
+        cached = await loop.run_in_executor(None, self.cache.get, self.model_name, text)
+        if cached is not None:
+            return cached
+
+        embedding = await self.embeddings.aembed_query(text)
+        await loop.run_in_executor(None, self.cache.put, self.model_name, text, embedding)
+        return embedding
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several query texts, sending every cache miss in one request.
+
+        The cache is read and written with one batched call each, run in
+        the default executor so SQLite never blocks the event loop.
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+        loop = asyncio.get_running_loop()
+        texts = [normalize_text(text) for text in texts]
+        embeddings = await loop.run_in_executor(None, self.cache.get_many, self.model_name, texts)
+
+        misses = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if misses:
+            fetched = dict(zip(misses, await self.embeddings.aembed_documents(misses)))
+            await loop.run_in_executor(
+                None, self.cache.put_many, self.model_name, list(fetched), list(fetched.values())
+            )
+            embeddings = [
+                embedding if embedding is not None else fetched[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+        return embeddings
+
+
+class CachedDocumentEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves chunk embeddings from a content-addressed store.
+
+    Chunks are keyed by model name and exact text, so re-ingesting a file or
+    rebuilding an index only sends chunks whose text was never embedded.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache: EmbeddingCache,
+        model_name: Optional[str] = None
+    ):
+        """
+        Initialize the cached document embeddings.
+
+        Args:
+            embeddings: Embeddings used for cache misses (e.g. an EmbeddingScheduler)
+            cache: Persistent store of chunk embeddings
+            model_name: Model name used in cache keys (defaults to the client's model)
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name or getattr(embeddings, "model", "unknown")
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, sending only texts missing from the store."""
+        embeddings = self.cache.get_many(self.model_name, texts)
+
+        misses = list(dict.fromkeys(
+            text for text, embedding in zip(texts, embeddings) if embedding is None
+        ))
+        if misses:
+            fetched = dict(zip(misses, self.embeddings.embed_documents(misses)))
+            self.cache.put_many(self.model_name, misses, [fetched[text] for text in misses])
+            embeddings = [
+                embedding if embedding is not None else fetched[text]
+                for text, embedding in zip(texts, embeddings)
+            ]
+
+        with self._lock:
+            self.hits += len(texts) - len(misses)
+            self.misses += len(misses)
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text with the underlying client."""
+        return self.embeddings.embed_query(text)
+
+    def counters(self) -> Tuple[int, int]:
+        """Return the (hits, misses) seen so far."""
+        with self._lock:
+            return self.hits, self.misses
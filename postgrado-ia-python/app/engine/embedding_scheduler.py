@@ -0,0 +1,273 @@
+"""
+Embedding Scheduler - Batched, concurrent, rate-limited document embedding
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+from langchain.schema.embeddings import Embeddings
+
+from .context_packer import TokenCounter
+
+logger = logging.getLogger(__name__)
+
+RATE_WINDOW_SECONDS = 60.0
+
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Tell whether an embeddings error is worth retrying.
+
+    Rate limits (429), server errors (5xx), timeouts and connection errors
+    are retryable; other client errors are not.
+
+    Args:
+        error: Exception raised by the embeddings client
+
+    Returns:
+        bool: True if the request should be retried
+    """
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in (
+        "APIConnectionError",
+        "APITimeoutError",
+        "RateLimitError",
+    )
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers else None
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Sliding one-minute window over requests and tokens."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the rate limiter.
+
+        Args:
+            requests_per_minute: Request cap (None for unlimited)
+            tokens_per_minute: Token cap (None for unlimited)
+            clock: Monotonic clock
+            sleep: Sleep function
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._clock = clock
+        self._sleep = sleep
+        self._events: deque = deque()
+        self._tokens_in_window = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until a request of ``tokens`` tokens fits in the window.
+
+        A request larger than the whole token cap is let through once the
+        window is empty, so it cannot wait forever.
+
+        Args:
+            tokens: Tokens the request will consume
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                while self._events and now - self._events[0][0] >= RATE_WINDOW_SECONDS:
+                    self._tokens_in_window -= self._events.popleft()[1]
+
+                requests_ok = (
+                    self.requests_per_minute is None
+                    or len(self._events) < self.requests_per_minute
+                )
+                tokens_ok = (
+                    self.tokens_per_minute is None
+                    or not self._events
+                    or self._tokens_in_window + tokens <= self.tokens_per_minute
+                )
+                if requests_ok and tokens_ok:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return waited
+
+                wait = max(self._events[0][0] + RATE_WINDOW_SECONDS - now, 0.01)
+
+            self._sleep(wait)
+            waited += wait
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Embeddings wrapper that embeds documents in size-capped concurrent batches.
+
+    Batches are capped by chunk count and by tokens, sent in parallel within
+    requests/tokens-per-minute limits, and retried with exponential backoff
+    on rate limits and server errors. Only the failed batch is resent on a
+    retry; batches that already succeeded are kept.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 100,
+        max_batch_tokens: int = 50000,
+        max_concurrency: int = 4,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        token_counter: Optional[TokenCounter] = None,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Initialize the embedding scheduler.
+
+        Args:
+            embeddings: Underlying embeddings client
+            max_batch_size: Maximum chunks per request
+            max_batch_tokens: Maximum tokens per request
+            max_concurrency: Requests in flight at once
+            requests_per_minute: Provider request limit (None for unlimited)
+            tokens_per_minute: Provider token limit (None for unlimited)
+            max_retries: Retries of a failed batch before giving up
+            backoff_base: First backoff delay in seconds (doubled per retry)
+            backoff_max: Longest backoff delay in seconds
+            token_counter: Tokenizer used to size batches
+            sleep: Sleep function
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.token_counter = token_counter or TokenCounter(
+            getattr(embeddings, "model_name", None) or getattr(embeddings, "model", "text-embedding-3-small")
+        )
+        self.rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute, sleep=sleep)
+        self._sleep = sleep
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.tokens = 0
+        self.throttled_seconds = 0.0
+
+    def _make_batches(self, token_counts: List[int]) -> List[range]:
+        """Group consecutive texts into batches under the size and token caps."""
+        batches = []
+        start = 0
+        batch_tokens = 0
+        for index, tokens in enumerate(token_counts):
+            full = (
+                index - start >= self.max_batch_size
+                or (index > start and batch_tokens + tokens > self.max_batch_tokens)
+            )
+            if full:
+                batches.append(range(start, index))
+                start = index
+                batch_tokens = 0
+            batch_tokens += tokens
+        if start < len(token_counts):
+            batches.append(range(start, len(token_counts)))
+        return batches
+
+    def _embed_batch(self, texts: List[str], tokens: int) -> List[List[float]]:
+        """Send one batch, retrying retryable errors with backoff."""
+        attempt = 0
+        while True:
+            waited = self.rate_limiter.acquire(tokens)
+            with self._stats_lock:
+                self.requests += 1
+                self.tokens += tokens
+                self.throttled_seconds += waited
+
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = min(self.backoff_base * 2 ** attempt, self.backoff_max)
+                    delay *= 0.5 + random.random() / 2
+                attempt += 1
+                with self._stats_lock:
+                    self.retries += 1
+                logger.warning(
+                    f"Embedding batch of {len(texts)} chunks failed ({e}); "
+                    f"retry {attempt}/{self.max_retries} in {delay:.1f}s"
+                )
+                self._sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents in scheduled batches.
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            List[List[float]]: One embedding per text, in order
+        """
+        if not texts:
+            return []
+
+        token_counts = [self.token_counter.count(text) for text in texts]
+        batches = self._make_batches(token_counts)
+
+        def run(batch: range) -> List[List[float]]:
+            return self._embed_batch(
+                [texts[i] for i in batch],
+                sum(token_counts[i] for i in batch)
+            )
+
+        if len(batches) == 1:
+            return run(batches[0])
+
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(batches)),
+            thread_name_prefix="embedding-batch"
+        ) as executor:
+            results = list(executor.map(run, batches))
+
+        return [embedding for batch in results for embedding in batch]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text with the underlying client."""
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> dict:
+        """Return scheduler counters."""
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "tokens": self.tokens,
+                "throttled_seconds": self.throttled_seconds
+            }
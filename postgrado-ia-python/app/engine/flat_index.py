@@ -0,0 +1,871 @@
+"""
+Flat Index - Memory-mapped NumPy vector store with exact top-k search
+"""
+
+import os
+import json
+import uuid
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+
+from .embedding_cache import SQLITE_BATCH_SIZE
+from .metadata_index import FILTER_FIELDS, MetadataIndex
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - writers are then serialized per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INITIAL_CAPACITY = 1024
+# float16 rows widened to float32 at a time (small enough to stay in cache)
+SEARCH_BLOCK_ROWS = 1024
+DEFAULT_INCLUDE = ("metadatas", "documents")
+QUERY_INCLUDE = ("metadatas", "documents", "distances")
+
+QUANTIZATION_NONE = "none"
+QUANTIZATION_FLOAT16 = "float16"
+QUANTIZATION_INT8 = "int8"
+# Order matters: the position is what the sidecar stores
+QUANTIZATIONS = (QUANTIZATION_NONE, QUANTIZATION_FLOAT16, QUANTIZATION_INT8)
+
+
+def _normalize(vectors) -> np.ndarray:
+    """Return float32 rows scaled to unit length (zero rows are left as is)."""
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    Encode unit vectors for the coarse search.
+
+    Args:
+        vectors: float32 rows
+        quantization: "float16" or "int8"
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Codes, and for int8 the
+        per-vector scale that maps codes back to floats
+    """
+    if quantization == QUANTIZATION_FLOAT16:
+        return vectors.astype(np.float16), None
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the column indices and values of each row's k best scores, best first."""
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-values, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def _flatten_where(where: Optional[dict]) -> dict:
+    """Merge the equality clauses of a Chroma ``where`` filter (``$and`` included)."""
+    if not where:
+        return {}
+    if set(where) == {"$and"}:
+        merged = {}
+        for clause in where["$and"]:
+            merged.update(_flatten_where(clause))
+        return merged
+    return dict(where)
+
+
+def _batched(items: Sequence, size: int = SQLITE_BATCH_SIZE) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class FlatIndex:
+    """
+    Exact vector index stored as a memory-mapped ``.npy`` matrix.
+
+    Embeddings are kept unit-normalized in a float32 matrix on disk and a
+    SQLite sidecar maps each matrix row to its chunk ID, text and metadata.
+    A search is one matrix product against the mapped rows plus an
+    ``argpartition`` for the top k, so for tens of thousands of chunks it
+    is exact and faster than an HNSW round trip. Every process opening the
+    same directory maps the same file, so uvicorn workers share one copy
+    in the page cache.
+
+    Writes are append-only: new vectors go after the last row and replaced
+    or deleted chunks are only marked dead in the sidecar. When dead rows
+    outnumber live ones the matrix is rewritten into a new generation file
+    (growth past the file's capacity does the same). Readers switch files
+    when the sidecar's generation changes, so they never see a half-written
+    matrix. Writers in different processes are serialized with a file lock.
+
+    With ``quantization`` set to "float16" or "int8" (one scale per
+    vector), the coarse search scans compact codes kept next to the
+    float32 matrix, and only the best ``k * rescore_factor`` candidates are
+    rescored exactly from the float32 rows. The codes are what every
+    search touches, so they are what stays resident in the page cache;
+    the float32 file is only paged in for candidates.
+
+    Filters on ``program`` and ``source_file`` are resolved through an
+    in-memory index of rows by value (rebuilt lazily after writes), so a
+    filtered search gathers and scores only the matching rows; other
+    fields are matched in the sidecar.
+
+    The methods mirror the subset of the Chroma collection API used by the
+    engines (``query``, ``get``, ``add``, ``upsert``, ``update``,
+    ``delete``, ``count``), with distances in Chroma's cosine space.
+    """
+
+    metadata = {"hnsw:space": "cosine"}
+
+    def __init__(
+        self,
+        path: str = "./flat_index",
+        quantization: str = QUANTIZATION_NONE,
+        rescore_factor: int = 4
+    ):
+        """
+        Open (or create) the index.
+
+        An index stored with another quantization is re-encoded on open.
+
+        Args:
+            path: Directory holding the vector files and the SQLite sidecar
+            quantization: "none", "float16" or "int8" codes for the coarse search
+            rescore_factor: Candidates rescored in float32 per requested result
+        """
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}, got {quantization}")
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(
+            os.path.join(path, "chunks.db"),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " row INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL,"
+            " document TEXT,"
+            " metadata TEXT,"
+            " live INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_id ON chunks (id, live)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+
+        self._matrix: Optional[np.ndarray] = None
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._stored_quantization = quantization
+        self._rows = 0
+        self._dimension = 0
+        self._generation = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._data_version = None
+        self._row_index = MetadataIndex(FILTER_FIELDS)
+        self._row_index_version = None
+        with self._lock:
+            self._refresh()
+            if self._rows and self._stored_quantization != quantization:
+                with self._write():
+                    self._compact(force=True)
+
+    def _file_path(self, kind: str, generation: int) -> str:
+        return os.path.join(self.path, f"{kind}-{generation}.npy")
+
+    def _state(self) -> dict:
+        return dict(self._conn.execute("SELECT key, value FROM state").fetchall())
+
+    def _refresh(self):
+        """Reload rows and the mapped matrix if another connection wrote."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            state = self._state()
+            rows = state.get("rows", 0)
+            alive = np.zeros(rows, dtype=bool)
+            live = np.fromiter(
+                (row for row, in self._conn.execute("SELECT row FROM chunks WHERE live = 1")),
+                dtype=np.int64
+            )
+            alive[live] = True
+        finally:
+            self._conn.execute("COMMIT")
+
+        generation = state.get("generation", 0)
+        self._stored_quantization = QUANTIZATIONS[state.get("quantization", 0)]
+        if rows and (self._matrix is None or generation != self._generation):
+            self._open_matrix(generation)
+        elif not rows:
+            self._matrix = self._codes = self._scales = None
+        self._rows = rows
+        self._dimension = state.get("dimension", 0)
+        self._generation = generation
+        self._alive = alive
+        self._data_version = version
+
+    def _open_matrix(self, generation: int):
+        """Map the float32 rows and, for a quantized index, its codes."""
+        def load(kind):
+            path = self._file_path(kind, generation)
+            return np.load(path, mmap_mode="r+" if os.access(path, os.W_OK) else "r")
+
+        self._matrix = load("vectors")
+        quantized = self._stored_quantization != QUANTIZATION_NONE
+        self._codes = load("codes") if quantized else None
+        self._scales = load("scales") if self._stored_quantization == QUANTIZATION_INT8 else None
+
+    @contextmanager
+    def _write(self):
+        """Serialize a write with this process's threads and other processes."""
+        with self._lock:
+            lock_file = None
+            if fcntl is not None:
+                lock_file = open(os.path.join(self.path, "write.lock"), "w")
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                yield
+            finally:
+                self._data_version = None
+                self._row_index_version = None
+                self._refresh()
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _where_clause(where: Optional[dict]) -> Tuple[str, list]:
+        """Translate an equality-only Chroma ``where`` filter into SQL."""
+        where = _flatten_where(where)
+        if not where:
+            return "", []
+        conditions, params = [], []
+        for key, value in where.items():
+            if key.startswith("$") or isinstance(value, dict):
+                raise ValueError(f"Unsupported filter for the flat index: {key}")
+            conditions.append("json_extract(metadata, ?) = ?")
+            params.extend([f'$."{key}"', value])
+        return " AND " + " AND ".join(conditions), params
+
+    def _write_matrix(self, generation: int, capacity: int, rows: Optional[np.ndarray] = None):
+        """Create the files of a generation in the configured quantization, with ``rows`` on top."""
+        def create(kind, dtype, shape, values):
+            array = np.lib.format.open_memmap(
+                self._file_path(kind, generation), mode="w+", dtype=dtype, shape=shape
+            )
+            if values is not None and len(values):
+                array[:len(values)] = values
+            array.flush()
+
+        create("vectors", np.float32, (capacity, self._dimension), rows)
+        if self.quantization == QUANTIZATION_NONE:
+            return
+        codes, scales = quantize(rows, self.quantization) if rows is not None and len(rows) else (None, None)
+        dtype = np.float16 if self.quantization == QUANTIZATION_FLOAT16 else np.int8
+        create("codes", dtype, (capacity, self._dimension), codes)
+        if self.quantization == QUANTIZATION_INT8:
+            create("scales", np.float32, (capacity,), scales)
+
+    def _remove_generation(self, generation: int):
+        for kind in ("vectors", "codes", "scales"):
+            try:
+                os.remove(self._file_path(kind, generation))
+            except OSError:
+                pass
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: Iterable[Iterable[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None
+    ):
+        """
+        Append chunks, replacing any live chunk with the same ID.
+
+        Args:
+            ids: Chunk IDs (the last occurrence wins within a call)
+            embeddings: One embedding per chunk (normalized on write)
+            documents: Chunk texts
+            metadatas: Chunk metadata
+        """
+        if not ids:
+            return
+        vectors = _normalize(embeddings)
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [None] * len(ids)
+        last = {chunk_id: index for index, chunk_id in enumerate(ids)}
+        keep = sorted(last.values())
+        vectors = vectors[keep]
+
+        with self._write():
+            if self._dimension and vectors.shape[1] != self._dimension:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match the index ({self._dimension})"
+                )
+            start, end = self._rows, self._rows + len(keep)
+            generation = self._generation
+            if self._matrix is None or self._matrix.shape[0] < end:
+                # Grow into a new generation file; readers keep the old one until the commit
+                self._dimension = vectors.shape[1]
+                generation += 1
+                current = self._matrix[:start] if self._matrix is not None else None
+                capacity = max(INITIAL_CAPACITY, end, 2 * (self._matrix.shape[0] if self._matrix is not None else 0))
+                self._write_matrix(generation, capacity, current)
+                self._stored_quantization = self.quantization
+                self._open_matrix(generation)
+            # Rows past the committed count are invisible to readers until the commit
+            self._matrix[start:end] = vectors
+            self._matrix.flush()
+            if self._codes is not None:
+                codes, scales = quantize(vectors, self._stored_quantization)
+                self._codes[start:end] = codes
+                self._codes.flush()
+                if self._scales is not None:
+                    self._scales[start:end] = scales
+                    self._scales.flush()
+
+            kept_ids = [ids[index] for index in keep]
+            with self._transaction() as conn:
+                for batch in _batched(kept_ids):
+                    conn.execute(
+                        f"UPDATE chunks SET live = 0 WHERE live = 1 AND id IN ({','.join('?' * len(batch))})",
+                        batch
+                    )
+                conn.executemany(
+                    "INSERT INTO chunks (row, id, document, metadata, live) VALUES (?, ?, ?, ?, 1)",
+                    [
+                        (start + offset, ids[index], documents[index], json.dumps(metadatas[index] or {}))
+                        for offset, index in enumerate(keep)
+                    ]
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                    [
+                        ("rows", end),
+                        ("dimension", self._dimension),
+                        ("generation", generation),
+                        ("quantization", QUANTIZATIONS.index(self._stored_quantization))
+                    ]
+                )
+            if generation != self._generation:
+                self._remove_generation(self._generation)
+            self._compact()
+
+    add = upsert
+
+    def update(
+        self,
+        ids: List[str],
+        metadatas: Optional[List[dict]] = None,
+        documents: Optional[List[str]] = None
+    ):
+        """
+        Replace the metadata and/or text of live chunks in place.
+
+        Args:
+            ids: Chunk IDs
+            metadatas: New metadata, one per ID
+            documents: New texts, one per ID
+        """
+        with self._write(), self._transaction() as conn:
+            if metadatas is not None:
+                conn.executemany(
+                    "UPDATE chunks SET metadata = ? WHERE id = ? AND live = 1",
+                    [(json.dumps(metadata or {}), chunk_id) for chunk_id, metadata in zip(ids, metadatas)]
+                )
+            if documents is not None:
+                conn.executemany(
+                    "UPDATE chunks SET document = ? WHERE id = ? AND live = 1",
+                    list(zip(documents, ids))
+                )
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None):
+        """
+        Mark chunks as deleted.
+
+        Args:
+            ids: Chunk IDs to delete
+            where: Metadata filter selecting chunks to delete
+        """
+        if not ids and not where:
+            return
+        clause, params = self._where_clause(where)
+        with self._write():
+            with self._transaction() as conn:
+                if ids:
+                    for batch in _batched(list(ids)):
+                        conn.execute(
+                            f"UPDATE chunks SET live = 0 WHERE live = 1"
+                            f" AND id IN ({','.join('?' * len(batch))}){clause}",
+                            [*batch, *params]
+                        )
+                else:
+                    conn.execute(f"UPDATE chunks SET live = 0 WHERE live = 1{clause}", params)
+            self._compact()
+
+    def _compact(self, force: bool = False):
+        """
+        Rewrite the matrix without dead rows once they outnumber the live ones.
+
+        Args:
+            force: Rewrite anyway (e.g. to change the quantization)
+        """
+        live = [row for row, in self._conn.execute("SELECT row FROM chunks WHERE live = 1 ORDER BY row")]
+        state = self._state()
+        rows = state.get("rows", 0)
+        if not force and (rows < INITIAL_CAPACITY or rows - len(live) <= len(live)):
+            return
+
+        generation = state["generation"] + 1
+        self._write_matrix(
+            generation,
+            max(INITIAL_CAPACITY, 2 * len(live)),
+            np.asarray(self._matrix[live]) if live else None
+        )
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM chunks WHERE live = 0")
+            # Live rows move down in order, so a new row number is never still taken
+            conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(new, old) for new, old in enumerate(live) if new != old]
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                [
+                    ("rows", len(live)),
+                    ("generation", generation),
+                    ("quantization", QUANTIZATIONS.index(self.quantization))
+                ]
+            )
+        self._remove_generation(generation - 1)
+        logger.info(f"Flat index rewritten from {rows} to {len(live)} rows ({self.quantization})")
+
+    def count(self) -> int:
+        """Return the number of live chunks."""
+        with self._lock:
+            self._refresh()
+            return int(self._alive.sum())
+
+    def memory_usage(self) -> dict:
+        """
+        Report the size of the stored vectors.
+
+        Returns:
+            dict: Quantization, rows, bytes scanned by every search
+            (``search_bytes``) and bytes of the float32 rows (``full_bytes``)
+        """
+        with self._lock:
+            self._refresh()
+            full_bytes = self._rows * self._dimension * 4
+            search_bytes = full_bytes
+            if self._codes is not None:
+                search_bytes = self._rows * self._dimension * self._codes.itemsize
+                if self._scales is not None:
+                    search_bytes += self._rows * self._scales.itemsize
+            return {
+                "quantization": self._stored_quantization,
+                "rows": self._rows,
+                "search_bytes": search_bytes,
+                "full_bytes": full_bytes
+            }
+
+    def _indexed_rows(self) -> MetadataIndex:
+        """Return the live rows by program and source file, rebuilt after writes."""
+        if self._row_index_version != self._data_version:
+            columns = ", ".join("json_extract(metadata, ?)" for _ in FILTER_FIELDS)
+            records = self._conn.execute(
+                f"SELECT row, {columns} FROM chunks WHERE live = 1",
+                [f'$."{field}"' for field in FILTER_FIELDS]
+            ).fetchall()
+            index = MetadataIndex(FILTER_FIELDS)
+            index.add(
+                [row for row, *_ in records],
+                [dict(zip(FILTER_FIELDS, values)) for _, *values in records]
+            )
+            self._row_index = index
+            self._row_index_version = self._data_version
+        return self._row_index
+
+    def _filter_rows(self, filters: dict) -> np.ndarray:
+        """Return the sorted live rows matching every filter."""
+        indexed = {key: value for key, value in filters.items() if key in FILTER_FIELDS}
+        others = {key: value for key, value in filters.items() if key not in FILTER_FIELDS}
+        rows = self._indexed_rows().chunk_ids(indexed) if indexed else None
+        if others:
+            clause, params = self._where_clause(others)
+            matched = {row for row, in self._conn.execute(
+                f"SELECT row FROM chunks WHERE live = 1{clause}", params
+            )}
+            rows = matched if rows is None else rows & matched
+        return np.array(sorted(row for row in rows if row < self._rows), dtype=np.int64)
+
+    def _snapshot(self, where: Optional[dict]) -> tuple:
+        """
+        Return the mapped rows, codes and scales, the searchable-row mask,
+        the filtered rows (None without a filter) and the generation.
+
+        With a filter the mask covers the filtered rows instead of the matrix.
+        """
+        filters = _flatten_where(where)
+        with self._lock:
+            self._refresh()
+            mask, subset = self._alive, None
+            if filters:
+                subset = self._filter_rows(filters)
+                mask = np.ones(len(subset), dtype=bool)
+            rows = self._rows
+            matrix = self._matrix[:rows] if self._matrix is not None else None
+            codes = self._codes[:rows] if self._codes is not None else None
+            scales = self._scales[:rows] if self._scales is not None else None
+            return matrix, codes, scales, mask, subset, self._generation
+
+    def _fetch(self, rows: List[int], generation: int) -> Optional[dict]:
+        """Return ``{row: (id, document, metadata)}``, or None if the rows were renumbered."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                if self._state().get("generation", 0) != generation:
+                    return None
+                found = {}
+                for batch in _batched(rows):
+                    for row, chunk_id, document, metadata in self._conn.execute(
+                        f"SELECT row, id, document, metadata FROM chunks"
+                        f" WHERE row IN ({','.join('?' * len(batch))})",
+                        batch
+                    ):
+                        found[row] = (chunk_id, document, json.loads(metadata or "{}"))
+                return found
+            finally:
+                self._conn.execute("COMMIT")
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Iterable[str] = QUERY_INCLUDE
+    ) -> dict:
+        """
+        Find the nearest chunks of one or more query embeddings.
+
+        Args:
+            query_embeddings: Query embeddings
+            n_results: Neighbours per query
+            where: Equality metadata filter (clauses may be combined with ``$and``)
+            include: Fields to return ("documents", "metadatas", "distances", "embeddings")
+
+        Returns:
+            dict: Chroma-style response with one list per query
+        """
+        include = set(include)
+        queries = _normalize(query_embeddings)
+        for _ in range(3):
+            matrix, codes, scales, mask, subset, generation = self._snapshot(where)
+            k = min(n_results, int(mask.sum()))
+            if matrix is None or k == 0:
+                return self._response([[] for _ in queries], {}, None, include, [[] for _ in queries])
+            if queries.shape[1] != matrix.shape[1]:
+                raise ValueError(
+                    f"Query dimension {queries.shape[1]} does not match the index ({matrix.shape[1]})"
+                )
+
+            if codes is None:
+                # One matrix product scores every row (or only the filtered rows) against every query
+                scores = queries @ (matrix if subset is None else matrix[subset]).T
+                scores[:, ~mask] = -np.inf
+                top, similarities = _top_k(scores, k)
+                if subset is not None:
+                    top = subset[top]
+            else:
+                top, similarities = self._search_quantized(queries, matrix, codes, scales, mask, k, subset)
+
+            found = self._fetch(sorted(set(top.ravel().tolist())), generation)
+            if found is not None:
+                distances = (1.0 - similarities).tolist()
+                return self._response(top.tolist(), found, matrix, include, distances)
+        raise RuntimeError("Flat index changed during every search attempt")
+
+    def _search_quantized(
+        self,
+        queries: np.ndarray,
+        matrix: np.ndarray,
+        codes: np.ndarray,
+        scales: Optional[np.ndarray],
+        mask: np.ndarray,
+        k: int,
+        subset: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Score the codes, then rescore the best candidates with the float32 rows."""
+        if subset is not None:
+            codes = codes[subset]
+            scales = scales[subset] if scales is not None else None
+        if scales is not None:
+            # einsum widens the int8 codes in small buffers, never copying the matrix
+            coarse = np.einsum("ij,qj->qi", codes, queries) * scales
+        else:
+            coarse = np.empty((len(queries), len(codes)), dtype=np.float32)
+            widened = np.empty((min(SEARCH_BLOCK_ROWS, len(codes)), codes.shape[1]), dtype=np.float32)
+            for start in range(0, len(codes), SEARCH_BLOCK_ROWS):
+                block = codes[start:start + SEARCH_BLOCK_ROWS]
+                widened[:len(block)] = block
+                coarse[:, start:start + len(block)] = queries @ widened[:len(block)].T
+        coarse[:, ~mask] = -np.inf
+
+        count = min(k * self.rescore_factor, int(mask.sum()))
+        # Sorted rows read the float32 file front to back
+        candidates = np.sort(np.argpartition(-coarse, count - 1, axis=1)[:, :count], axis=1)
+        if subset is not None:
+            candidates = subset[candidates]
+        exact = np.empty(candidates.shape, dtype=np.float32)
+        for i, rows in enumerate(candidates):
+            exact[i] = matrix[rows] @ queries[i]
+        best, similarities = _top_k(exact, k)
+        return np.take_along_axis(candidates, best, axis=1), similarities
+
+    @staticmethod
+    def _response(
+        rows: List[List[int]],
+        found: dict,
+        matrix: Optional[np.ndarray],
+        include: set,
+        distances: List[List[float]]
+    ) -> dict:
+        return {
+            "ids": [[found[row][0] for row in group] for group in rows],
+            "documents": [[found[row][1] for row in group] for group in rows] if "documents" in include else None,
+            "metadatas": [[found[row][2] for row in group] for group in rows] if "metadatas" in include else None,
+            "embeddings": (
+                [[matrix[row].tolist() for row in group] for group in rows]
+                if "embeddings" in include else None
+            ),
+            "distances": distances if "distances" in include else None
+        }
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        include: Iterable[str] = DEFAULT_INCLUDE
+    ) -> dict:
+        """
+        Read live chunks by ID and/or metadata filter, in insertion order.
+
+        Args:
+            ids: Chunk IDs (None reads every chunk)
+            where: Equality metadata filter
+            limit: Maximum number of chunks
+            offset: Chunks to skip
+            include: Fields to return ("documents", "metadatas", "embeddings")
+
+        Returns:
+            dict: Chroma-style response
+        """
+        include = set(include)
+        clause, params = self._where_clause(where)
+        with self._lock:
+            self._refresh()
+            self._conn.execute("BEGIN")
+            try:
+                select = "SELECT row, id, document, metadata FROM chunks WHERE live = 1"
+                if ids is not None:
+                    rows = []
+                    for batch in _batched(list(ids)):
+                        rows.extend(self._conn.execute(
+                            f"{select} AND id IN ({','.join('?' * len(batch))}){clause}",
+                            [*batch, *params]
+                        ))
+                    rows = sorted(rows)[offset or 0:]
+                    if limit is not None:
+                        rows = rows[:limit]
+                else:
+                    rows = self._conn.execute(
+                        f"{select}{clause} ORDER BY row LIMIT ? OFFSET ?",
+                        [*params, -1 if limit is None else limit, offset or 0]
+                    ).fetchall()
+            finally:
+                self._conn.execute("COMMIT")
+            matrix = self._matrix
+
+        return {
+            "ids": [chunk_id for _, chunk_id, _, _ in rows],
+            "documents": [document for _, _, document, _ in rows] if "documents" in include else None,
+            "metadatas": (
+                [json.loads(metadata or "{}") for _, _, _, metadata in rows]
+                if "metadatas" in include else None
+            ),
+            "embeddings": (
+                [matrix[row].tolist() for row, _, _, _ in rows]
+                if "embeddings" in include and matrix is not None else None
+            )
+        }
+
+    def flush(self):
+        """Flush written rows of the mapped matrix to disk."""
+        with self._lock:
+            if self._matrix is not None and self._matrix.mode != "r":
+                self._matrix.flush()
+
+    def close(self):
+        """Close the sidecar connection."""
+        with self._lock:
+            self._matrix = None
+            self._conn.close()
+
+
+class FlatVectorStore(VectorStore):
+    """
+    LangChain vector store over a ``FlatIndex``.
+
+    Each engine wraps the shared index with its own embedding function,
+    the same way ``Chroma(client=...)`` wraps a shared Chroma client.
+    ``_collection`` is the index itself, so code written against the
+    Chroma collection API works unchanged.
+    """
+
+    def __init__(self, index: FlatIndex, embedding_function: Embeddings):
+        """
+        Initialize the store.
+
+        Args:
+            index: Shared flat index
+            embedding_function: Embeddings used for added texts and queries
+        """
+        self._collection = index
+        self._embedding_function = embedding_function
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding_function
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Embed and store texts.
+
+        Args:
+            texts: Texts to store
+            metadatas: Metadata of each text
+            ids: Chunk IDs (random if not provided)
+
+        Returns:
+            List[str]: IDs of the stored texts
+        """
+        texts = list(texts)
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        if texts:
+            self._collection.upsert(
+                ids=ids,
+                embeddings=self._embedding_function.embed_documents(texts),
+                documents=texts,
+                metadatas=metadatas
+            )
+        return ids
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[Tuple[Document, float]]:
+        raw = self._collection.query(query_embeddings=[embedding], n_results=k, where=filter)
+        return [
+            (Document(page_content=text or "", metadata=metadata), distance)
+            for text, metadata, distance in zip(raw["documents"][0], raw["metadatas"][0], raw["distances"][0])
+        ]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Search by text.
+
+        Returns:
+            List[Tuple[Document, float]]: Documents with their cosine distance
+        """
+        return self.similarity_search_by_vector_with_score(
+            self._embedding_function.embed_query(query), k, filter
+        )
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [document for document, _ in self.similarity_search_by_vector_with_score(embedding, k, filter)]
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        self._collection.delete(ids=ids)
+        return True
+
+    def persist(self):
+        """Flush the mapped matrix (the sidecar commits on every write)."""
+        self._collection.flush()
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        path: str = "./flat_index",
+        **kwargs: Any
+    ) -> "FlatVectorStore":
+        store = cls(FlatIndex(path), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -3,15 +3,248 @@ PDF Ingestion Engine - Handles PDF parsing, chunking, and embedding generation
 """
 
 import os
-from typing import List, Optional
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import time
+import hashlib
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from pypdf import PdfReader
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
 import logging
 
+from .embedding_cache import CachedDocumentEmbeddings, EmbeddingCache
+from .embedding_scheduler import EmbeddingScheduler
+from .flat_index import FlatIndex, FlatVectorStore
+from .lexical_index import BM25Index
+from .metadata_index import MetadataIndex
+from .resources import EngineResources
+from .retrieval import STAGED_KEY, is_staged
+from .text_splitter import LinearTextSplitter
+
 logger = logging.getLogger(__name__)
 
+# Called with (source, chunk_ids) whenever ingestion changes the stored chunks
+IngestListener = Callable[[str, List[str]], None]
+
+# Called with the per-file record after each file of a directory ingestion
+ProgressCallback = Callable[[dict], None]
+
+
+def file_fingerprint(path: str, chunk_size: int, chunk_overlap: int) -> str:
+    """
+    Hash a file's bytes together with the splitter settings.
+    
+    Args:
+        path: File to hash
+        chunk_size: Size of text chunks in characters
+        chunk_overlap: Overlap between chunks
+        
+    Returns:
+        str: Hex SHA-256 fingerprint
+    """
+    digest = hashlib.sha256(f"{chunk_size}:{chunk_overlap}\x00".encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_hash(chunk: Document) -> str:
+    """Hash a chunk's text and page, the parts that change its embedding or citation."""
+    page = chunk.metadata.get("page", "")
+    return hashlib.sha256(f"{page}\x00{chunk.page_content}".encode("utf-8")).hexdigest()
+
+
+class ChunkIdSequence:
+    """Assigns stable chunk IDs (see ``stable_chunk_ids``) one chunk at a time."""
+    
+    def __init__(self, document_id: str):
+        self.document_id = document_id
+        self._seen: Counter = Counter()
+    
+    def next_id(self, content_hash: str) -> str:
+        """Return the ID of the next chunk in document order."""
+        occurrence = self._seen[content_hash]
+        self._seen[content_hash] += 1
+        key = f"{self.document_id}\x00{content_hash}\x00{occurrence}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+def stable_chunk_ids(document_id: str, hashes: List[str]) -> List[str]:
+    """
+    Derive chunk IDs from the document and the chunk contents.
+    
+    An unchanged chunk keeps its ID across re-ingestions wherever it moves
+    in the file; repeated identical chunks are told apart by occurrence.
+    
+    Args:
+        document_id: Stable identity of the source document
+        hashes: Chunk hashes in document order
+        
+    Returns:
+        List[str]: One ID per chunk
+    """
+    sequence = ChunkIdSequence(document_id)
+    return [sequence.next_id(content_hash) for content_hash in hashes]
+
+
+def iter_pdf_pages(pdf_path: str, metadata: Optional[dict] = None) -> Iterator[Document]:
+    """
+    Yield the pages of a PDF one at a time.
+    
+    Produces the same documents as ``PyPDFLoader``, which builds the list
+    of every page before returning the first one.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        metadata: Optional metadata added to every page
+        
+    Yields:
+        Document: Page text with its source and page number
+    """
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        for number, page in enumerate(reader.pages):
+            document = Document(
+                page_content=page.extract_text(),
+                metadata={"source": pdf_path, "page": number}
+            )
+            if metadata:
+                document.metadata.update(metadata)
+            yield document
+
+
+class PDFChunkStream:
+    """
+    Lazily loads and splits a PDF, one page at a time.
+    
+    Only the page being split and its chunks are held in memory. ``pages``,
+    ``chunks`` and ``parse_ms`` (time spent reading and splitting, not
+    consuming) grow as the stream is iterated.
+    """
+    
+    def __init__(
+        self,
+        pdf_path: str,
+        metadata: Optional[dict] = None,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200
+    ):
+        """
+        Initialize the chunk stream.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            metadata: Optional metadata added to every page
+            chunk_size: Size of text chunks in characters
+            chunk_overlap: Overlap between chunks
+        """
+        self.pdf_path = pdf_path
+        self.metadata = metadata
+        self.text_splitter = LinearTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", " ", ""]
+        )
+        self.pages = 0
+        self.chunks = 0
+        self.parse_ms = 0.0
+    
+    def __iter__(self) -> Iterator[Document]:
+        pages = iter_pdf_pages(self.pdf_path, self.metadata)
+        while True:
+            start = time.perf_counter()
+            page = next(pages, None)
+            if page is None:
+                self.parse_ms += (time.perf_counter() - start) * 1000
+                return
+            
+            # Pages are split one by one, exactly as split_documents splits a page list
+            chunks = self.text_splitter.split_documents([page])
+            self.parse_ms += (time.perf_counter() - start) * 1000
+            self.pages += 1
+            self.chunks += len(chunks)
+            yield from chunks
+
+
+@dataclass
+class ParsedChunks:
+    """Chunks of a PDF already split in full (e.g. by a worker process)."""
+    
+    pages: int
+    documents: List[Document]
+    parse_ms: float
+    
+    @property
+    def chunks(self) -> int:
+        return len(self.documents)
+    
+    def __iter__(self) -> Iterator[Document]:
+        return iter(self.documents)
+
+
+def _batched(items: Iterable, size: int) -> Iterator[list]:
+    """Group an iterable into lists of ``size`` items, consuming it lazily."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def load_and_split_pdf(
+    pdf_path: str,
+    metadata: Optional[dict] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200
+) -> Tuple[int, List[Document]]:
+    """
+    Load a PDF and split it into chunks.
+    
+    Module-level so it can run in a worker process.
+    
+    Args:
+        pdf_path: Path to the PDF file
+        metadata: Optional metadata added to every page
+        chunk_size: Size of text chunks in characters
+        chunk_overlap: Overlap between chunks
+        
+    Returns:
+        Tuple[int, List[Document]]: Number of pages and the chunks
+    """
+    stream = PDFChunkStream(pdf_path, metadata, chunk_size, chunk_overlap)
+    chunks = list(stream)
+    return stream.pages, chunks
+
+
+@dataclass
+class ChunkPlan:
+    """Changes needed to store a new version of a document."""
+    
+    source: str
+    document_id: str
+    existing: Dict[str, dict] = field(default_factory=dict)
+    added_ids: List[str] = field(default_factory=list)
+    added: List[Document] = field(default_factory=list)
+    unchanged_ids: List[str] = field(default_factory=list)
+    unchanged: List[Document] = field(default_factory=list)
+    removed_ids: List[str] = field(default_factory=list)
+    
+    def counts(self) -> dict:
+        return {
+            "added": len(self.added_ids),
+            "unchanged": len(self.unchanged_ids),
+            "removed": len(self.removed_ids)
+        }
+
 
 class PDFIngestionEngine:
     """
@@ -29,7 +262,16 @@ class PDFIngestionEngine:
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
         embedding_model: str = "text-embedding-3-small",
-        vector_db_path: str = "./chroma_db"
+        vector_db_path: str = "./chroma_db",
+        embeddings: Optional[Embeddings] = None,
+        lexical_index: Optional[BM25Index] = None,
+        embedding_scheduler: Optional[EmbeddingScheduler] = None,
+        chunk_embedding_cache: Optional[EmbeddingCache] = None,
+        stream_batch_size: int = 256,
+        vector_client=None,
+        flat_index: Optional[FlatIndex] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        resources: Optional[EngineResources] = None
     ):
         """
         Initialize the PDF ingestion engine.
@@ -39,28 +281,126 @@ class PDFIngestionEngine:
             chunk_overlap: Overlap between chunks for context preservation
             embedding_model: OpenAI embedding model to use
             vector_db_path: Path to store the vector database
+            embeddings: Shared embeddings client (created if not provided)
+            lexical_index: BM25 index kept in sync with the stored chunks
+            embedding_scheduler: Batches and rate-limits chunk embedding requests
+            chunk_embedding_cache: Store of chunk embeddings reused across ingestions
+            stream_batch_size: Chunks embedded and written at a time while a PDF is read
+            vector_client: Chroma client of a remote server (see
+                ``create_http_client``); None opens the embedded store at vector_db_path
+            flat_index: Memory-mapped index used instead of Chroma
+            metadata_index: Chunk IDs by program and source file, kept in sync
+                with the stored chunks
+            resources: Shared embeddings client and vector store; when given,
+                its database settings replace embeddings, vector_db_path,
+                vector_client and flat_index
         """
+        if resources is not None:
+            embeddings = resources.embeddings
+            vector_db_path = resources.vector_db_path
+            vector_client = resources.vector_client
+            flat_index = resources.flat_index
+        self.resources = resources
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.embedding_model = embedding_model
         self.vector_db_path = vector_db_path
+        self.lexical_index = lexical_index
+        self.embedding_scheduler = embedding_scheduler
+        self.stream_batch_size = stream_batch_size
+        self.vector_client = vector_client
+        self.flat_index = flat_index
+        self.metadata_index = metadata_index
         
         # Initialize embeddings
-        self.embeddings = OpenAIEmbeddings(
+        self.embeddings = embeddings or OpenAIEmbeddings(
             model=embedding_model,
             api_key=os.getenv("OPENAI_API_KEY")
         )
         
-        # Initialize vector store
-        self.vector_store = None
-        self._init_vector_store()
+        # Chunks come from the chunk cache first, then from the scheduler
+        self.document_embeddings = embedding_scheduler or self.embeddings
+        if chunk_embedding_cache is not None:
+            self.document_embeddings = CachedDocumentEmbeddings(
+                self.document_embeddings,
+                chunk_embedding_cache,
+                model_name=embedding_model
+            )
+        
+        # Initialize vector store (the shared one is opened by the registry)
+        self._vector_store = None
+        if self.resources is None:
+            self._init_vector_store()
+        
+        # Callbacks notified when stored chunks change
+        self._listeners: List[IngestListener] = []
+        
+        # One writer per document: jobs and the watcher may ingest the same
+        # document from several threads
+        self._document_locks: Dict[str, threading.Lock] = {}
+        self._document_locks_guard = threading.Lock()
+    
+    @property
+    def vector_store(self):
+        """The vector store chunks are written to."""
+        if self.resources is not None:
+            return self.resources.vector_store
+        return self._vector_store
+    
+    @vector_store.setter
+    def vector_store(self, store):
+        if self.resources is not None:
+            self.resources.vector_store = store
+        else:
+            self._vector_store = store
+    
+    @contextmanager
+    def _document_lock(self, document_id: str):
+        """Hold the lock that serializes reads and writes of one document's chunks."""
+        with self._document_locks_guard:
+            lock = self._document_locks.setdefault(document_id, threading.Lock())
+        with lock:
+            yield
+    
+    def persist(self):
+        """Flush the embedded vector store to disk (the Chroma server persists on its own)."""
+        if self.vector_store is not None and self.vector_client is None:
+            self.vector_store.persist()
+    
+    def add_ingest_listener(self, listener: IngestListener):
+        """
+        Register a callback notified after a PDF changes the stored chunks.
+        
+        Args:
+            listener: Callable receiving the source path and the changed chunk IDs
+        """
+        self._listeners.append(listener)
+    
+    def _notify_listeners(self, source: str, chunk_ids: List[str]):
+        """Notify registered listeners, never failing the ingestion."""
+        for listener in self._listeners:
+            try:
+                listener(source, chunk_ids)
+            except Exception as e:
+                logger.warning(f"Ingest listener failed for {source}: {e}")
     
     def _init_vector_store(self):
         """Initialize or load existing vector store."""
         try:
+            if self.flat_index is not None:
+                self.vector_store = FlatVectorStore(self.flat_index, self.document_embeddings)
+                logger.info(f"Using flat index at {self.flat_index.path}")
+                return
+            if self.vector_client is not None:
+                self.vector_store = Chroma(
+                    client=self.vector_client,
+                    embedding_function=self.document_embeddings
+                )
+                logger.info("Connected to the Chroma server")
+                return
             self.vector_store = Chroma(
                 persist_directory=self.vector_db_path,
-                embedding_function=self.embeddings
+                embedding_function=self.document_embeddings
             )
             logger.info(f"Loaded existing vector store from {self.vector_db_path}")
         except Exception as e:
@@ -75,6 +415,9 @@ class PDFIngestionEngine:
         """
         Ingest a single PDF file.
         
+        Re-ingesting a file only replaces the chunks that changed; an
+        unchanged file is skipped (see ``ingest_file`` for the counts).
+        
         Args:
             pdf_path: Path to the PDF file
             metadata: Optional metadata (e.g., program name, update date)
@@ -82,88 +425,946 @@ class PDFIngestionEngine:
         Returns:
             bool: True if successful, False otherwise
         """
+        return self.ingest_file(pdf_path, metadata)["success"]
+    
+    def ingest_file(
+        self,
+        pdf_path: str,
+        metadata: Optional[dict] = None,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> dict:
+        """
+        Ingest a single PDF file and report what changed.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            metadata: Optional metadata (e.g., program name, update date)
+            progress_callback: Called with the running record after each batch is stored
+            
+        Returns:
+            dict: Record with success, skipped and added/unchanged/removed counts
+        """
+        record = self._new_record(os.path.basename(pdf_path))
+        
         # Validate PDF file
         if not pdf_path.lower().endswith('.pdf'):
             logger.error(f"Invalid file type. Expected PDF, got {pdf_path}")
-            return False
+            record["error"] = "Invalid file type"
+            return record
         
         if not os.path.exists(pdf_path):
             logger.error(f"PDF file not found: {pdf_path}")
-            return False
+            record["error"] = "File not found"
+            return record
+        
+        self._ingest_parsed(
+            record, pdf_path, metadata,
+            lambda: PDFChunkStream(
+                pdf_path, metadata, self.chunk_size, self.chunk_overlap
+            ),
+            on_progress=progress_callback
+        )
+        if record["success"] and not record["skipped"]:
+            logger.info(f"Successfully ingested {pdf_path}")
+        return record
+    
+    @staticmethod
+    def _new_record(file_name: str) -> dict:
+        return {
+            "file": file_name,
+            "success": False,
+            "skipped": False,
+            "pages": 0,
+            "chunks": 0,
+            "added": 0,
+            "unchanged": 0,
+            "removed": 0,
+            "embedding_cache_hits": 0,
+            "embedding_cache_misses": 0,
+            "parse_ms": 0.0,
+            "store_ms": 0.0
+        }
+    
+    @staticmethod
+    def _document_id(pdf_path: str, metadata: Optional[dict]) -> str:
+        """
+        Identity of a document across uploads: its file name.
+        
+        Files of a watched folder (``source_dir`` metadata) are identified
+        by their path in it, so they never replace or remove an upload
+        with the same file name.
+        """
+        metadata = metadata or {}
+        if metadata.get("source_dir"):
+            return os.path.join(metadata["source_dir"], os.path.basename(pdf_path))
+        return metadata.get("source_file") or os.path.basename(pdf_path)
+    
+    def _existing_chunks(self, document_id: str) -> Dict[str, dict]:
+        """Return the stored chunk IDs and metadata of a document."""
+        if self.vector_store is None:
+            return {}
+        stored = self.vector_store._collection.get(
+            where={"document_id": document_id},
+            include=["metadatas"]
+        )
+        return dict(zip(stored["ids"], stored["metadatas"]))
+    
+    def stored_document_ids(self, where: Optional[dict] = None) -> List[str]:
+        """
+        List the documents that have chunks in the vector store.
+        
+        Args:
+            where: Optional Chroma metadata filter (e.g. ``{"source_dir": path}``)
+            
+        Returns:
+            List[str]: Document IDs, sorted
+        """
+        if self.vector_store is None:
+            return []
+        stored = self.vector_store._collection.get(where=where, include=["metadatas"])
+        return sorted({
+            metadata["document_id"]
+            for metadata in stored["metadatas"]
+            if metadata and metadata.get("document_id")
+        })
+    
+    def remove_document(self, document_id: str, persist: bool = True) -> int:
+        """
+        Remove every stored chunk of a document (e.g. its file was deleted).
+        
+        Args:
+            document_id: Stable identity of the document
+            persist: Whether to persist the vector store afterwards
+            
+        Returns:
+            int: Number of removed chunks
+        """
+        with self._document_lock(document_id):
+            existing = self._existing_chunks(document_id)
+            if not existing:
+                return 0
+            
+            source = next(iter(existing.values())) or {}
+            plan = ChunkPlan(
+                source=source.get("source", document_id),
+                document_id=document_id,
+                existing=existing,
+                removed_ids=list(existing)
+            )
+            self.vector_store.delete(ids=plan.removed_ids)
+            if persist:
+                self.persist()
+            self._publish(plan)
+        return len(plan.removed_ids)
+    
+    def _ingest_parsed(
+        self,
+        record: dict,
+        pdf_path: str,
+        metadata: Optional[dict],
+        parse: Callable[[], Iterable[Document]],
+        fingerprint: Optional[str] = None,
+        persist: bool = True,
+        on_progress: Optional[ProgressCallback] = None
+    ):
+        """
+        Parse a file (unless unchanged) and sync its chunks, filling in the record.
+        
+        The document's stored chunks are read and replaced under its lock,
+        so concurrent ingestions of one document never diff against the
+        same stored version.
         
+        Args:
+            record: Per-file record to update
+            pdf_path: Path to the PDF file
+            metadata: Metadata added to every chunk
+            parse: Returns the file's chunks (a PDFChunkStream or ParsedChunks)
+            fingerprint: File fingerprint, computed if not given
+            persist: Whether to persist the vector store afterwards
+            on_progress: Called with the running record after each batch is stored
+        """
         try:
-            # Load PDF
-            loader = PyPDFLoader(pdf_path)
-            documents = loader.load()
-            logger.info(f"Loaded {len(documents)} pages from {pdf_path}")
+            document_id = self._document_id(pdf_path, metadata)
+            if fingerprint is None:
+                fingerprint = file_fingerprint(pdf_path, self.chunk_size, self.chunk_overlap)
             
-            # Add metadata to documents
-            if metadata:
-                for doc in documents:
-                    doc.metadata.update(metadata)
-            
-            # Split into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                separators=["\n\n", "\n", " ", ""]
+            with self._document_lock(document_id):
+                existing = self._existing_chunks(document_id)
+                if self._is_unchanged(existing, fingerprint):
+                    record.update(success=True, skipped=True, unchanged=len(existing))
+                    logger.info(f"Skipping unchanged file {pdf_path}")
+                    return
+                
+                start = time.perf_counter()
+                chunks = parse()
+                
+                def on_batch(counts: dict):
+                    record.update(pages=chunks.pages, chunks=chunks.chunks, parse_ms=chunks.parse_ms, **counts)
+                    if on_progress is not None:
+                        on_progress(dict(record))
+                
+                record.update(self._sync_chunks(
+                    pdf_path, document_id, fingerprint, chunks, existing, persist, on_batch
+                ))
+            record.update(pages=chunks.pages, chunks=chunks.chunks, parse_ms=chunks.parse_ms)
+            # Parsing and storing interleave, so storing is the time parsing did not take
+            record["store_ms"] = max((time.perf_counter() - start) * 1000 - chunks.parse_ms, 0.0)
+            record["success"] = True
+            logger.info(f"Loaded {chunks.pages} pages from {pdf_path}, split into {chunks.chunks} chunks")
+        except Exception as e:
+            logger.error(f"Error ingesting PDF {pdf_path}: {str(e)}")
+            record["error"] = str(e)
+    
+    @staticmethod
+    def _is_unchanged(existing: Dict[str, dict], fingerprint: str) -> bool:
+        # Staged chunks left by a failed bulk import are hidden, so they need a re-sync
+        return bool(existing) and all(
+            (stored or {}).get("file_hash") == fingerprint and not is_staged(stored)
+            for stored in existing.values()
+        )
+    
+    def _plan_chunks(
+        self,
+        source: str,
+        document_id: str,
+        fingerprint: str,
+        chunks: List[Document],
+        existing: Dict[str, dict]
+    ) -> ChunkPlan:
+        """
+        Diff a new version of a document against its stored chunks.
+        
+        Args:
+            source: Path of the file the chunks come from
+            document_id: Stable identity of the document
+            fingerprint: Fingerprint of the new file version
+            chunks: Chunks of the new file version
+            existing: Stored chunks of the document (ID to metadata)
+            
+        Returns:
+            ChunkPlan: Chunks to add, refresh and remove
+        """
+        plan = ChunkPlan(source=source, document_id=document_id, existing=existing)
+        self._extend_plan(plan, fingerprint, chunks, ChunkIdSequence(document_id))
+        
+        # Duplicate texts within a file map to distinct IDs, so this is a plain diff
+        current = set(plan.added_ids) | set(plan.unchanged_ids)
+        plan.removed_ids = [chunk_id for chunk_id in existing if chunk_id not in current]
+        return plan
+    
+    @staticmethod
+    def _extend_plan(
+        plan: ChunkPlan,
+        fingerprint: str,
+        chunks: Iterable[Document],
+        chunk_ids: ChunkIdSequence
+    ):
+        """
+        Tag the next chunks of a document and sort them into added or unchanged.
+        
+        Args:
+            plan: Plan to extend
+            fingerprint: Fingerprint of the new file version
+            chunks: Next chunks of the new file version, in document order
+            chunk_ids: ID sequence of the document, continued across calls
+        """
+        for chunk in chunks:
+            content_hash = chunk_hash(chunk)
+            chunk_id = chunk_ids.next_id(content_hash)
+            chunk.metadata.update({
+                "document_id": plan.document_id,
+                "file_hash": fingerprint,
+                "chunk_hash": content_hash,
+                STAGED_KEY: False
+            })
+            # Listeners get the source recorded in the chunks (metadata may override the path)
+            if not plan.added_ids and not plan.unchanged_ids:
+                plan.source = chunk.metadata.get("source", plan.source)
+            if chunk_id in plan.existing:
+                plan.unchanged_ids.append(chunk_id)
+                plan.unchanged.append(chunk)
+            else:
+                plan.added_ids.append(chunk_id)
+                plan.added.append(chunk)
+    
+    def _index_chunks(self, plan: ChunkPlan):
+        """Apply a stored plan's chunks to the lexical and metadata indexes."""
+        if self.metadata_index is not None:
+            self.metadata_index.remove(plan.removed_ids)
+            if plan.added:
+                self.metadata_index.add(plan.added_ids, [chunk.metadata for chunk in plan.added])
+            if plan.unchanged:
+                self.metadata_index.add(plan.unchanged_ids, [chunk.metadata for chunk in plan.unchanged])
+        
+        if self.lexical_index is None:
+            return
+        if plan.removed_ids:
+            self.lexical_index.remove(plan.removed_ids)
+        if plan.added:
+            self.lexical_index.add(
+                plan.added_ids,
+                [chunk.page_content for chunk in plan.added],
+                [chunk.metadata for chunk in plan.added]
+            )
+    
+    def _publish(self, plan: ChunkPlan):
+        """Update the lexical index and listeners once a plan is stored."""
+        self._index_chunks(plan)
+        
+        if plan.added_ids or plan.removed_ids:
+            self._notify_listeners(plan.source, plan.added_ids + plan.removed_ids)
+        
+        logger.info(
+            f"{plan.document_id}: {len(plan.added_ids)} chunks added, "
+            f"{len(plan.unchanged_ids)} unchanged, {len(plan.removed_ids)} removed"
+        )
+    
+    def _sync_chunks(
+        self,
+        source: str,
+        document_id: str,
+        fingerprint: str,
+        chunks: Iterable[Document],
+        existing: Dict[str, dict],
+        persist: bool = True,
+        on_batch: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        Make the stored chunks of a document match a new version of it.
+        
+        New chunks are embedded and added, chunks no longer present are
+        removed, and unchanged chunks only get their metadata refreshed.
+        Chunks are consumed ``stream_batch_size`` at a time and each batch
+        is stored before the next one is read, so a PDFChunkStream never
+        holds more than a page and a batch of chunks in memory.
+        
+        Stale chunks are removed last, so the document is never missing.
+        If the sync is interrupted, the stored chunks keep mixed file
+        hashes and the next ingestion of the file completes it; listeners
+        are still notified of the chunks written before the failure.
+        
+        Args:
+            source: Path of the file the chunks come from
+            document_id: Stable identity of the document
+            fingerprint: Fingerprint of the new file version
+            chunks: Chunks of the new file version, in document order
+            existing: Stored chunks of the document (ID to metadata)
+            persist: Whether to persist the vector store afterwards
+            on_batch: Called with the running counts after each stored batch
+            
+        Returns:
+            dict: Added, unchanged and removed chunk counts
+        """
+        chunk_ids = ChunkIdSequence(document_id)
+        summary = ChunkPlan(source=source, document_id=document_id, existing=existing)
+        cache_before = self._embedding_cache_counters()
+        # IDs of chunks that may have reached the store, for listeners if the sync fails
+        written: List[str] = []
+        published = False
+        
+        try:
+            for batch in _batched(chunks, self.stream_batch_size):
+                plan = ChunkPlan(source=source, document_id=document_id, existing=existing)
+                self._extend_plan(plan, fingerprint, batch, chunk_ids)
+                if not summary.added_ids and not summary.unchanged_ids:
+                    summary.source = plan.source
+                written.extend(plan.added_ids)
+                self._store_batch(plan)
+                self._index_chunks(plan)
+                
+                summary.added_ids.extend(plan.added_ids)
+                summary.unchanged_ids.extend(plan.unchanged_ids)
+                if on_batch is not None:
+                    on_batch(summary.counts())
+            
+            cache_hits, cache_misses = (
+                after - before for after, before in zip(self._embedding_cache_counters(), cache_before)
             )
-            chunks = text_splitter.split_documents(documents)
-            logger.info(f"Split into {len(chunks)} chunks")
+            current = set(summary.added_ids) | set(summary.unchanged_ids)
+            summary.removed_ids = [chunk_id for chunk_id in existing if chunk_id not in current]
+            written.extend(summary.removed_ids)
+            if summary.removed_ids:
+                self.vector_store.delete(ids=summary.removed_ids)
             
-            # Store in vector database
+            if persist:
+                self.persist()
+            
+            self._publish(summary)
+            published = True
+        finally:
+            if not published and written:
+                # Queries already see the stored batches, so caches built before them are stale
+                self._notify_listeners(summary.source, written)
+        return {
+            **summary.counts(),
+            "embedding_cache_hits": cache_hits,
+            "embedding_cache_misses": cache_misses
+        }
+    
+    def _store_batch(self, plan: ChunkPlan):
+        """Embed and add a batch's new chunks and refresh its unchanged ones."""
+        if plan.added:
             if self.vector_store is None:
                 self.vector_store = Chroma.from_documents(
-                    documents=chunks,
-                    embedding=self.embeddings,
-                    persist_directory=self.vector_db_path
+                    documents=plan.added,
+                    embedding=self.document_embeddings,
+                    ids=plan.added_ids,
+                    persist_directory=None if self.vector_client is not None else self.vector_db_path,
+                    client=self.vector_client
                 )
             else:
-                self.vector_store.add_documents(chunks)
+                # Embedded here, not by the store, which may be shared with
+                # the query engine and carry its embedding function
+                embeddings = self.document_embeddings.embed_documents(
+                    [chunk.page_content for chunk in plan.added]
+                )
+                self.vector_store._collection.upsert(
+                    ids=plan.added_ids,
+                    embeddings=embeddings,
+                    documents=[chunk.page_content for chunk in plan.added],
+                    metadatas=[chunk.metadata for chunk in plan.added]
+                )
+        if plan.unchanged_ids:
+            self.vector_store._collection.update(
+                ids=plan.unchanged_ids,
+                metadatas=[chunk.metadata for chunk in plan.unchanged]
+            )
+    
+    def _embedding_cache_counters(self) -> Tuple[int, int]:
+        """Return the chunk cache (hits, misses), or zeros without a cache."""
+        if isinstance(self.document_embeddings, CachedDocumentEmbeddings):
+            return self.document_embeddings.counters()
+        return 0, 0
+    
+    def transaction(self, write_batch_size: int = 5000) -> "IngestTransaction":
+        """
+        Open a bulk ingestion transaction.
+        
+        Usage::
+        
+            with engine.transaction() as txn:
+                for path in paths:
+                    txn.add(path)
+        
+        Args:
+            write_batch_size: Chunks per vector store write
             
-            self.vector_store.persist()
-            logger.info(f"Successfully ingested {pdf_path}")
-            return True
+        Returns:
+            IngestTransaction: Transaction that commits on a clean exit
+        """
+        return IngestTransaction(self, write_batch_size)
+    
+    def ingest_many(
+        self,
+        pdf_paths: List[str],
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """
+        Ingest several PDFs all-or-nothing, persisting once.
+        
+        Args:
+            pdf_paths: PDF files to ingest
+            metadata: Optional metadata added to every file's chunks
             
+        Returns:
+            dict: Transaction statistics; ``success`` is False and nothing is
+                stored if any file fails
+        """
+        txn = self.transaction()
+        try:
+            with txn:
+                for pdf_path in pdf_paths:
+                    txn.add(pdf_path, {
+                        **(metadata or {}),
+                        "source_file": os.path.basename(pdf_path),
+                        "file_type": "pdf"
+                    })
         except Exception as e:
-            logger.error(f"Error ingesting PDF {pdf_path}: {str(e)}")
-            return False
+            logger.error(f"Bulk ingestion rolled back: {str(e)}")
+            return {**txn.stats(), "success": False, "error": str(e)}
+        return {**txn.stats(), "success": True}
     
-    def ingest_multiple_pdfs(self, pdf_dir: str) -> dict:
+    def ingest_multiple_pdfs(
+        self,
+        pdf_dir: str,
+        workers: int = 1,
+        progress_callback: Optional[ProgressCallback] = None
+    ) -> dict:
         """
         Ingest all PDFs from a directory.
         
+        See ``ingest_files`` for how the files are parsed and stored.
+        
         Args:
             pdf_dir: Directory containing PDF files
+            workers: Processes used to parse and split PDFs
+            progress_callback: Called with each file's record as it completes
             
         Returns:
-            dict: Statistics of ingestion process
+            dict: Statistics of ingestion process, with a record per file
         """
-        stats = {
+        if not os.path.isdir(pdf_dir):
+            stats = self._new_stats(workers)
+            stats["errors"].append(f"Directory not found: {pdf_dir}")
+            return stats
+        
+        pdf_files = sorted(f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf'))
+        stats = self.ingest_files(
+            [os.path.join(pdf_dir, pdf_file) for pdf_file in pdf_files],
+            workers=workers,
+            progress_callback=progress_callback
+        )
+        logger.info(
+            f"Ingested {stats['successful']}/{stats['total']} PDFs from {pdf_dir} "
+            f"({stats['skipped']} unchanged) in {stats['elapsed_ms']:.0f} ms "
+            f"with {workers} worker(s)"
+        )
+        return stats
+    
+    @staticmethod
+    def _new_stats(workers: int) -> dict:
+        return {
             "total": 0,
             "successful": 0,
             "failed": 0,
-            "errors": []
+            "skipped": 0,
+            "chunks_added": 0,
+            "chunks_unchanged": 0,
+            "chunks_removed": 0,
+            "embedding_cache_hits": 0,
+            "embedding_cache_misses": 0,
+            "embedding_cache_hit_ratio": 0.0,
+            "errors": [],
+            "files": [],
+            "workers": workers,
+            "elapsed_ms": 0.0
         }
+    
+    def ingest_files(
+        self,
+        pdf_paths: List[str],
+        workers: int = 1,
+        progress_callback: Optional[ProgressCallback] = None,
+        metadata: Optional[dict] = None
+    ) -> dict:
+        """
+        Ingest a batch of PDFs, each file succeeding or failing on its own.
         
-        if not os.path.isdir(pdf_dir):
-            stats["errors"].append(f"Directory not found: {pdf_dir}")
-            return stats
+        With one worker each PDF streams into the vector store page by page
+        (see ``PDFChunkStream``). With ``workers > 1`` PDFs are parsed and
+        split in a process pool while this process embeds and writes each
+        file's chunks as they arrive, so the vector store keeps a single
+        writer. Unchanged files are skipped before parsing, and the vector
+        store is persisted once at the end.
         
-        pdf_files = [f for f in os.listdir(pdf_dir) if f.lower().endswith('.pdf')]
-        stats["total"] = len(pdf_files)
+        Args:
+            pdf_paths: PDF files to ingest
+            workers: Processes used to parse and split PDFs
+            progress_callback: Called with each file's record as it completes
+            metadata: Optional metadata added to every file's chunks
+            
+        Returns:
+            dict: Statistics of ingestion process, with a record per file
+        """
+        stats = self._new_stats(workers)
+        stats["total"] = len(pdf_paths)
+        start = time.perf_counter()
         
-        for pdf_file in pdf_files:
-            pdf_path = os.path.join(pdf_dir, pdf_file)
-            metadata = {
+        # Check fingerprints up front so unchanged files are never parsed
+        jobs = []
+        for pdf_path in pdf_paths:
+            pdf_file = os.path.basename(pdf_path)
+            file_metadata = {
+                **(metadata or {}),
                 "source_file": pdf_file,
                 "file_type": "pdf"
             }
+            record = self._new_record(pdf_file)
+            try:
+                fingerprint = file_fingerprint(pdf_path, self.chunk_size, self.chunk_overlap)
+                existing = self._existing_chunks(self._document_id(pdf_path, file_metadata))
+            except Exception as e:
+                logger.error(f"Error ingesting PDF {pdf_path}: {str(e)}")
+                record["error"] = str(e)
+                self._record_file(stats, record, progress_callback)
+                continue
+            if self._is_unchanged(existing, fingerprint):
+                record.update(success=True, skipped=True, unchanged=len(existing))
+                self._record_file(stats, record, progress_callback)
+                continue
+            jobs.append((record, pdf_path, file_metadata, fingerprint))
+        
+        def ingest(job, parse):
+            record, pdf_path, metadata, fingerprint = job
+            self._ingest_parsed(
+                record, pdf_path, metadata, parse,
+                fingerprint=fingerprint, persist=False
+            )
+            self._record_file(stats, record, progress_callback)
+        
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {
+                    executor.submit(
+                        _timed_load_and_split, job[1], job[2],
+                        self.chunk_size, self.chunk_overlap
+                    ): job
+                    for job in jobs
+                }
+                for future in as_completed(futures):
+                    ingest(futures[future], lambda: ParsedChunks(*future.result()))
+        else:
+            # Serially, each file streams page by page into the vector store
+            for job in jobs:
+                ingest(job, lambda: PDFChunkStream(
+                    job[1], job[2], self.chunk_size, self.chunk_overlap
+                ))
+        
+        if stats["chunks_added"] + stats["chunks_removed"]:
+            self.persist()
+        
+        lookups = stats["embedding_cache_hits"] + stats["embedding_cache_misses"]
+        if lookups:
+            stats["embedding_cache_hit_ratio"] = stats["embedding_cache_hits"] / lookups
+        stats["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return stats
+    
+    @staticmethod
+    def _record_file(
+        stats: dict,
+        record: dict,
+        progress_callback: Optional[ProgressCallback]
+    ):
+        """
+        Add one file's outcome to the directory stats and report progress.
+        
+        Args:
+            stats: Directory ingestion stats to update
+            record: Per-file record
+            progress_callback: Called with the file record
+        """
+        if record["success"]:
+            stats["successful"] += 1
+            stats["skipped"] += record["skipped"]
+            stats["chunks_added"] += record["added"]
+            stats["chunks_unchanged"] += record["unchanged"]
+            stats["chunks_removed"] += record["removed"]
+            stats["embedding_cache_hits"] += record["embedding_cache_hits"]
+            stats["embedding_cache_misses"] += record["embedding_cache_misses"]
+        else:
+            stats["failed"] += 1
+            stats["errors"].append(f"Failed to ingest {record['file']}")
+        stats["files"].append(record)
+        
+        logger.info(
+            f"[{len(stats['files'])}/{stats['total']}] {record['file']}: "
+            f"{record['added']} added, {record['unchanged']} unchanged, "
+            f"{record['removed']} removed, parse {record['parse_ms']:.0f} ms, "
+            f"store {record['store_ms']:.0f} ms"
+        )
+        if progress_callback is not None:
+            try:
+                progress_callback(dict(record))
+            except Exception as e:
+                logger.warning(f"Progress callback failed for {record['file']}: {e}")
+
+
+def _timed_load_and_split(
+    pdf_path: str,
+    metadata: dict,
+    chunk_size: int,
+    chunk_overlap: int
+) -> Tuple[int, List[Document], float]:
+    """Run load_and_split_pdf and return its duration in milliseconds too."""
+    start = time.perf_counter()
+    pages, chunks = load_and_split_pdf(pdf_path, metadata, chunk_size, chunk_overlap)
+    return pages, chunks, (time.perf_counter() - start) * 1000
+
+
+class IngestTransaction:
+    """
+    Stages many PDFs and stores them in one commit.
+    
+    ``add`` parses and diffs each file without touching the vector store.
+    ``commit`` locks every staged document, re-diffs the files whose
+    stored chunks changed since ``add``, embeds every new chunk in one
+    scheduled call and writes them in large batches flagged as staged,
+    which queries and index loads skip. A single metadata update then
+    makes the whole import visible and hides the chunks it replaces, so
+    queries see either none or all of it; the hidden chunks are deleted
+    afterwards. A failed commit deletes its staged chunks, and staged
+    chunks a failed undo leaves behind stay hidden until the next
+    ingestion of their document replaces them. The lexical index and
+    ingest listeners are only updated after a successful commit.
+    """
+    
+    def __init__(self, engine: PDFIngestionEngine, write_batch_size: int = 5000):
+        """
+        Initialize the transaction.
+        
+        Args:
+            engine: Ingestion engine whose vector store is written
+            write_batch_size: Chunks per vector store write
+        """
+        self.engine = engine
+        self.write_batch_size = write_batch_size
+        self.state = "open"
+        
+        self.plans: List[ChunkPlan] = []
+        self.records: List[dict] = []
+        self._files: List[tuple] = []
+        self._document_ids = set()
+        self._timings = {"embed_ms": 0.0, "write_ms": 0.0}
+        self._cache_counts = (0, 0)
+    
+    def __enter__(self) -> "IngestTransaction":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is not None:
+            self.rollback()
+        elif self.state == "open":
+            self.commit()
+        return False
+    
+    def _check_open(self):
+        if self.state != "open":
+            raise RuntimeError(f"Transaction already {self.state}")
+    
+    def add(self, pdf_path: str, metadata: Optional[dict] = None) -> dict:
+        """
+        Parse a PDF and stage its chunk changes.
+        
+        Args:
+            pdf_path: Path to the PDF file
+            metadata: Optional metadata added to every chunk
             
-            if self.ingest_pdf(pdf_path, metadata):
-                stats["successful"] += 1
-            else:
-                stats["failed"] += 1
-                stats["errors"].append(f"Failed to ingest {pdf_file}")
+        Returns:
+            dict: Per-file record of the staged changes
+            
+        Raises:
+            ValueError: If the file is not a readable PDF or is staged twice
+        """
+        self._check_open()
+        engine = self.engine
+        
+        if not pdf_path.lower().endswith('.pdf'):
+            raise ValueError(f"Invalid file type. Expected PDF, got {pdf_path}")
+        if not os.path.exists(pdf_path):
+            raise ValueError(f"PDF file not found: {pdf_path}")
+        
+        document_id = engine._document_id(pdf_path, metadata)
+        if document_id in self._document_ids:
+            raise ValueError(f"Document staged twice: {document_id}")
+        self._document_ids.add(document_id)
+        
+        record = engine._new_record(os.path.basename(pdf_path))
+        self.records.append(record)
+        
+        fingerprint = file_fingerprint(pdf_path, engine.chunk_size, engine.chunk_overlap)
+        existing = engine._existing_chunks(document_id)
+        if engine._is_unchanged(existing, fingerprint):
+            self._files.append((record, pdf_path, metadata, document_id, fingerprint, None))
+            record.update(success=True, skipped=True, unchanged=len(existing))
+            return record
+        
+        pages, chunks, parse_ms = _timed_load_and_split(
+            pdf_path, metadata, engine.chunk_size, engine.chunk_overlap
+        )
+        self._files.append((record, pdf_path, metadata, document_id, fingerprint, chunks))
+        plan = engine._plan_chunks(pdf_path, document_id, fingerprint, chunks, existing)
+        self.plans.append(plan)
+        record.update(pages=pages, chunks=len(chunks), parse_ms=parse_ms, success=True, **plan.counts())
+        return record
+    
+    def _batches(self, items: list) -> Iterator[list]:
+        for start in range(0, len(items), self.write_batch_size):
+            yield items[start:start + self.write_batch_size]
+    
+    def _replan(self):
+        """Re-diff the staged files whose stored chunks changed since ``add``."""
+        engine = self.engine
+        staged = {plan.document_id: plan for plan in self.plans}
+        plans = []
+        for record, pdf_path, metadata, document_id, fingerprint, chunks in self._files:
+            existing = engine._existing_chunks(document_id)
+            plan = staged.get(document_id)
+            if plan is not None and plan.existing == existing:
+                plans.append(plan)
+                continue
+            if engine._is_unchanged(existing, fingerprint):
+                record.update(skipped=True, added=0, removed=0, unchanged=len(existing))
+                continue
+            
+            if chunks is None:
+                pages, chunks, parse_ms = _timed_load_and_split(
+                    pdf_path, metadata, engine.chunk_size, engine.chunk_overlap
+                )
+                record.update(skipped=False, pages=pages, chunks=len(chunks), parse_ms=parse_ms)
+            plan = engine._plan_chunks(pdf_path, document_id, fingerprint, chunks, existing)
+            record.update(**plan.counts())
+            plans.append(plan)
+        self.plans = plans
+    
+    def commit(self) -> dict:
+        """
+        Embed and write every staged change, then make it visible at once.
+        
+        The flip is one vector store request, so a transaction can change
+        at most the backend's maximum batch size of chunks (Chroma's
+        ``max_batch_size``).
+        
+        Returns:
+            dict: Transaction statistics
+            
+        Raises:
+            Exception: The write error, after the staged writes were undone
+        """
+        self._check_open()
+        engine = self.engine
+        if engine.vector_store is None:
+            self._abort()
+            raise RuntimeError("Vector store not initialized")
+        collection = engine.vector_store._collection
         
+        # Ingestions of the staged documents wait until the commit is over
+        with ExitStack() as locks:
+            for document_id in sorted(self._document_ids):
+                locks.enter_context(engine._document_lock(document_id))
+            return self._commit_locked(collection)
+    
+    def _commit_locked(self, collection) -> dict:
+        """Commit with every staged document locked."""
+        engine = self.engine
+        try:
+            self._replan()
+            
+            # Embed everything before the first write, so a failure here stores nothing
+            added = [chunk for plan in self.plans for chunk in plan.added]
+            start = time.perf_counter()
+            cache_before = engine._embedding_cache_counters()
+            embeddings = engine.document_embeddings.embed_documents(
+                [chunk.page_content for chunk in added]
+            ) if added else []
+            self._cache_counts = tuple(
+                after - before for after, before in zip(engine._embedding_cache_counters(), cache_before)
+            )
+            self._timings["embed_ms"] = (time.perf_counter() - start) * 1000
+        except Exception:
+            self._abort()
+            raise
+        
+        added_ids = [chunk_id for plan in self.plans for chunk_id in plan.added_ids]
+        unchanged_ids = [chunk_id for plan in self.plans for chunk_id in plan.unchanged_ids]
+        unchanged = [chunk for plan in self.plans for chunk in plan.unchanged]
+        removed_ids = [chunk_id for plan in self.plans for chunk_id in plan.removed_ids]
+        previous = {}
+        for plan in self.plans:
+            previous.update(plan.existing)
+        
+        start = time.perf_counter()
+        written, flipped = {}, False
+        try:
+            rows = [
+                (chunk_id, embedding, chunk.page_content, {**chunk.metadata, STAGED_KEY: True})
+                for chunk_id, embedding, chunk in zip(added_ids, embeddings, added)
+            ]
+            for batch in self._batches(rows):
+                collection.upsert(
+                    ids=[row[0] for row in batch],
+                    embeddings=[row[1] for row in batch],
+                    documents=[row[2] for row in batch],
+                    metadatas=[row[3] for row in batch]
+                )
+                written.update((row[0], row[3]) for row in batch)
+            
+            # One update shows the new version of every document and hides the old one
+            if added_ids or unchanged_ids or removed_ids:
+                flipped = True
+                collection.update(
+                    ids=added_ids + unchanged_ids + removed_ids,
+                    metadatas=(
+                        [{**chunk.metadata, STAGED_KEY: False} for chunk in added + unchanged]
+                        + [{**(previous[chunk_id] or {}), STAGED_KEY: True} for chunk_id in removed_ids]
+                    )
+                )
+            engine.persist()
+        except Exception as e:
+            logger.error(f"Bulk ingestion commit failed, rolling back: {str(e)}")
+            restored = {chunk_id: previous[chunk_id] for chunk_id in unchanged_ids + removed_ids} if flipped else None
+            self._undo(collection, written, restored)
+            self._abort()
+            raise
+        
+        # The replaced chunks are hidden already; deleting them only frees space
+        try:
+            for batch in self._batches(removed_ids):
+                collection.delete(ids=batch)
+        except Exception as e:
+            logger.warning(f"Could not delete chunks replaced by bulk ingestion: {str(e)}")
+        self._timings["write_ms"] = (time.perf_counter() - start) * 1000
+        
+        self.state = "committed"
+        for plan in self.plans:
+            engine._publish(plan)
+        logger.info(
+            f"Committed {len(self.records)} PDFs: {len(added_ids)} chunks added, "
+            f"{len(unchanged_ids)} unchanged, {len(removed_ids)} removed"
+        )
+        return self.stats()
+    
+    def _undo(self, collection, written: Dict[str, dict], restored: Optional[Dict[str, dict]]):
+        """
+        Revert a failed commit.
+        
+        Args:
+            collection: Collection the commit wrote to
+            written: Staged chunks written (ID to staged metadata)
+            restored: Previous metadata of the chunks the flip changed, or
+                None if the flip was never sent
+        """
+        try:
+            # Reverse the flip in one update too, then drop the staged chunks
+            if restored is not None:
+                collection.update(
+                    ids=list(written) + list(restored),
+                    metadatas=list(written.values()) + [
+                        {**(metadata or {}), STAGED_KEY: is_staged(metadata)}
+                        for metadata in restored.values()
+                    ]
+                )
+            for batch in self._batches(list(written)):
+                collection.delete(ids=batch)
+            self.engine.persist()
+        except Exception as e:
+            logger.error(f"Could not fully roll back bulk ingestion: {str(e)}")
+    
+    def rollback(self):
+        """Discard the staged changes (nothing has been written before commit)."""
+        if self.state == "open":
+            self._abort()
+    
+    def _abort(self):
+        self.state = "rolled back"
+        for record in self.records:
+            record["success"] = False
+    
+    def stats(self) -> dict:
+        """Return the transaction statistics."""
+        stats = {
+            "state": self.state,
+            "total": len(self.records),
+            "skipped": sum(record["skipped"] for record in self.records),
+            "chunks_added": sum(record["added"] for record in self.records),
+            "chunks_unchanged": sum(record["unchanged"] for record in self.records),
+            "chunks_removed": sum(record["removed"] for record in self.records),
+            "embedding_cache_hits": self._cache_counts[0],
+            "embedding_cache_misses": self._cache_counts[1],
+            "embedding_cache_hit_ratio": 0.0,
+            "files": self.records,
+            **self._timings
+        }
+        lookups = sum(self._cache_counts)
+        if lookups:
+            stats["embedding_cache_hit_ratio"] = self._cache_counts[0] / lookups
         return stats
@@ -0,0 +1,369 @@
+"""
+Ingestion Jobs - Background PDF ingestion with a persistent job store
+"""
+
+import os
+import json
+import time
+import queue
+import shutil
+import socket
+import sqlite3
+import logging
+import threading
+import uuid
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class IngestionJobQueue:
+    """
+    Runs PDF ingestions on a bounded pool of worker threads.
+
+    Jobs and their progress are stored in SQLite, and uploads are kept in
+    ``upload_dir`` until their job finishes, so queued and interrupted jobs
+    are resumed after a restart. Re-running an interrupted job is safe
+    because chunk IDs are stable.
+
+    Several processes may share the job store. A worker claims a queued
+    job atomically and records this queue as its owner. A heartbeat
+    thread refreshes ``heartbeat_at`` on the owner's running jobs. Running
+    jobs are only re-queued once their heartbeat is older than
+    ``stale_after``, meaning their owner died, and never while another
+    process is still working on them.
+    """
+
+    def __init__(
+        self,
+        ingest_engine,
+        db_path: str = "./cache/jobs.db",
+        upload_dir: str = "./cache/uploads",
+        workers: int = 2,
+        heartbeat_interval: float = 10.0,
+        stale_after: float = 60.0
+    ):
+        """
+        Initialize the job queue.
+
+        Args:
+            ingest_engine: PDFIngestionEngine that runs the jobs
+            db_path: Path of the SQLite job store
+            upload_dir: Directory holding the files of pending jobs
+            workers: Ingestions running at once
+            heartbeat_interval: Seconds between heartbeats of running jobs
+            stale_after: Seconds without a heartbeat after which a running
+                job is considered abandoned and re-queued
+        """
+        self.ingest_engine = ingest_engine
+        self.db_path = db_path
+        self.upload_dir = upload_dir
+        self.workers = workers
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = stale_after
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        os.makedirs(upload_dir, exist_ok=True)
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ingestion_jobs ("
+            " id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " file_name TEXT NOT NULL,"
+            " file_path TEXT NOT NULL,"
+            " metadata TEXT NOT NULL,"
+            " progress TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " started_at REAL,"
+            " finished_at REAL)"
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+        for column, column_type in (("content_hash", "TEXT"), ("owner", "TEXT"), ("heartbeat_at", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE ingestion_jobs ADD COLUMN {column} {column_type}")
+        self._conn.commit()
+
+    def start(self):
+        """Resume queued and abandoned jobs and start the workers."""
+        reclaimed = self._reclaim_stale()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM ingestion_jobs WHERE state = ? ORDER BY created_at",
+                (JOB_QUEUED,)
+            ).fetchall()
+
+        for row in rows:
+            self._queue.put(row["id"])
+        if rows:
+            logger.info(f"Resuming {len(rows)} unfinished ingestion jobs ({len(reclaimed)} abandoned)")
+
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._work,
+                name=f"ingest-job-{index}",
+                daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat,
+            name="ingest-job-heartbeat",
+            daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def shutdown(self, timeout: Optional[float] = None):
+        """
+        Stop the workers after their current job.
+
+        Jobs still queued stay in the store and resume on the next start.
+        The job store is only closed once every worker has stopped; workers
+        still running after the timeout keep it open and finish their job.
+
+        Args:
+            timeout: Seconds to wait for each worker
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        if self._threads:
+            logger.warning(f"{len(self._threads)} ingestion workers still running; job store left open")
+            return
+
+        self._stopping.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join(timeout)
+            self._heartbeat_thread = None
+        with self._lock:
+            self._conn.close()
+
+    def _reclaim_stale(self) -> List[str]:
+        """
+        Re-queue running jobs whose owner stopped sending heartbeats.
+
+        Returns:
+            List[str]: IDs of the re-queued jobs
+        """
+        stale = "state = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)"
+        params = (JOB_RUNNING, time.time() - self.stale_after)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, owner FROM ingestion_jobs WHERE {stale} ORDER BY created_at", params
+            ).fetchall()
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET state = ?, owner = NULL, started_at = NULL WHERE {stale}",
+                (JOB_QUEUED, *params)
+            )
+            self._conn.commit()
+
+        for row in rows:
+            logger.warning(f"Re-queued ingestion job {row['id']} abandoned by {row['owner']}")
+        return [row["id"] for row in rows]
+
+    def _heartbeat(self):
+        """Refresh this queue's running jobs and pick up jobs abandoned by others."""
+        while not self._stopping.wait(self.heartbeat_interval):
+            try:
+                with self._lock:
+                    self._conn.execute(
+                        "UPDATE ingestion_jobs SET heartbeat_at = ? WHERE owner = ? AND state = ?",
+                        (time.time(), self.owner, JOB_RUNNING)
+                    )
+                    self._conn.commit()
+                for job_id in self._reclaim_stale():
+                    self._queue.put(job_id)
+            except sqlite3.Error as e:
+                logger.warning(f"Ingestion job heartbeat failed: {e}")
+
+    def submit(
+        self,
+        file_path: str,
+        file_name: str,
+        metadata: Optional[dict] = None,
+        content_hash: Optional[str] = None
+    ) -> str:
+        """
+        Queue a PDF for ingestion.
+
+        The file is moved into the upload directory and removed once the
+        job finishes. An upload identical to a job still queued or running
+        (same file name and content hash) joins that job instead.
+
+        Args:
+            file_path: Uploaded PDF
+            file_name: Original file name
+            metadata: Metadata added to every chunk
+            content_hash: SHA-256 of the file, used to deduplicate uploads
+
+        Returns:
+            str: Job ID
+        """
+        job_id = uuid.uuid4().hex
+        stored_path = os.path.join(self.upload_dir, f"{job_id}.pdf")
+
+        with self._lock:
+            if content_hash is not None:
+                row = self._conn.execute(
+                    "SELECT id FROM ingestion_jobs"
+                    " WHERE content_hash = ? AND file_name = ? AND state IN (?, ?)",
+                    (content_hash, file_name, JOB_QUEUED, JOB_RUNNING)
+                ).fetchone()
+                if row is not None:
+                    os.remove(file_path)
+                    logger.info(f"Upload of {file_name} joined in-flight job {row['id']}")
+                    return row["id"]
+
+            shutil.move(file_path, stored_path)
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs"
+                " (id, state, file_name, file_path, metadata, progress, created_at, content_hash)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job_id, JOB_QUEUED, file_name, stored_path,
+                    json.dumps(metadata or {}), json.dumps({}), time.time(), content_hash
+                )
+            )
+            self._conn.commit()
+
+        self._queue.put(job_id)
+        logger.info(f"Queued ingestion job {job_id} for {file_name}")
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Return the status of a job.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            Optional[dict]: State, progress, result and timings, or None if unknown
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        timings = {}
+        if row["started_at"] is not None:
+            timings["queued_ms"] = (row["started_at"] - row["created_at"]) * 1000
+            end = row["finished_at"] or time.time()
+            timings["run_ms"] = (end - row["started_at"]) * 1000
+
+        return {
+            "job_id": row["id"],
+            "state": row["state"],
+            "file_name": row["file_name"],
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "timings": timings
+        }
+
+    def _update(self, job_id: str, **fields):
+        for key in ("progress", "result"):
+            if key in fields:
+                fields[key] = json.dumps(fields[key], default=str)
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE ingestion_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+            self._conn.commit()
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logger.error(f"Ingestion job {job_id} crashed: {str(e)}")
+                self._update(job_id, state=JOB_FAILED, error=str(e), finished_at=time.time())
+
+    def _run(self, job_id: str):
+        """Claim one queued job, run it and record its outcome."""
+        now = time.time()
+        with self._lock:
+            # Another worker or process may have claimed it since it was queued
+            claimed = self._conn.execute(
+                "UPDATE ingestion_jobs SET state = ?, owner = ?, started_at = ?, heartbeat_at = ?, progress = ?"
+                " WHERE id = ? AND state = ?",
+                (JOB_RUNNING, self.owner, now, now, json.dumps({"stage": "parsing"}), job_id, JOB_QUEUED)
+            ).rowcount
+            self._conn.commit()
+            if not claimed:
+                return
+            row = self._conn.execute(
+                "SELECT file_path, metadata FROM ingestion_jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        file_path = row["file_path"]
+
+        if not os.path.exists(file_path):
+            self._update(job_id, state=JOB_FAILED, error="Uploaded file is missing", finished_at=time.time())
+            return
+
+        def on_progress(record: dict):
+            self._update(job_id, progress={
+                "stage": "embedding",
+                "pages": record["pages"],
+                "chunks": record["chunks"],
+                "chunks_embedded": record["added"]
+            })
+
+        record = self.ingest_engine.ingest_file(
+            file_path,
+            json.loads(row["metadata"]),
+            progress_callback=on_progress
+        )
+
+        progress = {
+            "stage": "done",
+            "pages": record["pages"],
+            "chunks": record["chunks"],
+            "chunks_embedded": record["added"]
+        }
+        if record["success"]:
+            self._update(
+                job_id, state=JOB_SUCCEEDED, progress=progress,
+                result=record, finished_at=time.time()
+            )
+        else:
+            self._update(
+                job_id, state=JOB_FAILED, progress=progress, result=record,
+                error=record.get("error", "Ingestion failed"), finished_at=time.time()
+            )
+
+        try:
+            os.remove(file_path)
+        except OSError as e:
+            logger.warning(f"Could not remove upload of job {job_id}: {e}")
@@ -0,0 +1,246 @@
+"""
+Lexical Index - BM25 inverted index over the stored chunk texts
+"""
+
+import re
+import math
+import logging
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from langchain.schema import Document
+
+from .retrieval import RetrievedChunk, is_staged
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Frequent Spanish words that carry no lexical signal
+SPANISH_STOPWORDS = frozenset(
+    """
+    a al algo como con cual cuales cuando de del desde donde el en entre es esta
+    este esto fue ha hay la las le les lo los mas me mi mis muy no o para pero por
+    que se si sin sobre son su sus tambien te tu un una uno unos y ya
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Tokenize Spanish text for lexical matching.
+
+    Lowercases, strips accents and drops stopwords; numbers and program
+    codes are kept as tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List[str]: Normalized tokens
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [
+        token for token in TOKEN_PATTERN.findall(text)
+        if token not in SPANISH_STOPWORDS
+    ]
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index keyed by chunk ID.
+
+    Updated incrementally on ingest and rebuilt from the vector database
+    on startup.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialize the BM25 index.
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._documents: Dict[str, Document] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def add(
+        self,
+        ids: List[str],
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None
+    ):
+        """
+        Add (or replace) chunks in the index.
+
+        Args:
+            ids: Chunk IDs
+            texts: Chunk texts
+            metadatas: Chunk metadata
+        """
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                if chunk_id in self._doc_lengths:
+                    self._remove_one(chunk_id)
+
+                frequencies = Counter(tokenize(text))
+                for term, tf in frequencies.items():
+                    self._postings.setdefault(term, {})[chunk_id] = tf
+
+                length = sum(frequencies.values())
+                self._doc_lengths[chunk_id] = length
+                self._documents[chunk_id] = Document(page_content=text, metadata=metadata or {})
+                self._total_length += length
+
+    def _remove_one(self, chunk_id: str):
+        document = self._documents.pop(chunk_id)
+        self._total_length -= self._doc_lengths.pop(chunk_id)
+        for term in set(tokenize(document.page_content)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """
+        Remove chunks from the index.
+
+        Args:
+            ids: Chunk IDs to remove
+
+        Returns:
+            int: Number of removed chunks
+        """
+        removed = 0
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._doc_lengths:
+                    self._remove_one(chunk_id)
+                    removed += 1
+        return removed
+
+    def load_from_collection(self, collection, batch_size: int = 5000) -> int:
+        """
+        Rebuild the index from a Chroma collection, skipping staged chunks.
+
+        Args:
+            collection: Chroma collection holding the chunks
+            batch_size: Chunks fetched per request
+
+        Returns:
+            int: Number of indexed chunks
+        """
+        offset = 0
+        while True:
+            batch = collection.get(
+                include=["documents", "metadatas"],
+                limit=batch_size,
+                offset=offset
+            )
+            if not batch["ids"]:
+                break
+            rows = [
+                row for row in zip(batch["ids"], batch["documents"], batch["metadatas"])
+                if not is_staged(row[2])
+            ]
+            self.add([row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows])
+            offset += len(batch["ids"])
+
+        logger.info(f"Lexical index built with {len(self)} chunks")
+        return len(self)
+
+    def chunk_ids_where(self, filters: Dict[str, str]) -> Set[str]:
+        """
+        Find the indexed chunks whose metadata matches every filter.
+
+        Args:
+            filters: Metadata field to required value
+
+        Returns:
+            Set[str]: Matching chunk IDs
+        """
+        with self._lock:
+            return {
+                chunk_id for chunk_id, document in self._documents.items()
+                if all(document.metadata.get(key) == value for key, value in filters.items())
+            }
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        chunk_ids: Optional[Set[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Score chunks against a query with BM25.
+
+        Args:
+            query: Query text
+            k: Number of results
+            chunk_ids: Only score these chunks (all when None)
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, BM25 score) by decreasing score
+        """
+        terms = set(tokenize(query))
+
+        with self._lock:
+            total_docs = len(self._doc_lengths)
+            if not terms or not total_docs:
+                return []
+
+            avg_length = self._total_length / total_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    if chunk_ids is not None and chunk_id not in chunk_ids:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[chunk_id] / avg_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def search_chunks(
+        self,
+        query: str,
+        k: int = 5,
+        chunk_ids: Optional[Set[str]] = None
+    ) -> List[RetrievedChunk]:
+        """
+        Search and return retrieved chunks scored by BM25.
+
+        Args:
+            query: Query text
+            k: Number of results
+            chunk_ids: Only score these chunks (all when None)
+
+        Returns:
+            List[RetrievedChunk]: Matching chunks by decreasing score
+        """
+        results = self.search(query, k, chunk_ids)
+        with self._lock:
+            return [
+                RetrievedChunk(id=chunk_id, document=self._documents[chunk_id], score=score)
+                for chunk_id, score in results
+                if chunk_id in self._documents
+            ]
@@ -0,0 +1,165 @@
+"""
+Metadata Index - Chunk IDs by metadata value for scoped retrieval
+"""
+
+import logging
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .retrieval import is_staged
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields a query can be scoped by
+FILTER_FIELDS = ("program", "source_file")
+
+
+def where_filter(filters: Optional[Dict[str, str]]) -> Optional[dict]:
+    """
+    Build a Chroma ``where`` clause matching every filter.
+
+    Args:
+        filters: Metadata field to required value
+
+    Returns:
+        Optional[dict]: Clause for ``collection.query``, or None without filters
+    """
+    if not filters:
+        return None
+    clauses = [{key: value} for key, value in sorted(filters.items())]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def filter_scope(filters: Optional[Dict[str, str]]) -> Tuple[Tuple[str, str], ...]:
+    """Hashable identity of a set of filters (empty for unscoped queries)."""
+    return tuple(sorted((filters or {}).items()))
+
+
+class MetadataIndex:
+    """
+    Inverted index from metadata values to chunk IDs.
+
+    Tells which chunks a scoped query may return without reading the
+    vector store, so searches touch only that subset and scopes with no
+    chunks are answered without embedding the question. Kept in sync by
+    the ingestion engine and rebuilt from the vector database on startup,
+    like the BM25 index.
+    """
+
+    def __init__(self, fields: Iterable[str] = FILTER_FIELDS):
+        """
+        Initialize the metadata index.
+
+        Args:
+            fields: Metadata fields to index
+        """
+        self.fields = tuple(fields)
+
+        self._postings: Dict[str, Dict[Hashable, Set[Hashable]]] = {field: {} for field in self.fields}
+        self._values: Dict[Hashable, Dict[str, Hashable]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, ids: Iterable[Hashable], metadatas: Iterable[Optional[dict]]):
+        """
+        Add (or re-index) chunks.
+
+        Args:
+            ids: Chunk IDs (any hashable key)
+            metadatas: Chunk metadata
+        """
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                if chunk_id in self._values:
+                    self._remove_one(chunk_id)
+                values = {
+                    field: (metadata or {}).get(field)
+                    for field in self.fields
+                    if (metadata or {}).get(field) is not None
+                }
+                for field, value in values.items():
+                    self._postings[field].setdefault(value, set()).add(chunk_id)
+                self._values[chunk_id] = values
+
+    def _remove_one(self, chunk_id: Hashable):
+        for field, value in self._values.pop(chunk_id).items():
+            postings = self._postings[field]
+            postings[value].discard(chunk_id)
+            if not postings[value]:
+                del postings[value]
+
+    def remove(self, ids: Iterable[Hashable]) -> int:
+        """
+        Remove chunks from the index.
+
+        Args:
+            ids: Chunk IDs to remove
+
+        Returns:
+            int: Number of removed chunks
+        """
+        removed = 0
+        with self._lock:
+            for chunk_id in ids:
+                if chunk_id in self._values:
+                    self._remove_one(chunk_id)
+                    removed += 1
+        return removed
+
+    def chunk_ids(self, filters: Optional[Dict[str, Hashable]]) -> Optional[Set[Hashable]]:
+        """
+        Find the chunks matching every filter.
+
+        Args:
+            filters: Metadata field to required value
+
+        Returns:
+            Optional[Set]: Matching chunk IDs, or None when there are no
+            filters or a filtered field is not indexed
+        """
+        if not filters or any(field not in self._postings for field in filters):
+            return None
+        with self._lock:
+            matches = sorted(
+                (self._postings[field].get(value, set()) for field, value in filters.items()),
+                key=len
+            )
+            return set(matches[0]).intersection(*matches[1:])
+
+    def values(self, field: str) -> List[Hashable]:
+        """
+        List the indexed values of a field.
+
+        Args:
+            field: Indexed metadata field
+
+        Returns:
+            List: Values present in at least one chunk, sorted
+        """
+        with self._lock:
+            return sorted(self._postings.get(field, {}))
+
+    def load_from_collection(self, collection, batch_size: int = 5000) -> int:
+        """
+        Rebuild the index from a Chroma collection, skipping staged chunks.
+
+        Args:
+            collection: Chroma collection holding the chunks
+            batch_size: Chunks fetched per request
+
+        Returns:
+            int: Number of indexed chunks
+        """
+        offset = 0
+        while True:
+            batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            rows = [row for row in zip(batch["ids"], batch["metadatas"]) if not is_staged(row[1])]
+            self.add([row[0] for row in rows], [row[1] for row in rows])
+            offset += len(batch["ids"])
+
+        logger.info(f"Metadata index built with {len(self)} chunks")
+        return len(self)
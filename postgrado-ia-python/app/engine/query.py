@@ -3,13 +3,36 @@ RAG Query Engine - Handles retrieval and response generation
 """
 
 import os
+import copy
+import time
+import asyncio
 import logging
-from typing import Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Dict, Iterator, Optional, List, Set, Tuple
+import numpy as np
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
-from langchain.schema.runnable import RunnablePassthrough
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.messages import BaseMessage
+
+from .answer_cache import SemanticAnswerCache
+from .coalescing import SingleFlight
+from .context_packer import ContextPacker, TokenCounter
+from .embedding_cache import normalize_text
+from .flat_index import FlatIndex, FlatVectorStore
+from .lexical_index import BM25Index
+from .metadata_index import MetadataIndex, filter_scope, where_filter
+from .resources import EngineResources
+from .retrieval import (
+    RetrievalResult,
+    RetrievedChunk,
+    chunks_from_query_result,
+    maximal_marginal_relevance,
+    reciprocal_rank_fusion,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -33,6 +56,20 @@ PREGUNTA DEL USUARIO:
 """
 
 
+# Response returned when retrieval finds no context for the question
+NO_DOCUMENTS_RESPONSE = {
+    "success": False,
+    "error": "No relevant documents found in the database",
+    "answer": "Lo sentimos, no encontramos información relevante en nuestra base de datos. Por favor, contacta a la oficina de posgrados.",
+    "sources": []
+}
+
+
+def no_documents_response() -> dict:
+    """Return a copy of ``NO_DOCUMENTS_RESPONSE`` the caller may modify."""
+    return copy.deepcopy(NO_DOCUMENTS_RESPONSE)
+
+
 class RAGQueryEngine:
     """
     Handles RAG (Retrieval-Augmented Generation) queries.
@@ -50,7 +87,24 @@ class RAGQueryEngine:
         model_name: str = "gpt-4",
         temperature: float = 0.3,
         max_tokens: int = 1000,
-        retrieval_k: int = 5
+        retrieval_k: int = 5,
+        answer_cache: Optional[SemanticAnswerCache] = None,
+        embedding_model: str = "text-embedding-3-small",
+        embeddings: Optional[Embeddings] = None,
+        search_workers: int = 4,
+        max_context_tokens: int = 3000,
+        retrieval_mode: str = "vector",
+        lexical_index: Optional[BM25Index] = None,
+        hybrid_candidates: int = 20,
+        embedding_timeout: Optional[float] = None,
+        mmr_lambda: Optional[float] = None,
+        mmr_fetch_k: int = 20,
+        batch_concurrency: int = 4,
+        coalesce_requests: bool = True,
+        vector_client=None,
+        flat_index: Optional[FlatIndex] = None,
+        metadata_index: Optional[MetadataIndex] = None,
+        resources: Optional[EngineResources] = None
     ):
         """
         Initialize the RAG query engine.
@@ -61,83 +115,699 @@ class RAGQueryEngine:
             temperature: Temperature for response generation (0.0-1.0)
             max_tokens: Maximum tokens in response
             retrieval_k: Number of documents to retrieve
+            answer_cache: Optional semantic cache of generated answers
+            embedding_model: OpenAI embedding model (must match ingestion)
+            embeddings: Shared embeddings client (created if not provided)
+            search_workers: Threads available to async vector searches
+            max_context_tokens: Token budget for the retrieved context
+            retrieval_mode: "vector" or "hybrid" (vector + BM25 with rank fusion)
+            lexical_index: BM25 index over the stored chunks
+            hybrid_candidates: Candidates taken from each ranking in hybrid mode
+            embedding_timeout: Seconds to wait for the query embedding before
+                falling back to lexical retrieval (requires lexical_index)
+            mmr_lambda: Enables MMR diversification (1.0 relevance only,
+                0.0 diversity only); None disables it
+            mmr_fetch_k: Candidate pool size for MMR
+            batch_concurrency: Concurrent LLM generations per batch query
+            coalesce_requests: Share one computation among concurrent
+                identical questions
+            vector_client: Chroma client of a remote server (see
+                ``create_http_client``); None opens the embedded store at vector_db_path
+            flat_index: Memory-mapped index searched instead of Chroma
+            metadata_index: Chunk IDs by program and source file, used to
+                scope filtered queries without reading the vector store
+            resources: Shared embeddings client, vector store and LLM; when
+                given, its settings replace embeddings, vector_db_path,
+                vector_client and flat_index
         """
+        if resources is not None:
+            embeddings = resources.embeddings
+            vector_db_path = resources.vector_db_path
+            vector_client = resources.vector_client
+            flat_index = resources.flat_index
+        self.resources = resources
         self.vector_db_path = vector_db_path
         self.model_name = model_name
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.retrieval_k = retrieval_k
+        self.answer_cache = answer_cache
+        self.embedding_model = embedding_model
+        self.retrieval_mode = retrieval_mode
+        self.lexical_index = lexical_index
+        self.hybrid_candidates = hybrid_candidates
+        self.embedding_timeout = embedding_timeout
+        self.mmr_lambda = mmr_lambda
+        self.mmr_fetch_k = mmr_fetch_k
+        self.batch_concurrency = batch_concurrency
+        self.coalescer = SingleFlight() if coalesce_requests else None
+        self.vector_client = vector_client
+        self.flat_index = flat_index
+        self.metadata_index = metadata_index
         
         # Initialize embeddings
-        self.embeddings = OpenAIEmbeddings(
+        self.embeddings = embeddings or OpenAIEmbeddings(
+            model=embedding_model,
             api_key=os.getenv("OPENAI_API_KEY")
         )
         
-        # Initialize vector store
-        self.vector_store = None
-        self._init_vector_store()
+        # Initialize vector store (the shared one is opened by the registry)
+        self._vector_store = None
+        if self.resources is None:
+            self._init_vector_store()
         
-        # Initialize LLM
-        self.llm = ChatOpenAI(
-            model_name=model_name,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            api_key=os.getenv("OPENAI_API_KEY")
+        # Build the lexical index from the stored chunks on first use
+        if self.lexical_index is not None and not len(self.lexical_index) and self.vector_store is not None:
+            try:
+                self.lexical_index.load_from_collection(self.vector_store._collection)
+            except Exception as e:
+                logger.warning(f"Could not build lexical index: {e}")
+        
+        if self.metadata_index is not None and not len(self.metadata_index) and self.vector_store is not None:
+            try:
+                self.metadata_index.load_from_collection(self.vector_store._collection)
+            except Exception as e:
+                logger.warning(f"Could not build metadata index: {e}")
+        
+        # Initialize LLM (or use the shared client)
+        if resources is not None and resources.llm is not None:
+            self.llm = resources.llm
+        else:
+            self.llm = ChatOpenAI(
+                model_name=model_name,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+        
+        # Prompt is compiled once; context is packed into a token budget
+        self.prompt = ChatPromptTemplate.from_template(SYSTEM_PROMPT)
+        self.token_counter = TokenCounter(model_name)
+        self.context_packer = ContextPacker(
+            self.token_counter,
+            max_context_tokens=max_context_tokens
+        )
+        
+        # Bounded pool so blocking vector searches never run on the event loop
+        self._search_executor = ThreadPoolExecutor(
+            max_workers=search_workers,
+            thread_name_prefix="vector-search"
         )
     
+    def close(self):
+        """Release the vector search workers."""
+        self._search_executor.shutdown(wait=False)
+    
+    @property
+    def vector_store(self):
+        """The vector store searched by queries."""
+        if self.resources is not None:
+            return self.resources.vector_store
+        return self._vector_store
+    
+    @vector_store.setter
+    def vector_store(self, store):
+        if self.resources is not None:
+            self.resources.vector_store = store
+        else:
+            self._vector_store = store
+    
     def _init_vector_store(self):
         """Initialize connection to vector database."""
         try:
-            self.vector_store = Chroma(
-                persist_directory=self.vector_db_path,
-                embedding_function=self.embeddings
-            )
+            if self.flat_index is not None:
+                self.vector_store = FlatVectorStore(self.flat_index, self.embeddings)
+            elif self.vector_client is not None:
+                self.vector_store = Chroma(
+                    client=self.vector_client,
+                    embedding_function=self.embeddings
+                )
+            else:
+                self.vector_store = Chroma(
+                    persist_directory=self.vector_db_path,
+                    embedding_function=self.embeddings
+                )
             logger.info("Connected to vector database")
         except Exception as e:
             logger.error(f"Failed to connect to vector database: {str(e)}")
             self.vector_store = None
     
-    def _retrieve_context(self, query: str) -> str:
+    def _distance_space(self) -> str:
+        """Return the distance space configured on the Chroma collection."""
+        metadata = getattr(self.vector_store._collection, "metadata", None)
+        if isinstance(metadata, dict):
+            return metadata.get("hnsw:space", "l2")
+        return "l2"
+    
+    def _embed_query(self, result: RetrievalResult) -> None:
+        """
+        Embed the query of a retrieval result and record the timing.
+        
+        With a lexical index and an embedding timeout configured, a slow
+        embedding call is abandoned and the result is flagged so retrieval
+        falls back to the lexical index.
+        """
+        start = time.perf_counter()
+        if self._lexical_fallback_enabled():
+            future = self._search_executor.submit(self.embeddings.embed_query, result.query)
+            try:
+                result.embedding = future.result(timeout=self.embedding_timeout)
+            except FuturesTimeoutError:
+                self._flag_embedding_timeout(result)
+        else:
+            result.embedding = self.embeddings.embed_query(result.query)
+        result.timings["embed_ms"] = (time.perf_counter() - start) * 1000
+    
+    async def _aembed_query(self, result: RetrievalResult) -> None:
+        """Embed the query asynchronously and record the timing."""
+        start = time.perf_counter()
+        if self._lexical_fallback_enabled():
+            try:
+                result.embedding = await asyncio.wait_for(
+                    self.embeddings.aembed_query(result.query),
+                    timeout=self.embedding_timeout
+                )
+            except asyncio.TimeoutError:
+                self._flag_embedding_timeout(result)
+        else:
+            result.embedding = await self.embeddings.aembed_query(result.query)
+        result.timings["embed_ms"] = (time.perf_counter() - start) * 1000
+    
+    def _lexical_fallback_enabled(self) -> bool:
+        return self.lexical_index is not None and self.embedding_timeout is not None
+    
+    def _flag_embedding_timeout(self, result: RetrievalResult) -> None:
+        logger.warning(
+            f"Query embedding exceeded {self.embedding_timeout}s, "
+            "falling back to lexical retrieval"
+        )
+        result.embedding_timed_out = True
+    
+    def _vector_candidates(self) -> int:
+        """Number of vector neighbours kept per query (before MMR)."""
+        if self.retrieval_mode == "hybrid" and self.lexical_index is not None:
+            return max(self.hybrid_candidates, self.retrieval_k)
+        return self.retrieval_k
+    
+    def _scope_chunk_ids(self, filters: Dict[str, str]) -> Optional[Set[str]]:
+        """
+        Find the chunks a filtered query may return.
+        
+        Args:
+            filters: Metadata field to required value
+            
+        Returns:
+            Optional[Set[str]]: Matching chunk IDs, or None when the query is
+            unfiltered or no index can resolve the filters
+        """
+        if not filters:
+            return None
+        if self.metadata_index is not None:
+            chunk_ids = self.metadata_index.chunk_ids(filters)
+            if chunk_ids is not None:
+                return chunk_ids
+        if self.lexical_index is not None:
+            return self.lexical_index.chunk_ids_where(filters)
+        return None
+    
+    def _scope_is_empty(self, scope_ids: Optional[Set[str]]) -> bool:
+        """
+        Whether a filtered query can be answered as "no documents" without a search.
+        
+        Only the embedded store is written exclusively through this process,
+        so only there does an empty local scope prove that no chunk matches.
+        A Chroma server or flat index may hold chunks other workers or
+        replicas stored; their ``where`` clause decides instead.
+        """
+        if scope_ids is None or scope_ids:
+            return False
+        return self.vector_client is None and self.flat_index is None
+    
+    def _query_collection(
+        self,
+        embeddings: List[List[float]],
+        k: int,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[List[RetrievedChunk]]:
+        """
+        Search the collection for one or more query embeddings in one call.
+        
+        With MMR enabled, ``mmr_fetch_k`` candidates are fetched with their
+        embeddings so they can be re-selected.
+        
+        Args:
+            embeddings: Query embeddings
+            k: Number of neighbours wanted per query
+            filters: Metadata every returned chunk must match
+            
+        Returns:
+            List[List[RetrievedChunk]]: Candidates for each query embedding
+        """
+        include = ["documents", "metadatas", "distances"]
+        if self.mmr_lambda is not None:
+            include.append("embeddings")
+            k = max(self.mmr_fetch_k, k)
+        
+        raw = self.vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=where_filter(filters),
+            include=include
+        )
+        space = self._distance_space()
+        return [
+            chunks_from_query_result(raw, space, index=i)
+            for i in range(len(embeddings))
+        ]
+    
+    def _diversify(
+        self,
+        result: RetrievalResult,
+        chunks: List[RetrievedChunk],
+        k: int
+    ) -> List[RetrievedChunk]:
+        """Re-select ``k`` diverse chunks with MMR when enabled."""
+        if self.mmr_lambda is None or len(chunks) <= k:
+            return chunks[:k]
+        
+        start = time.perf_counter()
+        selected = maximal_marginal_relevance(
+            result.embedding,
+            np.array([chunk.embedding for chunk in chunks], dtype=np.float32),
+            k=k,
+            lambda_mult=self.mmr_lambda
+        )
+        result.timings["mmr_ms"] = (time.perf_counter() - start) * 1000
+        return [chunks[i] for i in selected]
+    
+    def _lexical_search(self, result: RetrievalResult, k: int) -> List[RetrievedChunk]:
+        """BM25 search restricted to the chunks matching the query filters."""
+        if result.filters and result.scope_ids is None:
+            result.scope_ids = self._scope_chunk_ids(result.filters)
+        return self.lexical_index.search_chunks(result.query, k, result.scope_ids)
+    
+    def _search(
+        self,
+        result: RetrievalResult,
+        vector_chunks: Optional[List[RetrievedChunk]] = None
+    ) -> None:
+        """
+        Search with the configured retrieval mode and record the timings.
+        
+        - vector: nearest neighbours of the query embedding (optionally
+          diversified with maximal marginal relevance)
+        - hybrid: vector and BM25 candidates merged with reciprocal rank fusion
+        
+        Falls back to BM25 alone when the query embedding timed out.
+        
+        Args:
+            result: Retrieval to fill
+            vector_chunks: Vector candidates already fetched (batch queries)
+        """
+        if result.embedding is None:
+            start = time.perf_counter()
+            result.chunks = self._lexical_search(result, self.retrieval_k)
+            result.timings["lexical_ms"] = (time.perf_counter() - start) * 1000
+            return
+        
+        candidates = self._vector_candidates()
+        if vector_chunks is None:
+            start = time.perf_counter()
+            vector_chunks = self._query_collection([result.embedding], candidates, result.filters)[0]
+            result.timings["search_ms"] = (time.perf_counter() - start) * 1000
+        vector_chunks = self._diversify(result, vector_chunks, candidates)
+        
+        if self.retrieval_mode != "hybrid" or self.lexical_index is None:
+            result.chunks = vector_chunks
+            return
+        
+        start = time.perf_counter()
+        lexical_chunks = self._lexical_search(result, candidates)
+        result.timings["lexical_ms"] = (time.perf_counter() - start) * 1000
+        
+        result.chunks = reciprocal_rank_fusion(
+            [vector_chunks, lexical_chunks],
+            limit=self.retrieval_k
+        )
+        vector_ids = {chunk.id for chunk in vector_chunks}
+        self._score_by_similarity(
+            result.embedding,
+            [chunk for chunk in result.chunks if chunk.id not in vector_ids]
+        )
+    
+    def _score_by_similarity(self, embedding: List[float], chunks: List[RetrievedChunk]) -> None:
+        """
+        Replace the BM25 scores of chunks only the lexical search found with
+        their similarity to the query, so every hybrid result reports one.
+        
+        Args:
+            embedding: Query embedding
+            chunks: Chunks scored by BM25
+        """
+        if not chunks:
+            return
+        try:
+            stored = self.vector_store._collection.get(
+                ids=[chunk.id for chunk in chunks],
+                include=["embeddings"]
+            )
+        except Exception as e:
+            logger.warning(f"Could not score lexical matches by similarity: {e}")
+            return
+        
+        # Stored embeddings are unit-normalized, so the dot product is the cosine
+        query = np.asarray(embedding, dtype=np.float32)
+        embeddings = dict(zip(stored["ids"], stored.get("embeddings") or []))
+        for chunk in chunks:
+            stored_embedding = embeddings.get(chunk.id)
+            chunk.score = float(np.dot(query, stored_embedding)) if stored_embedding is not None else 0.0
+    
+    def _search_batch(self, results: List[RetrievalResult]) -> None:
+        """
+        Search for several queries, sending all query embeddings with the
+        same filters in one collection call.
+        
+        Args:
+            results: Retrievals to fill (embedded or flagged as timed out)
+        """
+        groups: Dict[tuple, List[RetrievalResult]] = {}
+        for result in results:
+            if result.embedding is not None:
+                groups.setdefault(filter_scope(result.filters), []).append(result)
+        
+        for embedded in groups.values():
+            start = time.perf_counter()
+            candidates = self._query_collection(
+                [result.embedding for result in embedded],
+                self._vector_candidates(),
+                embedded[0].filters
+            )
+            elapsed = (time.perf_counter() - start) * 1000
+            for result, chunks in zip(embedded, candidates):
+                result.timings["search_ms"] = elapsed
+                self._search(result, chunks)
+        
+        for result in results:
+            if result.embedding is None:
+                self._search(result)
+    
+    def _retrieve(
+        self,
+        query: str,
+        result: Optional[RetrievalResult] = None
+    ) -> RetrievalResult:
         """
-        Retrieve relevant documents from vector database.
+        Retrieve relevant documents from vector database in a single pass.
+        
+        The query is embedded once and the collection is searched once;
+        the result carries documents, ids, similarity scores and per-stage
+        timings so callers never need to search again.
         
         Args:
             query: User query
+            result: Partially built result (e.g. already embedded)
             
         Returns:
-            str: Concatenated context from retrieved documents
+            RetrievalResult: Retrieved chunks (empty on failure)
         """
+        result = result or RetrievalResult(query=query)
+        
         if self.vector_store is None:
             logger.warning("Vector store not initialized")
-            return ""
+            return result
         
         try:
-            # Retrieve relevant documents
-            docs = self.vector_store.similarity_search(
-                query,
-                k=self.retrieval_k
-            )
+            # Embed the query
+            if result.embedding is None and not result.embedding_timed_out:
+                self._embed_query(result)
+            
+            # Search the collection
+            self._search(result)
+            
+            logger.info(result.summary())
+            return result
+            
+        except Exception as e:
+            logger.error(f"Error retrieving context: {str(e)}")
+            return RetrievalResult(query=query)
+    
+    async def _aretrieve(
+        self,
+        query: str,
+        result: Optional[RetrievalResult] = None
+    ) -> RetrievalResult:
+        """
+        Async counterpart of ``_retrieve``.
+        
+        Embeds with the async client and runs the blocking vector search
+        on the bounded search executor.
+        
+        Args:
+            query: User query
+            result: Partially built result (e.g. already embedded)
+            
+        Returns:
+            RetrievalResult: Retrieved chunks (empty on failure)
+        """
+        result = result or RetrievalResult(query=query)
+        
+        if self.vector_store is None:
+            logger.warning("Vector store not initialized")
+            return result
+        
+        try:
+            if result.embedding is None and not result.embedding_timed_out:
+                await self._aembed_query(result)
+            
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._search_executor, self._search, result)
             
-            # Concatenate document contents
-            context = "\n\n---\n\n".join([doc.page_content for doc in docs])
-            logger.info(f"Retrieved {len(docs)} documents for query")
-            return context
+            logger.info(result.summary())
+            return result
             
         except Exception as e:
             logger.error(f"Error retrieving context: {str(e)}")
-            return ""
+            return RetrievalResult(query=query)
+    
+    def _retrieve_context(self, query: str) -> str:
+        """
+        Retrieve relevant documents and concatenate them into a context.
+        
+        Args:
+            query: User query
+            
+        Returns:
+            str: Concatenated context from retrieved documents
+        """
+        return self._retrieve(query).context()
+    
+    def _lookup_cached_answer(
+        self,
+        retrieval: RetrievalResult,
+        return_sources: bool
+    ) -> Optional[dict]:
+        """
+        Look up a cached answer for an already embedded question.
+        
+        Args:
+            retrieval: Retrieval result holding the question embedding
+            return_sources: Whether to return source documents
+            
+        Returns:
+            Optional[dict]: Cached response, or None on a miss
+        """
+        start = time.perf_counter()
+        cached = self.answer_cache.lookup(
+            retrieval.embedding,
+            scope=filter_scope(retrieval.filters)
+        )
+        retrieval.timings["cache_ms"] = (time.perf_counter() - start) * 1000
+        
+        if cached is None:
+            return None
+        
+        logger.info(f"Answer served from cache ({retrieval.format_timings()})")
+        return {
+            **cached,
+            "sources": cached["sources"] if return_sources else [],
+            "question": retrieval.query,
+            "timings": dict(retrieval.timings),
+            "cached": True
+        }
+    
+    def _build_messages(self, retrieval: RetrievalResult) -> List[BaseMessage]:
+        """
+        Pack the retrieved context into the token budget and format the prompt.
+        
+        Keeps only the chunks that made it into the prompt on the retrieval
+        and records the prompt token usage.
+        
+        Args:
+            retrieval: Retrieval to build the prompt from
+            
+        Returns:
+            List[BaseMessage]: Messages to send to the LLM
+        """
+        start = time.perf_counter()
+        packed = self.context_packer.pack(retrieval.chunks)
+        retrieval.chunks = packed.chunks
+        
+        messages = self.prompt.format_messages(
+            context=packed.text,
+            question=retrieval.query
+        )
+        retrieval.usage = {
+            "prompt_tokens": sum(self.token_counter.count(m.content) for m in messages),
+            "context_tokens": packed.context_tokens,
+            "context_chunks": len(packed.chunks),
+            "truncated_chunks": packed.truncated,
+            "dropped_chunks": packed.dropped
+        }
+        retrieval.timings["pack_ms"] = (time.perf_counter() - start) * 1000
+        return messages
+    
+    def _scoped_retrieval(
+        self,
+        question: str,
+        filters: Optional[Dict[str, str]]
+    ) -> RetrievalResult:
+        """Start a retrieval, resolving the chunks its filters allow."""
+        retrieval = RetrievalResult(query=question, filters=dict(filters or {}))
+        retrieval.scope_ids = self._scope_chunk_ids(retrieval.filters)
+        return retrieval
+    
+    def _prepare(
+        self,
+        question: str,
+        return_sources: bool,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Tuple[Optional[dict], RetrievalResult]:
+        """
+        Run every step that precedes generation.
+        
+        Args:
+            question: User's question
+            return_sources: Whether to return source documents
+            filters: Metadata every retrieved chunk must match
+            
+        Returns:
+            Tuple[Optional[dict], RetrievalResult]: A final response when no
+            generation is needed (cache hit or no documents), and the retrieval
+        """
+        retrieval = self._scoped_retrieval(question, filters)
+        
+        # Filters matching no chunk need no embedding or search
+        if self._scope_is_empty(retrieval.scope_ids):
+            return no_documents_response(), retrieval
+        
+        # Serve semantically equivalent questions from the answer cache
+        if self.answer_cache is not None:
+            self._embed_query(retrieval)
+            if retrieval.embedding is not None:
+                cached = self._lookup_cached_answer(retrieval, return_sources)
+                if cached is not None:
+                    return cached, retrieval
+        
+        # Retrieve context (single pass, reused for sources)
+        retrieval = self._retrieve(question, retrieval)
+        
+        if retrieval.is_empty:
+            return no_documents_response(), retrieval
+        
+        return None, retrieval
+    
+    async def _aprepare(
+        self,
+        question: str,
+        return_sources: bool,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Tuple[Optional[dict], RetrievalResult]:
+        """Async counterpart of ``_prepare``."""
+        retrieval = self._scoped_retrieval(question, filters)
+        
+        if self._scope_is_empty(retrieval.scope_ids):
+            return no_documents_response(), retrieval
+        
+        if self.answer_cache is not None:
+            await self._aembed_query(retrieval)
+            if retrieval.embedding is not None:
+                cached = self._lookup_cached_answer(retrieval, return_sources)
+                if cached is not None:
+                    return cached, retrieval
+        
+        retrieval = await self._aretrieve(question, retrieval)
+        
+        if retrieval.is_empty:
+            return no_documents_response(), retrieval
+        
+        return None, retrieval
+    
+    def _finalize(
+        self,
+        retrieval: RetrievalResult,
+        answer: str,
+        return_sources: bool
+    ) -> dict:
+        """
+        Build the response for a generated answer and cache it.
+        
+        Args:
+            retrieval: Retrieval the answer was generated from
+            answer: Generated answer
+            return_sources: Whether to return source documents
+            
+        Returns:
+            dict: Response data including answer and sources
+        """
+        logger.info(f"Query answered ({retrieval.format_timings()})")
+        
+        result = {
+            "success": True,
+            "answer": answer,
+            "sources": retrieval.sources(),
+            "question": retrieval.query,
+            "timings": retrieval.timings,
+            "usage": retrieval.usage
+        }
+        
+        if self.answer_cache is not None and retrieval.embedding is not None:
+            self.answer_cache.store(
+                retrieval.embedding,
+                result,
+                sources=[doc.metadata.get("source", "Unknown") for doc in retrieval.documents],
+                chunk_ids=retrieval.ids,
+                scope=filter_scope(retrieval.filters)
+            )
+        
+        if not return_sources:
+            result = {**result, "sources": []}
+        return result
+    
+    @staticmethod
+    def _coalescing_key(
+        question: str,
+        return_sources: bool,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Tuple[str, bool, tuple]:
+        return normalize_text(question), return_sources, filter_scope(filters)
     
     def query(
         self,
         question: str,
-        return_sources: bool = True
+        return_sources: bool = True,
+        filters: Optional[Dict[str, str]] = None
     ) -> dict:
         """
         Process a user query and generate a response.
         
+        Concurrent calls with the same normalized question share one
+        retrieval and generation.
+        
         Args:
             question: User's question
             return_sources: Whether to return source documents
+            filters: Metadata every retrieved chunk must match
+                (e.g. ``{"program": "maestria_ia"}``)
             
         Returns:
             dict: Response data including answer and sources
@@ -150,53 +820,93 @@ class RAGQueryEngine:
                 "sources": []
             }
         
+        if self.coalescer is None:
+            return self._query(question, return_sources, filters)
+        
+        key = self._coalescing_key(question, return_sources, filters)
+        # Every caller of the flight gets its own copy, nested lists included
+        return copy.deepcopy(self.coalescer.do(key, lambda: self._query(question, return_sources, filters)))
+    
+    def _query(
+        self,
+        question: str,
+        return_sources: bool,
+        filters: Optional[Dict[str, str]] = None
+    ) -> dict:
         try:
-            # Retrieve context
-            context = self._retrieve_context(question)
+            response, retrieval = self._prepare(question, return_sources, filters)
+            if response is not None:
+                return response
             
-            if not context:
-                return {
-                    "success": False,
-                    "error": "No relevant documents found in the database",
-                    "answer": "Lo sentimos, no encontramos información relevante en nuestra base de datos. Por favor, contacta a la oficina de posgrados.",
-                    "sources": []
-                }
-            
-            # Build prompt
-            prompt = ChatPromptTemplate.from_template(SYSTEM_PROMPT)
+            # Generate response
+            start = time.perf_counter()
+            response = self.llm.invoke(self._build_messages(retrieval))
+            retrieval.timings["generation_ms"] = (time.perf_counter() - start) * 1000
             
-            # Create chain
-            chain = (
-                {"context": RunnablePassthrough(), "question": RunnablePassthrough()}
-                | prompt
-                | self.llm
-            )
+            return self._finalize(retrieval, response.content, return_sources)
             
-            # Generate response
-            response = chain.invoke({
-                "context": context,
-                "question": question
-            })
-            
-            # Retrieve source documents
-            sources = []
-            if return_sources and self.vector_store:
-                docs = self.vector_store.similarity_search(question, k=self.retrieval_k)
-                sources = [
-                    {
-                        "content": doc.page_content[:200],
-                        "source": doc.metadata.get("source", "Unknown"),
-                        "page": doc.metadata.get("page", 0)
-                    }
-                    for doc in docs
-                ]
+        except Exception as e:
+            logger.error(f"Error processing query: {str(e)}")
+            return {
+                "success": False,
+                "error": f"Error processing query: {str(e)}",
+                "answer": None,
+                "sources": []
+            }
+    
+    async def aquery(
+        self,
+        question: str,
+        return_sources: bool = True,
+        filters: Optional[Dict[str, str]] = None
+    ) -> dict:
+        """
+        Process a user query without blocking the event loop.
+        
+        Uses the async embeddings and LLM clients; the vector search runs
+        on the bounded search executor. Concurrent calls with the same
+        normalized question share one retrieval and generation.
+        
+        Args:
+            question: User's question
+            return_sources: Whether to return source documents
+            filters: Metadata every retrieved chunk must match
+                (e.g. ``{"program": "maestria_ia"}``)
             
+        Returns:
+            dict: Response data including answer and sources
+        """
+        if not question or not isinstance(question, str):
             return {
-                "success": True,
-                "answer": response.content,
-                "sources": sources,
-                "question": question
+                "success": False,
+                "error": "Invalid question format",
+                "answer": None,
+                "sources": []
             }
+        
+        if self.coalescer is None:
+            return await self._aquery(question, return_sources, filters)
+        
+        key = self._coalescing_key(question, return_sources, filters)
+        return copy.deepcopy(await self.coalescer.ado(key, lambda: self._aquery(question, return_sources, filters)))
+    
+    async def _aquery(
+        self,
+        question: str,
+        return_sources: bool,
+        filters: Optional[Dict[str, str]] = None
+    ) -> dict:
+        try:
+            response, retrieval = await self._aprepare(question, return_sources, filters)
+            if response is not None:
+                return response
+            
+            # Generate response
+            start = time.perf_counter()
+            response = await self.llm.ainvoke(self._build_messages(retrieval))
+            retrieval.timings["generation_ms"] = (time.perf_counter() - start) * 1000
+            
+            return self._finalize(retrieval, response.content, return_sources)
             
         except Exception as e:
             logger.error(f"Error processing query: {str(e)}")
@@ -206,3 +916,195 @@ class RAGQueryEngine:
                 "answer": None,
                 "sources": []
             }
+    
+    @staticmethod
+    def _error_response(error: str) -> dict:
+        return {
+            "success": False,
+            "error": error,
+            "answer": None,
+            "sources": []
+        }
+    
+    async def _aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed several queries in one embeddings request."""
+        embed_queries = getattr(self.embeddings, "aembed_queries", None)
+        if embed_queries is not None:
+            return await embed_queries(texts)
+        return await self.embeddings.aembed_documents(texts)
+    
+    async def abatch_query(
+        self,
+        questions: List[str],
+        return_sources: bool = True,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[dict]:
+        """
+        Process several questions with shared embedding and search calls.
+        
+        All questions are embedded in one embeddings request and searched
+        in one collection call; LLM generations then run with at most
+        ``batch_concurrency`` in flight.
+        
+        Args:
+            questions: User questions
+            return_sources: Whether to return source documents
+            filters: Metadata every retrieved chunk must match (all questions)
+            
+        Returns:
+            List[dict]: One response per question, in order; failures are
+            reported per item
+        """
+        results: List[Optional[dict]] = [None] * len(questions)
+        retrievals = {}
+        for i, question in enumerate(questions):
+            if not question or not isinstance(question, str):
+                results[i] = self._error_response("Invalid question format")
+            else:
+                retrievals[i] = self._scoped_retrieval(question, filters)
+        
+        if not retrievals:
+            return results
+        
+        scope_ids = next(iter(retrievals.values())).scope_ids
+        if self.vector_store is None or self._scope_is_empty(scope_ids):
+            if self.vector_store is None:
+                logger.warning("Vector store not initialized")
+            for i in retrievals:
+                results[i] = no_documents_response()
+            return results
+        
+        # One embeddings request for the whole batch
+        try:
+            start = time.perf_counter()
+            embeddings = await self._aembed_queries([r.query for r in retrievals.values()])
+            elapsed = (time.perf_counter() - start) * 1000
+            for retrieval, embedding in zip(retrievals.values(), embeddings):
+                retrieval.embedding = embedding
+                retrieval.timings["embed_ms"] = elapsed
+        except Exception as e:
+            logger.error(f"Error embedding batch: {str(e)}")
+            for i in retrievals:
+                results[i] = self._error_response(f"Error processing query: {str(e)}")
+            return results
+        
+        # Serve cached answers, search the rest in one collection call
+        pending = {}
+        for i, retrieval in retrievals.items():
+            cached = (
+                self._lookup_cached_answer(retrieval, return_sources)
+                if self.answer_cache is not None else None
+            )
+            if cached is not None:
+                results[i] = cached
+            else:
+                pending[i] = retrieval
+        
+        if pending:
+            try:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    self._search_executor,
+                    self._search_batch,
+                    list(pending.values())
+                )
+            except Exception as e:
+                logger.error(f"Error retrieving batch context: {str(e)}")
+                for i in pending:
+                    results[i] = self._error_response(f"Error processing query: {str(e)}")
+                return results
+        
+        # Generate answers with bounded concurrency
+        semaphore = asyncio.Semaphore(self.batch_concurrency)
+        
+        async def generate(retrieval: RetrievalResult) -> dict:
+            if retrieval.is_empty:
+                return no_documents_response()
+            async with semaphore:
+                try:
+                    start = time.perf_counter()
+                    response = await self.llm.ainvoke(self._build_messages(retrieval))
+                    retrieval.timings["generation_ms"] = (time.perf_counter() - start) * 1000
+                    return self._finalize(retrieval, response.content, return_sources)
+                except Exception as e:
+                    logger.error(f"Error processing query: {str(e)}")
+                    return self._error_response(f"Error processing query: {str(e)}")
+        
+        outputs = await asyncio.gather(*(generate(r) for r in pending.values()))
+        for i, output in zip(pending, outputs):
+            results[i] = output
+        
+        logger.info(f"Batch of {len(questions)} questions processed")
+        return results
+    
+    def stream_query(
+        self,
+        question: str,
+        return_sources: bool = True,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Iterator[dict]:
+        """
+        Process a user query and stream the response as it is generated.
+        
+        Yields ``{"event": ..., "data": ...}`` dicts: one ``token`` event per
+        generated fragment, then a single ``done`` event carrying the full
+        response (sources and timings), or an ``error`` event.
+        
+        Args:
+            question: User's question
+            return_sources: Whether to return source documents
+            filters: Metadata every retrieved chunk must match
+            
+        Yields:
+            dict: Stream events
+        """
+        if not question or not isinstance(question, str):
+            yield {
+                "event": "error",
+                "data": {
+                    "success": False,
+                    "error": "Invalid question format",
+                    "answer": None,
+                    "sources": []
+                }
+            }
+            return
+        
+        try:
+            response, retrieval = self._prepare(question, return_sources, filters)
+            if response is not None:
+                if response["success"]:
+                    yield {"event": "token", "data": {"text": response["answer"]}}
+                    yield {"event": "done", "data": response}
+                else:
+                    yield {"event": "error", "data": response}
+                return
+            
+            # Stream response
+            start = time.perf_counter()
+            parts = []
+            for chunk in self.llm.stream(self._build_messages(retrieval)):
+                if not chunk.content:
+                    continue
+                if not parts:
+                    retrieval.timings["first_token_ms"] = (time.perf_counter() - start) * 1000
+                parts.append(chunk.content)
+                yield {"event": "token", "data": {"text": chunk.content}}
+            retrieval.timings["generation_ms"] = (time.perf_counter() - start) * 1000
+            
+            yield {
+                "event": "done",
+                "data": self._finalize(retrieval, "".join(parts), return_sources)
+            }
+            
+        except Exception as e:
+            logger.error(f"Error streaming query: {str(e)}")
+            yield {
+                "event": "error",
+                "data": {
+                    "success": False,
+                    "error": f"Error processing query: {str(e)}",
+                    "answer": None,
+                    "sources": []
+                }
+            }
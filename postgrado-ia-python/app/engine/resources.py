@@ -0,0 +1,89 @@
+"""
+Engine Resources - Clients shared by the ingestion and query engines
+"""
+
+import logging
+import threading
+from typing import Optional
+from langchain.vectorstores import Chroma
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.vectorstore import VectorStore
+
+from .flat_index import FlatIndex, FlatVectorStore
+
+logger = logging.getLogger(__name__)
+
+
+class EngineResources:
+    """
+    Registry of the clients shared by every engine of a process.
+
+    Holds one embeddings client, one vector store handle and one LLM
+    client, so the ingestion and query engines do not each open their own
+    HTTP clients and Chroma handles on the same database. Both engines
+    read the vector store through the registry: ingestion writes through
+    the handle queries search, so a query issued after an ingestion
+    returns sees its chunks, including when the first ingestion had to
+    create the store.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        vector_db_path: str = "./chroma_db",
+        vector_client=None,
+        flat_index: Optional[FlatIndex] = None,
+        llm=None
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            embeddings: Embeddings client used by both engines
+            vector_db_path: Path of the embedded vector database
+            vector_client: Chroma client of a remote server (see
+                ``create_http_client``); None opens the embedded store at vector_db_path
+            flat_index: Memory-mapped index used instead of Chroma
+            llm: Chat model used for generation (the query engine builds
+                its own when None)
+        """
+        self.embeddings = embeddings
+        self.vector_db_path = vector_db_path
+        self.vector_client = vector_client
+        self.flat_index = flat_index
+        self.llm = llm
+
+        self._vector_store: Optional[VectorStore] = None
+        self._opened = False
+        self._lock = threading.Lock()
+
+    @property
+    def vector_store(self) -> Optional[VectorStore]:
+        """The shared vector store, opened on first use (None if it could not be opened)."""
+        if not self._opened:
+            with self._lock:
+                if not self._opened:
+                    self._vector_store = self._open_vector_store()
+                    self._opened = True
+        return self._vector_store
+
+    @vector_store.setter
+    def vector_store(self, store: Optional[VectorStore]):
+        with self._lock:
+            self._vector_store = store
+            self._opened = True
+
+    def _open_vector_store(self) -> Optional[VectorStore]:
+        """Open the flat index, the Chroma server or the embedded store."""
+        try:
+            if self.flat_index is not None:
+                store = FlatVectorStore(self.flat_index, self.embeddings)
+            elif self.vector_client is not None:
+                store = Chroma(client=self.vector_client, embedding_function=self.embeddings)
+            else:
+                store = Chroma(persist_directory=self.vector_db_path, embedding_function=self.embeddings)
+            logger.info("Opened shared vector store")
+            return store
+        except Exception as e:
+            logger.error(f"Failed to open shared vector store: {str(e)}")
+            return None
@@ -0,0 +1,252 @@
+"""
+Retrieval Results - Single-pass container for retrieved chunks, scores and timings
+"""
+
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional, Set
+import numpy as np
+from langchain.schema import Document
+
+# Separator used when concatenating chunks into the prompt context
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+# Metadata flag of chunks written by a bulk import that is not committed yet
+STAGED_KEY = "staged"
+
+
+def is_staged(metadata: Optional[dict]) -> bool:
+    """Whether a stored chunk is hidden until its bulk import commits."""
+    return bool((metadata or {}).get(STAGED_KEY))
+
+
+def distance_to_similarity(distance: float, space: str = "l2") -> float:
+    """
+    Convert a Chroma distance into a cosine similarity.
+
+    OpenAI embeddings are unit-normalized, so every Chroma distance space
+    maps exactly onto cosine similarity.
+
+    Args:
+        distance: Distance returned by the vector database
+        space: Chroma distance space ("l2", "cosine" or "ip")
+
+    Returns:
+        float: Cosine similarity (1.0 means identical)
+    """
+    if space == "l2":
+        # Chroma returns the squared L2 distance: ||a - b||^2 = 2 - 2 cos
+        return 1.0 - distance / 2.0
+    return 1.0 - distance
+
+
+@dataclass
+class RetrievedChunk:
+    """A single chunk returned by the retriever."""
+
+    id: str
+    document: Document
+    score: float
+    embedding: Optional[List[float]] = None
+    # Reciprocal rank fusion score of hybrid retrieval, only used for ordering
+    fused_score: Optional[float] = None
+
+    @property
+    def rank_score(self) -> float:
+        """Score chunks are ordered by: the fused score when set, else the similarity."""
+        return self.fused_score if self.fused_score is not None else self.score
+
+
+@dataclass
+class RetrievalResult:
+    """
+    Result of a single retrieval pass.
+
+    Computed once per query and reused for context assembly,
+    the sources payload and logging.
+    """
+
+    query: str
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    embedding: Optional[List[float]] = None
+    embedding_timed_out: bool = False
+    usage: Dict[str, int] = field(default_factory=dict)
+    filters: Dict[str, str] = field(default_factory=dict)
+    scope_ids: Optional[Set[str]] = None
+
+    @property
+    def documents(self) -> List[Document]:
+        return [chunk.document for chunk in self.chunks]
+
+    @property
+    def scores(self) -> List[float]:
+        return [chunk.score for chunk in self.chunks]
+
+    @property
+    def ids(self) -> List[str]:
+        return [chunk.id for chunk in self.chunks]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.chunks
+
+    def context(self) -> str:
+        """Concatenate the retrieved chunks into the prompt context."""
+        return CONTEXT_SEPARATOR.join(doc.page_content for doc in self.documents)
+
+    def sources(self, preview_chars: int = 200) -> List[dict]:
+        """
+        Build the sources payload returned to API clients.
+
+        Args:
+            preview_chars: Number of characters of each chunk to include
+
+        Returns:
+            List[dict]: One entry per retrieved chunk with its similarity score
+        """
+        return [
+            {
+                "content": chunk.document.page_content[:preview_chars],
+                "source": chunk.document.metadata.get("source", "Unknown"),
+                "page": chunk.document.metadata.get("page", 0),
+                "score": round(chunk.score, 4),
+                "id": chunk.id
+            }
+            for chunk in self.chunks
+        ]
+
+    def format_timings(self) -> str:
+        """Render the per-stage timings as ``stage=12.3ms`` pairs."""
+        return ", ".join(f"{stage}={ms:.1f}ms" for stage, ms in self.timings.items())
+
+    def summary(self) -> str:
+        """One-line description for logging."""
+        top_score = f"{max(self.scores):.3f}" if self.chunks else "n/a"
+        return (
+            f"Retrieved {len(self.chunks)} chunks "
+            f"(top score {top_score}; {self.format_timings()})"
+        )
+
+
+def chunks_from_query_result(
+    raw: dict,
+    space: str = "l2",
+    index: int = 0
+) -> List[RetrievedChunk]:
+    """
+    Build retrieved chunks from a raw Chroma ``collection.query`` response.
+
+    Args:
+        raw: Response of ``collection.query``
+        space: Chroma distance space of the collection
+        index: Position of the query embedding in a batched query
+
+    Returns:
+        List[RetrievedChunk]: Chunks ordered by decreasing similarity,
+        without the staged chunks of uncommitted bulk imports
+    """
+    if not raw or len(raw.get("ids") or []) <= index:
+        return []
+
+    ids = raw["ids"][index]
+    documents = raw["documents"][index]
+    metadatas = raw.get("metadatas")
+    metadatas = metadatas[index] if metadatas is not None else [None] * len(ids)
+    distances = raw["distances"][index]
+    embeddings = raw.get("embeddings")
+    embeddings = embeddings[index] if embeddings is not None else [None] * len(ids)
+
+    return [
+        RetrievedChunk(
+            id=chunk_id,
+            document=Document(page_content=text, metadata=metadata or {}),
+            score=distance_to_similarity(distance, space),
+            embedding=embedding
+        )
+        for chunk_id, text, metadata, distance, embedding in zip(
+            ids, documents, metadatas, distances, embeddings
+        )
+        if not is_staged(metadata)
+    ]
+
+
+def maximal_marginal_relevance(
+    query_embedding: List[float],
+    candidate_embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select diverse candidates with maximal marginal relevance.
+
+    Relevance and candidate-candidate similarities are computed with two
+    matrix products; each selection step is a vectorized update of the
+    maximum similarity to the already selected set.
+
+    Args:
+        query_embedding: Query embedding
+        candidate_embeddings: Candidate embeddings, one row per candidate
+        k: Number of candidates to select
+        lambda_mult: 1.0 favours relevance only, 0.0 diversity only
+
+    Returns:
+        List[int]: Indices of the selected candidates in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or not len(candidates):
+        return []
+
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_embedding, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+
+    return selected
+
+
+def reciprocal_rank_fusion(
+    rankings: List[List[RetrievedChunk]],
+    limit: int,
+    rrf_k: int = 60
+) -> List[RetrievedChunk]:
+    """
+    Merge several rankings with reciprocal rank fusion.
+
+    Each chunk scores ``sum(1 / (rrf_k + rank))`` over the rankings it
+    appears in. The fused score is set as ``fused_score``; ``score`` and
+    ``embedding`` are kept from the first ranking the chunk appears in.
+
+    Args:
+        rankings: Rankings to merge, best first
+        limit: Number of chunks to return
+        rrf_k: Rank smoothing constant
+
+    Returns:
+        List[RetrievedChunk]: Fused ranking
+    """
+    fused: Dict[str, float] = {}
+    chunks: Dict[str, RetrievedChunk] = {}
+
+    for ranking in rankings:
+        for rank, chunk in enumerate(ranking, start=1):
+            fused[chunk.id] = fused.get(chunk.id, 0.0) + 1.0 / (rrf_k + rank)
+            chunks.setdefault(chunk.id, chunk)
+
+    ordered = sorted(fused, key=fused.get, reverse=True)[:limit]
+    return [replace(chunks[chunk_id], fused_score=fused[chunk_id]) for chunk_id in ordered]
@@ -0,0 +1,144 @@
+"""
+Text Splitter - Single-pass equivalent of RecursiveCharacterTextSplitter
+"""
+
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from typing import List, Sequence, Tuple
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+logger = logging.getLogger(__name__)
+
+
+class LinearTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Drop-in RecursiveCharacterTextSplitter that works on offsets.
+
+    Produces exactly the same chunks (same ``chunk_size``/``chunk_overlap``
+    semantics, and page metadata through ``split_documents``) without
+    copying the text while splitting: separators are located with one
+    regex scan per level, pieces are kept as offsets, and chunk windows
+    are found by bisection over those offsets. A chunk is sliced out of
+    the text only once it is emitted, and each character is scanned at
+    most once per separator level.
+
+    Configurations the offset algorithm does not reproduce (regex
+    separators, ``keep_separator=False`` or a custom length function) fall
+    back to the recursive implementation.
+    """
+
+    def __init__(self, **kwargs):
+        """
+        Initialize the splitter.
+
+        Args:
+            **kwargs: RecursiveCharacterTextSplitter arguments
+        """
+        super().__init__(**kwargs)
+        self._linear = (
+            self._keep_separator is True
+            and not self._is_separator_regex
+            and self._length_function is len
+        )
+
+    def split_text(self, text: str) -> List[str]:
+        """
+        Split a text into chunks.
+
+        Args:
+            text: Text to split
+
+        Returns:
+            List[str]: Chunks, identical to RecursiveCharacterTextSplitter's
+        """
+        if not self._linear:
+            return super().split_text(text)
+        chunks: List[str] = []
+        self._split_span(text, 0, len(text), self._separators, chunks)
+        return chunks
+
+    @staticmethod
+    def _pick_separator(text: str, start: int, end: int, separators: List[str]) -> Tuple[str, List[str]]:
+        """Return the first separator present in the span and the ones after it."""
+        for index, separator in enumerate(separators):
+            if separator == "":
+                return separator, []
+            if text.find(separator, start, end) != -1:
+                return separator, separators[index + 1:]
+        return separators[-1], []
+
+    @staticmethod
+    def _pieces(text: str, start: int, end: int, separator: str) -> Tuple[Sequence[int], Sequence[int]]:
+        """Return the start and end offsets of the non-empty pieces of a span."""
+        if separator == "":
+            return range(start, end), range(start + 1, end + 1)
+        if start == end:
+            return [], []
+
+        pattern = re.compile(re.escape(separator))
+        starts = [start]
+        starts.extend(match.start() for match in pattern.finditer(text, start, end))
+        # Only the piece before the first separator can be empty
+        if len(starts) > 1 and starts[1] == start:
+            del starts[0]
+        ends = starts[1:]
+        ends.append(end)
+        return starts, ends
+
+    def _split_span(self, text: str, start: int, end: int, separators: List[str], chunks: List[str]):
+        """Split ``text[start:end]``, appending its chunks in order."""
+        separator, remaining = self._pick_separator(text, start, end, separators)
+        starts, ends = self._pieces(text, start, end, separator)
+        if separator == "" and self._chunk_size > 1:
+            # Single characters always fit, so the whole span is one run
+            if starts:
+                self._merge(text, starts, ends, 0, len(starts), chunks)
+            return
+
+        run_start = 0
+        for index in [i for i in range(len(starts)) if ends[i] - starts[i] >= self._chunk_size]:
+            if index > run_start:
+                self._merge(text, starts, ends, run_start, index, chunks)
+            if remaining:
+                self._split_span(text, starts[index], ends[index], remaining, chunks)
+            else:
+                chunks.append(text[starts[index]:ends[index]])
+            run_start = index + 1
+        if len(starts) > run_start:
+            self._merge(text, starts, ends, run_start, len(starts), chunks)
+
+    def _emit(self, text: str, start: int, end: int, chunks: List[str]):
+        chunk = text[start:end]
+        if self._strip_whitespace:
+            chunk = chunk.strip()
+        if chunk:
+            chunks.append(chunk)
+
+    def _merge(
+        self,
+        text: str,
+        starts: Sequence[int],
+        ends: Sequence[int],
+        first: int,
+        last: int,
+        chunks: List[str]
+    ):
+        """
+        Merge the contiguous pieces ``first`` to ``last`` into chunks.
+
+        Pieces are shorter than ``chunk_size`` and contiguous, so the size
+        of a window of pieces is the distance between its offsets: each
+        chunk's end, and where the overlapping next chunk starts, are found
+        by bisection instead of adding and popping pieces one at a time.
+        """
+        low, high = first, first
+        while True:
+            # Grow the window with every piece that still fits
+            high = bisect_right(ends, starts[low] + self._chunk_size, high, last)
+            self._emit(text, starts[low], ends[high - 1], chunks)
+            if high == last:
+                return
+            # Drop leading pieces until the overlap fits and the next piece fits after it
+            threshold = max(ends[high - 1] - self._chunk_overlap, ends[high] - self._chunk_size)
+            low = bisect_left(starts, threshold, low, high)
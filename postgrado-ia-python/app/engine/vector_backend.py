@@ -0,0 +1,159 @@
+"""
+Vector Backend - Backend names and pooled client/server Chroma connections
+"""
+
+import time
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+VECTOR_BACKEND_EMBEDDED = "embedded"
+VECTOR_BACKEND_HTTP = "http"
+VECTOR_BACKEND_FLAT = "flat"
+VECTOR_BACKENDS = (VECTOR_BACKEND_EMBEDDED, VECTOR_BACKEND_HTTP, VECTOR_BACKEND_FLAT)
+
+# Methods retried on any endpoint: reads, and PUT which replaces a collection's settings
+RETRYABLE_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT"})
+
+# Chroma endpoints whose POSTs can be replayed: reads and upserts keyed by chunk ID.
+# add, update and delete are not retried once sent, since a 502 may follow a write
+# the server already applied.
+IDEMPOTENT_POST_ENDPOINTS = frozenset({"get", "query", "upsert"})
+
+
+class PooledSession(requests.Session):
+    """
+    requests session with a keep-alive connection pool, default timeouts and retries.
+
+    Chroma's HTTP client sends every call through one session but sets no
+    timeout and no retry policy; this session supplies both. Connection
+    failures are always retried, since nothing reached the server; failed
+    responses are only retried for reads and ``IDEMPOTENT_POST_ENDPOINTS``.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = 10,
+        timeout: Tuple[float, float] = (2.0, 30.0),
+        max_retries: int = 3,
+        backoff_factor: float = 0.3
+    ):
+        """
+        Initialize the session.
+
+        Args:
+            pool_size: Keep-alive connections kept open to the server
+            timeout: (connect, read) timeout in seconds for calls that set none
+            max_retries: Retries of connection errors and 502/503/504 responses
+            backoff_factor: Base of the exponential backoff between retries
+        """
+        super().__init__()
+        self.timeout = timeout
+
+        def adapter(allowed_methods):
+            retry = Retry(
+                total=max_retries,
+                backoff_factor=backoff_factor,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=allowed_methods,
+                raise_on_status=False
+            )
+            return HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        default = adapter(RETRYABLE_METHODS)
+        self.mount("http://", default)
+        self.mount("https://", default)
+        self.idempotent_adapter = adapter(RETRYABLE_METHODS | {"POST"})
+
+    def get_adapter(self, url):
+        """Return the adapter that also retries POSTs for idempotent endpoints."""
+        if urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1] in IDEMPOTENT_POST_ENDPOINTS:
+            return self.idempotent_adapter
+        return super().get_adapter(url)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_http_client(
+    host: str = "localhost",
+    port: int = 8000,
+    ssl: bool = False,
+    headers: Optional[Dict[str, str]] = None,
+    pool_size: int = 10,
+    connect_timeout: float = 2.0,
+    read_timeout: float = 30.0,
+    max_retries: int = 3,
+    backoff_factor: float = 0.3
+):
+    """
+    Connect to a Chroma server with a pooled, retrying HTTP session.
+
+    One client can be shared by every engine in the process, so ingestion
+    and queries reuse the same keep-alive connections. Connecting retries
+    with backoff, so the API can start before the Chroma service is ready.
+
+    The session is installed through the client's private ``_server._session``
+    attribute, as laid out by the chromadb version pinned in requirements.txt
+    (0.4.18); a release without it raises instead of silently keeping the
+    unpooled session.
+
+    Args:
+        host: Chroma server host
+        port: Chroma server port
+        ssl: Whether to use HTTPS
+        headers: Extra headers sent with every request (e.g. auth)
+        pool_size: Keep-alive connections kept open to the server
+        connect_timeout: Seconds to establish a connection
+        read_timeout: Seconds to wait for a response
+        max_retries: Retries of failed requests (and of the initial connection)
+        backoff_factor: Base of the exponential backoff between retries
+
+    Returns:
+        chromadb.ClientAPI: Client to pass to Chroma(client=...)
+    """
+    import chromadb
+    from chromadb.config import Settings
+
+    attempt = 0
+    while True:
+        try:
+            client = chromadb.HttpClient(
+                host=host,
+                port=str(port),
+                ssl=ssl,
+                headers=headers,
+                settings=Settings(anonymized_telemetry=False)
+            )
+            break
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            delay = backoff_factor * 2 ** attempt
+            attempt += 1
+            logger.warning(f"Chroma server {host}:{port} unavailable ({e}); retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    server = getattr(client, "_server", None)
+    if not isinstance(getattr(server, "_session", None), requests.Session):
+        raise RuntimeError(
+            "This chromadb release has no client._server._session to pool; "
+            "install the version pinned in requirements.txt"
+        )
+    session = PooledSession(
+        pool_size=pool_size,
+        timeout=(connect_timeout, read_timeout),
+        max_retries=max_retries,
+        backoff_factor=backoff_factor
+    )
+    session.headers.update(server._session.headers)
+    server._session.close()
+    server._session = session
+    logger.info(f"Connected to Chroma server at {host}:{port} (pool of {pool_size})")
+    return client
@@ -0,0 +1,252 @@
+"""
+Directory Watcher - Keeps the knowledge base in sync with a shared documents folder
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DirectoryWatcher:
+    """
+    Ingests PDFs added to or changed in a directory and removes deleted ones.
+
+    Changes are picked up with inotify (through ``watchfiles``) or, when
+    that is unavailable or ``force_polling`` is set, by polling file sizes
+    and modification times. Bursts of events (a copy in progress, many
+    files dropped at once) are debounced into one batch, which is ingested
+    with ``PDFIngestionEngine.ingest_files`` and persisted once. Unchanged
+    files are skipped by their fingerprint, so reprocessing is cheap.
+
+    Chunks ingested by the watcher carry ``source_dir`` metadata, which
+    lets ``sync`` remove documents whose files disappeared while the
+    watcher was not running. Watched documents are identified by their
+    path, so uploads with the same file name are left alone.
+    """
+
+    def __init__(
+        self,
+        ingest_engine,
+        directory: str,
+        debounce_seconds: float = 2.0,
+        max_batch_delay: float = 30.0,
+        poll_interval: float = 5.0,
+        force_polling: bool = False,
+        workers: int = 1
+    ):
+        """
+        Initialize the watcher.
+
+        Args:
+            ingest_engine: PDFIngestionEngine that stores the documents
+            directory: Directory to watch (top level only)
+            debounce_seconds: Quiet time that ends a burst of changes
+            max_batch_delay: Longest wait before a continuous burst is processed anyway
+            poll_interval: Seconds between scans when polling
+            force_polling: Poll even if inotify is available
+            workers: Processes used to parse PDFs in a batch
+        """
+        self.ingest_engine = ingest_engine
+        self.directory = os.path.abspath(directory)
+        self.debounce_seconds = debounce_seconds
+        self.max_batch_delay = max_batch_delay
+        self.poll_interval = poll_interval
+        self.force_polling = force_polling
+        self.workers = workers
+
+        self.mode: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+        self.batches = 0
+        self.files_ingested = 0
+        self.files_removed = 0
+        self.last_batch_at: Optional[float] = None
+
+    def start(self):
+        """Sync the directory once, then watch it on a background thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="directory-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop watching.
+
+        Args:
+            timeout: Seconds to wait for the current batch to finish
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        try:
+            self.sync()
+        except Exception as e:
+            logger.error(f"Initial sync of {self.directory} failed: {str(e)}")
+
+        for paths in self._changes():
+            try:
+                self.process_changes(paths)
+            except Exception as e:
+                logger.error(f"Could not process changes in {self.directory}: {str(e)}")
+
+    def _is_pdf(self, path: str) -> bool:
+        return (
+            path.lower().endswith(".pdf")
+            and os.path.dirname(os.path.abspath(path)) == self.directory
+        )
+
+    def sync(self) -> dict:
+        """
+        Reconcile the vector store with the directory.
+
+        Ingests every new or changed PDF and removes the documents of this
+        directory whose files no longer exist.
+
+        Returns:
+            dict: Batch statistics
+        """
+        present = {
+            os.path.join(self.directory, name)
+            for name in os.listdir(self.directory)
+        }
+        # Watched documents are identified by their path in the directory
+        stored = self.ingest_engine.stored_document_ids(where={"source_dir": self.directory})
+        missing = set(stored) - present
+        return self.process_changes(present | missing)
+
+    def process_changes(self, paths: Iterable[str]) -> dict:
+        """
+        Apply a batch of changed paths.
+
+        Each PDF path is ingested if it exists and removed otherwise;
+        other paths are ignored.
+
+        Args:
+            paths: Paths reported as created, modified or deleted
+
+        Returns:
+            dict: Batch statistics (ingestion stats plus ``removed`` documents)
+        """
+        pdfs = sorted({os.path.abspath(path) for path in paths if self._is_pdf(path)})
+        existing = [path for path in pdfs if os.path.isfile(path)]
+        deleted = [path for path in pdfs if not os.path.exists(path)]
+
+        with self._lock:
+            stats = self.ingest_engine.ingest_files(
+                existing,
+                workers=self.workers,
+                metadata={"source_dir": self.directory}
+            )
+
+            removed = []
+            for path in deleted:
+                if self.ingest_engine.remove_document(path, persist=False):
+                    removed.append(os.path.basename(path))
+            if removed:
+                self.ingest_engine.persist()
+
+            stats["removed"] = removed
+            self.batches += 1
+            self.files_ingested += stats["successful"] - stats["skipped"]
+            self.files_removed += len(removed)
+            self.last_batch_at = time.time()
+
+        if existing or removed:
+            logger.info(
+                f"Watched folder {self.directory}: {stats['successful'] - stats['skipped']} "
+                f"PDFs ingested, {stats['skipped']} unchanged, {stats['failed']} failed, "
+                f"{len(removed)} removed"
+            )
+        return stats
+
+    def _changes(self) -> Iterator[Set[str]]:
+        """Yield debounced batches of changed paths until stopped."""
+        if not self.force_polling:
+            try:
+                from watchfiles import watch
+            except ImportError:
+                logger.warning("watchfiles is not installed, polling the watched folder")
+            else:
+                try:
+                    self.mode = "inotify"
+                    logger.info(f"Watching {self.directory} for PDF changes")
+                    for changes in watch(
+                        self.directory,
+                        debounce=int(self.max_batch_delay * 1000),
+                        step=int(self.debounce_seconds * 1000),
+                        stop_event=self._stop,
+                        recursive=False,
+                        raise_interrupt=False
+                    ):
+                        yield {path for _, path in changes}
+                    return
+                except Exception as e:
+                    if self._stop.is_set():
+                        return
+                    logger.warning(f"File events unavailable for {self.directory} ({e}), polling instead")
+
+        self.mode = "polling"
+        logger.info(f"Polling {self.directory} every {self.poll_interval}s for PDF changes")
+        yield from self._poll()
+
+    def _snapshot(self) -> Dict[str, Tuple[float, int]]:
+        snapshot = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.lower().endswith(".pdf"):
+                stat = entry.stat()
+                snapshot[entry.path] = (stat.st_mtime, stat.st_size)
+        return snapshot
+
+    def _poll(self) -> Iterator[Set[str]]:
+        """Scan the directory periodically, yielding changes once they settle."""
+        previous = self._snapshot()
+        pending: Set[str] = set()
+        first_change = last_change = 0.0
+
+        while not self._stop.wait(self.poll_interval):
+            try:
+                current = self._snapshot()
+            except OSError as e:
+                logger.warning(f"Could not scan {self.directory}: {e}")
+                continue
+
+            changed = {
+                path for path in previous.keys() | current.keys()
+                if previous.get(path) != current.get(path)
+            }
+            previous = current
+            now = time.monotonic()
+            if changed:
+                if not pending:
+                    first_change = now
+                pending |= changed
+                last_change = now
+
+            settled = now - last_change >= self.debounce_seconds
+            overdue = now - first_change >= self.max_batch_delay
+            if pending and (settled or overdue):
+                yield pending
+                pending = set()
+
+    def stats(self) -> dict:
+        """Return watcher counters."""
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "mode": self.mode,
+                "running": self._thread is not None and self._thread.is_alive(),
+                "batches": self.batches,
+                "files_ingested": self.files_ingested,
+                "files_removed": self.files_removed,
+                "last_batch_at": self.last_batch_at
+            }
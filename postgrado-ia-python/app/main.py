@@ -3,15 +3,37 @@ FastAPI application for the RAG Chatbot
 """
 
 import os
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+import json
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 import logging
-from typing import Optional, List
+from typing import Optional, List, Dict
 import time
 
-from app.engine import PDFIngestionEngine, RAGQueryEngine
-from app.utils import get_logger, validate_pdf_file, validate_query
+from langchain.chat_models import ChatOpenAI
+from langchain.embeddings import OpenAIEmbeddings
+
+from app.engine import (
+    BM25Index,
+    CachedEmbeddings,
+    DirectoryWatcher,
+    EmbeddingCache,
+    EmbeddingScheduler,
+    EngineResources,
+    IngestionJobQueue,
+    MetadataIndex,
+    PDFIngestionEngine,
+    RAGQueryEngine,
+    SemanticAnswerCache,
+)
+from app.engine.flat_index import FlatIndex
+from app.engine.metadata_index import FILTER_FIELDS
+from app.engine.vector_backend import VECTOR_BACKEND_FLAT, VECTOR_BACKEND_HTTP, VECTOR_BACKENDS, create_http_client
+from app.utils import UploadRejected, get_logger, save_pdf_request, validate_query
+from app.utils.uploads import MULTIPART_OVERHEAD_BYTES
+from app.utils.validators import MAX_PDF_SIZE
 
 logger = get_logger(__name__)
 
@@ -34,6 +56,11 @@ app.add_middleware(
 # Initialize engines
 ingest_engine = None
 query_engine = None
+embedding_cache = None
+chunk_embedding_cache = None
+answer_cache = None
+job_queue = None
+directory_watcher = None
 
 
 # Pydantic models
@@ -41,6 +68,8 @@ class QueryRequest(BaseModel):
     """Query request model"""
     question: str = Field(..., description="The user's question")
     return_sources: bool = Field(default=True, description="Whether to return source documents")
+    program: Optional[str] = Field(default=None, description="Only search documents of this program")
+    source_file: Optional[str] = Field(default=None, description="Only search this uploaded file")
 
 
 class QueryResponse(BaseModel):
@@ -50,6 +79,23 @@ class QueryResponse(BaseModel):
     sources: List[dict] = Field(default_factory=list)
     question: Optional[str] = None
     error: Optional[str] = None
+    timings: Dict[str, float] = Field(default_factory=dict, description="Per-stage latency in milliseconds")
+    cached: bool = Field(default=False, description="Whether the answer was served from the answer cache")
+    usage: Dict[str, int] = Field(default_factory=dict, description="Prompt token usage")
+
+
+class BatchQueryRequest(BaseModel):
+    """Batch query request model"""
+    questions: List[str] = Field(..., min_length=1, description="The users' questions")
+    return_sources: bool = Field(default=True, description="Whether to return source documents")
+    program: Optional[str] = Field(default=None, description="Only search documents of this program")
+    source_file: Optional[str] = Field(default=None, description="Only search this uploaded file")
+
+
+class BatchQueryResponse(BaseModel):
+    """Batch query response model"""
+    results: List[QueryResponse]
+    elapsed_ms: float
 
 
 class IngestionResponse(BaseModel):
@@ -57,9 +103,24 @@ class IngestionResponse(BaseModel):
     success: bool
     message: str
     file_name: Optional[str] = None
+    job_id: Optional[str] = None
     error: Optional[str] = None
 
 
+class IngestionJobResponse(BaseModel):
+    """Background ingestion job status model"""
+    job_id: str
+    state: str
+    file_name: str
+    progress: Dict[str, object] = {}
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    timings: Dict[str, float] = {}
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
@@ -71,26 +132,179 @@ class HealthResponse(BaseModel):
 @app.on_event("startup")
 async def startup_event():
     """Initialize engines on startup"""
-    global ingest_engine, query_engine
+    global ingest_engine, query_engine, embedding_cache, chunk_embedding_cache, answer_cache, job_queue
+    global directory_watcher
     
     logger.info("Starting RAG Chatbot application...")
     
     try:
         vector_db_path = os.getenv("VECTOR_DB_PATH", "./chroma_db")
+        embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+        
+        # "embedded" opens vector_db_path in-process, "http" shares the Chroma service
+        # and "flat" searches a memory-mapped matrix shared by every worker process
+        vector_backend = os.getenv("VECTOR_BACKEND", "embedded").lower()
+        if vector_backend not in VECTOR_BACKENDS:
+            raise ValueError(f"VECTOR_BACKEND must be one of {VECTOR_BACKENDS}, got {vector_backend}")
+        vector_client = None
+        flat_index = None
+        if vector_backend == VECTOR_BACKEND_FLAT:
+            flat_index = FlatIndex(
+                os.getenv("FLAT_INDEX_PATH", "./flat_index"),
+                quantization=os.getenv("FLAT_INDEX_QUANTIZATION", "none").lower(),
+                rescore_factor=int(os.getenv("FLAT_INDEX_RESCORE_FACTOR", 4))
+            )
+        elif vector_backend == VECTOR_BACKEND_HTTP:
+            vector_client = create_http_client(
+                host=os.getenv("CHROMADB_HOST", "localhost"),
+                port=int(os.getenv("CHROMADB_PORT", 8000)),
+                ssl=os.getenv("CHROMADB_SSL", "false").lower() == "true",
+                pool_size=int(os.getenv("CHROMADB_POOL_SIZE", 10)),
+                connect_timeout=float(os.getenv("CHROMADB_CONNECT_TIMEOUT", 2)),
+                read_timeout=float(os.getenv("CHROMADB_READ_TIMEOUT", 30)),
+                max_retries=int(os.getenv("CHROMADB_MAX_RETRIES", 3))
+            )
+        
+        # One embeddings client, backed by a persistent cache, for both engines
+        embedding_cache = EmbeddingCache(
+            db_path=os.getenv("EMBEDDING_CACHE_PATH", "./cache/embeddings.db"),
+            max_memory_entries=int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", 10000))
+        )
+        embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model=embedding_model,
+                api_key=os.getenv("OPENAI_API_KEY")
+            ),
+            cache=embedding_cache,
+            model_name=embedding_model
+        )
+        
+        # One embeddings client, vector store and LLM client shared by both engines,
+        # so queries search through the handle ingestion writes to
+        resources = EngineResources(
+            embeddings=embeddings,
+            vector_db_path=vector_db_path,
+            vector_client=vector_client,
+            flat_index=flat_index,
+            llm=ChatOpenAI(
+                model_name=os.getenv("LLM_MODEL", "gpt-4"),
+                temperature=float(os.getenv("TEMPERATURE", 0.3)),
+                max_tokens=int(os.getenv("MAX_TOKENS", 1000)),
+                api_key=os.getenv("OPENAI_API_KEY")
+            )
+        )
+        
+        # BM25 index for hybrid retrieval and the slow-embedding fallback
+        retrieval_mode = os.getenv("RETRIEVAL_MODE", "vector")
+        embedding_timeout = float(os.getenv("EMBEDDING_TIMEOUT", 0)) or None
+        lexical_index = None
+        if retrieval_mode == "hybrid" or embedding_timeout is not None:
+            lexical_index = BM25Index()
+        
+        # Chunk IDs by program and source file for filtered queries
+        metadata_index = MetadataIndex()
+        
+        # Ingestion embeds chunks in concurrent, rate-limited batches
+        embedding_scheduler = EmbeddingScheduler(
+            embeddings,
+            max_batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", 100)),
+            max_batch_tokens=int(os.getenv("EMBEDDING_BATCH_TOKENS", 50000)),
+            max_concurrency=int(os.getenv("EMBEDDING_CONCURRENCY", 4)),
+            requests_per_minute=int(os.getenv("EMBEDDING_RPM", 0)) or None,
+            tokens_per_minute=int(os.getenv("EMBEDDING_TPM", 0)) or None,
+            max_retries=int(os.getenv("EMBEDDING_MAX_RETRIES", 5))
+        )
+        
+        # Content-addressed chunk embeddings reused across re-ingestions
+        chunk_embedding_cache = EmbeddingCache(
+            db_path=os.getenv("CHUNK_EMBEDDING_CACHE_PATH", "./cache/chunk_embeddings.db"),
+            max_memory_entries=int(os.getenv("CHUNK_EMBEDDING_CACHE_MEMORY_ENTRIES", 1000))
+        )
         
         ingest_engine = PDFIngestionEngine(
             chunk_size=int(os.getenv("CHUNK_SIZE", 1000)),
             chunk_overlap=int(os.getenv("CHUNK_OVERLAP", 200)),
-            vector_db_path=vector_db_path
+            embedding_model=embedding_model,
+            lexical_index=lexical_index,
+            embedding_scheduler=embedding_scheduler,
+            chunk_embedding_cache=chunk_embedding_cache,
+            stream_batch_size=int(os.getenv("INGEST_STREAM_BATCH_SIZE", 256)),
+            metadata_index=metadata_index,
+            resources=resources
         )
         logger.info("PDF Ingestion Engine initialized")
         
+        # Index the stored chunks before the job queue or the watcher can
+        # ingest more; the query engine only loads indexes that are empty
+        if resources.vector_store is not None:
+            for name, index in (("lexical", lexical_index), ("metadata", metadata_index)):
+                if index is None:
+                    continue
+                try:
+                    index.load_from_collection(resources.vector_store._collection)
+                except Exception as e:
+                    logger.warning(f"Could not build {name} index: {e}")
+        
+        # Uploads are ingested in the background; jobs survive restarts
+        job_queue = IngestionJobQueue(
+            ingest_engine,
+            db_path=os.getenv("INGEST_JOBS_DB_PATH", "./cache/jobs.db"),
+            upload_dir=os.getenv("INGEST_UPLOAD_DIR", "./cache/uploads"),
+            workers=int(os.getenv("INGEST_JOB_WORKERS", 2)),
+            heartbeat_interval=float(os.getenv("INGEST_JOB_HEARTBEAT_SECONDS", 10)),
+            stale_after=float(os.getenv("INGEST_JOB_STALE_SECONDS", 60))
+        )
+        job_queue.start()
+        
+        if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true":
+            answer_cache = SemanticAnswerCache(
+                max_distance=float(os.getenv("ANSWER_CACHE_MAX_DISTANCE", 0.05)),
+                ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+                max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000)),
+                max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", 52428800))
+            )
+            # Drop cached answers whenever ingestion changes their chunks
+            ingest_engine.add_ingest_listener(answer_cache.on_chunks_changed)
+            logger.info("Semantic answer cache enabled")
+        
+        # Keep the knowledge base in sync with a shared documents folder
+        watch_dir = os.getenv("WATCH_DIR")
+        if watch_dir:
+            directory_watcher = DirectoryWatcher(
+                ingest_engine,
+                watch_dir,
+                debounce_seconds=float(os.getenv("WATCH_DEBOUNCE_SECONDS", 2)),
+                max_batch_delay=float(os.getenv("WATCH_MAX_BATCH_DELAY", 30)),
+                poll_interval=float(os.getenv("WATCH_POLL_INTERVAL", 5)),
+                force_polling=os.getenv("WATCH_FORCE_POLLING", "false").lower() == "true",
+                workers=int(os.getenv("INGEST_WORKERS", 1))
+            )
+            directory_watcher.start()
+            logger.info(f"Watching {watch_dir} for PDF changes")
+        
         query_engine = RAGQueryEngine(
-            vector_db_path=vector_db_path,
             model_name=os.getenv("LLM_MODEL", "gpt-4"),
             temperature=float(os.getenv("TEMPERATURE", 0.3)),
             max_tokens=int(os.getenv("MAX_TOKENS", 1000)),
-            retrieval_k=int(os.getenv("RETRIEVAL_K", 5))
+            retrieval_k=int(os.getenv("RETRIEVAL_K", 5)),
+            answer_cache=answer_cache,
+            embedding_model=embedding_model,
+            search_workers=int(os.getenv("SEARCH_WORKERS", 4)),
+            max_context_tokens=int(os.getenv("MAX_CONTEXT_TOKENS", 3000)),
+            retrieval_mode=retrieval_mode,
+            lexical_index=lexical_index,
+            hybrid_candidates=int(os.getenv("HYBRID_CANDIDATES", 20)),
+            embedding_timeout=embedding_timeout,
+            mmr_lambda=(
+                float(os.getenv("MMR_LAMBDA", 0.5))
+                if os.getenv("MMR_ENABLED", "false").lower() == "true"
+                else None
+            ),
+            mmr_fetch_k=int(os.getenv("MMR_FETCH_K", 20)),
+            batch_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", 4)),
+            coalesce_requests=os.getenv("QUERY_COALESCING", "true").lower() == "true",
+            metadata_index=metadata_index,
+            resources=resources
         )
         logger.info("RAG Query Engine initialized")
         
@@ -103,6 +317,17 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down RAG Chatbot application...")
+    
+    if directory_watcher is not None:
+        directory_watcher.stop(timeout=5)
+    if job_queue is not None:
+        job_queue.shutdown(timeout=5)
+    if query_engine is not None:
+        query_engine.close()
+    if embedding_cache is not None:
+        embedding_cache.close()
+    if chunk_embedding_cache is not None:
+        chunk_embedding_cache.close()
 
 
 # Endpoints
@@ -116,6 +341,27 @@ async def health_check():
     )
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the embedding and answer caches and of query coalescing"""
+    coalescer = getattr(query_engine, "coalescer", None)
+    return {
+        "embeddings": embedding_cache.stats() if embedding_cache is not None else None,
+        "chunk_embeddings": chunk_embedding_cache.stats() if chunk_embedding_cache is not None else None,
+        "answers": answer_cache.stats() if answer_cache is not None else None,
+        "coalescing": coalescer.stats() if coalescer is not None else None
+    }
+
+
+def _query_filters(request) -> Dict[str, str]:
+    """Collect the metadata filters set on a query request"""
+    return {
+        field: getattr(request, field)
+        for field in FILTER_FIELDS
+        if getattr(request, field)
+    }
+
+
 @app.post("/query", response_model=QueryResponse)
 async def query_endpoint(request: QueryRequest):
     """
@@ -143,10 +389,11 @@ async def query_endpoint(request: QueryRequest):
     start_time = time.time()
     
     try:
-        # Process query
-        result = query_engine.query(
+        # Process query without blocking the event loop
+        result = await query_engine.aquery(
             question=request.question,
-            return_sources=request.return_sources
+            return_sources=request.return_sources,
+            filters=_query_filters(request)
         )
         
         elapsed_time = time.time() - start_time
@@ -167,13 +414,154 @@ async def query_endpoint(request: QueryRequest):
         )
 
 
-@app.post("/ingest/pdf", response_model=IngestionResponse)
-async def ingest_pdf(file: UploadFile = File(...)):
+@app.post("/query/batch", response_model=BatchQueryResponse)
+async def query_batch_endpoint(request: BatchQueryRequest):
+    """
+    Query the RAG system with several questions at once.
+    
+    Questions share one embeddings request and one vector search; answers
+    are generated with bounded concurrency. Invalid or failed questions are
+    reported per item.
+    
+    Args:
+        request: BatchQueryRequest containing the questions
+        
+    Returns:
+        BatchQueryResponse: One QueryResponse per question, in order
+    """
+    max_questions = int(os.getenv("BATCH_MAX_QUESTIONS", 50))
+    if len(request.questions) > max_questions:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch must not exceed {max_questions} questions"
+        )
+    
+    # Check if query engine is initialized
+    if query_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG Query Engine not initialized"
+        )
+    
+    start_time = time.time()
+    
+    # Validate each question; only valid ones reach the engine
+    results: List[Optional[QueryResponse]] = [None] * len(request.questions)
+    valid = []
+    for i, question in enumerate(request.questions):
+        is_valid, error = validate_query(question)
+        if is_valid:
+            valid.append(i)
+        else:
+            results[i] = QueryResponse(success=False, answer=None, question=question, error=error)
+    
+    try:
+        answers = await query_engine.abatch_query(
+            [request.questions[i] for i in valid],
+            return_sources=request.return_sources,
+            filters=_query_filters(request)
+        )
+    except Exception as e:
+        logger.error(f"Error processing batch query: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error processing batch query"
+        )
+    
+    for i, answer in zip(valid, answers):
+        results[i] = QueryResponse(**answer)
+    
+    elapsed_time = time.time() - start_time
+    logger.info(f"Batch of {len(request.questions)} queries processed in {elapsed_time:.2f}s")
+    
+    return BatchQueryResponse(results=results, elapsed_ms=elapsed_time * 1000)
+
+
+def _format_sse(event: str, data: dict) -> str:
+    """Format a server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
     """
-    Ingest a PDF document.
+    Query the RAG system and stream the answer as server-sent events.
+    
+    Emits one ``token`` event per generated fragment followed by a ``done``
+    event with the full response (sources and timings), or an ``error`` event.
     
     Args:
-        file: The PDF file to ingest
+        request: QueryRequest containing the question
+        
+    Returns:
+        StreamingResponse: text/event-stream of answer tokens
+    """
+    # Validate query
+    is_valid, error = validate_query(request.question)
+    if not is_valid:
+        raise HTTPException(status_code=400, detail=error)
+    
+    # Check if query engine is initialized
+    if query_engine is None:
+        raise HTTPException(
+            status_code=503,
+            detail="RAG Query Engine not initialized"
+        )
+    
+    def event_stream():
+        start_time = time.time()
+        for event in query_engine.stream_query(
+            question=request.question,
+            return_sources=request.return_sources,
+            filters=_query_filters(request)
+        ):
+            yield _format_sse(event["event"], event["data"])
+        
+        elapsed_time = time.time() - start_time
+        if elapsed_time > 5.0:
+            logger.warning(f"Streamed query latency exceeded 5s: {elapsed_time:.2f}s")
+        logger.info(f"Streamed query processed in {elapsed_time:.2f}s")
+    
+    # Sync generator: Starlette iterates it in a worker thread
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# The body is parsed by the endpoint itself, so the form is documented here
+PDF_UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {"file": {"type": "string", "format": "binary"}}
+                }
+            }
+        }
+    }
+}
+
+
+@app.post("/ingest/pdf", response_model=IngestionResponse, openapi_extra=PDF_UPLOAD_REQUEST_BODY)
+async def ingest_pdf(request: Request, response: Response):
+    """
+    Ingest a PDF document (multipart form field ``file``).
+    
+    The request body is parsed as it arrives and the PDF streamed to a
+    unique temporary file with constant memory, so an oversized upload is
+    cut off once it passes the limit, with or without a Content-Length.
+    The PDF is then queued and answered right away (202) with a job ID to
+    poll at ``GET /ingest/jobs/{job_id}``; without a job queue it is
+    ingested inline.
+    
+    Args:
+        request: Incoming request (its Content-Length is checked up front)
+        response: Response whose status code is set for queued uploads
         
     Returns:
         IngestionResponse: Status of ingestion
@@ -186,45 +574,58 @@ async def ingest_pdf(file: UploadFile = File(...)):
         )
     
     try:
-        # Validate file
-        if not file.filename.lower().endswith('.pdf'):
+        # Reject oversized uploads before reading them
+        content_length = int(request.headers.get("content-length") or 0)
+        if content_length > MAX_PDF_SIZE + MULTIPART_OVERHEAD_BYTES:
             return IngestionResponse(
                 success=False,
-                message="Invalid file type",
-                error="Only PDF files are accepted"
+                message="PDF validation failed",
+                error="File size exceeds 50MB limit"
             )
         
-        # Save temporary file
-        temp_path = f"/tmp/{file.filename}"
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        # Validate PDF
-        is_valid, error = validate_pdf_file(temp_path)
-        if not is_valid:
+        # Stream to a unique temporary file, validating and hashing as it arrives
+        try:
+            file_name, upload = await save_pdf_request(
+                request,
+                directory=job_queue.upload_dir if job_queue is not None else None
+            )
+        except UploadRejected as e:
             return IngestionResponse(
                 success=False,
                 message="PDF validation failed",
-                error=error
+                error=str(e)
             )
+        temp_path = upload.path
         
         # Ingest PDF
         metadata = {
-            "program": file.filename.split('.')[0],
+            "program": file_name.split('.')[0],
+            "source": file_name,
+            "source_file": file_name,
             "uploaded_at": str(time.time())
         }
         
-        success = ingest_engine.ingest_pdf(temp_path, metadata)
+        if job_queue is not None:
+            job_id = job_queue.submit(temp_path, file_name, metadata, content_hash=upload.sha256)
+            response.status_code = 202
+            return IngestionResponse(
+                success=True,
+                message=f"PDF '{file_name}' queued for ingestion",
+                file_name=file_name,
+                job_id=job_id
+            )
         
-        # Cleanup
-        os.remove(temp_path)
+        try:
+            success = ingest_engine.ingest_pdf(temp_path, metadata)
+        finally:
+            # Cleanup
+            os.remove(temp_path)
         
         if success:
             return IngestionResponse(
                 success=True,
-                message=f"PDF '{file.filename}' successfully ingested",
-                file_name=file.filename
+                message=f"PDF '{file_name}' successfully ingested",
+                file_name=file_name
             )
         else:
             return IngestionResponse(
@@ -242,6 +643,37 @@ async def ingest_pdf(file: UploadFile = File(...)):
         )
 
 
+@app.get("/ingest/jobs/{job_id}", response_model=IngestionJobResponse)
+async def ingestion_job_status(job_id: str):
+    """
+    Report the state, progress and timings of a background ingestion.
+    
+    Args:
+        job_id: ID returned by POST /ingest/pdf
+        
+    Returns:
+        IngestionJobResponse: Job status
+    """
+    if job_queue is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Ingestion job queue not initialized"
+        )
+    
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return IngestionJobResponse(**job)
+
+
+@app.get("/ingest/watcher")
+async def watcher_status():
+    """Counters of the watched documents folder (disabled unless WATCH_DIR is set)"""
+    if directory_watcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **directory_watcher.stats()}
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -3,6 +3,15 @@ Utility functions for the RAG application
 """
 
 from .logging_config import get_logger
+from .uploads import StoredUpload, UploadRejected, save_pdf_request, save_pdf_upload
 from .validators import validate_pdf_file, validate_query
 
-__all__ = ["get_logger", "validate_pdf_file", "validate_query"]
+__all__ = [
+    "get_logger",
+    "save_pdf_request",
+    "save_pdf_upload",
+    "StoredUpload",
+    "UploadRejected",
+    "validate_pdf_file",
+    "validate_query",
+]
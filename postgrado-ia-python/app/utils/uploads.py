@@ -0,0 +1,221 @@
+"""
+Streaming upload storage with inline size, type and hash checks
+"""
+
+import os
+import hashlib
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from .validators import MAX_PDF_SIZE, PDF_MAGIC
+
+# Bytes read from the upload and written to disk per step
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and headers when checking Content-Length
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(ValueError):
+    """Raised when an upload fails validation while it is being stored."""
+
+
+@dataclass
+class StoredUpload:
+    """An upload saved to disk."""
+    
+    path: str
+    size: int
+    sha256: str
+
+
+class _PDFWriter:
+    """Writes a PDF upload to a unique temporary file, checking it as bytes arrive."""
+    
+    def __init__(self, directory: Optional[str], max_bytes: int):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(prefix="upload-", suffix=".pdf", dir=directory)
+        self._file = os.fdopen(fd, "wb")
+        self._digest = hashlib.sha256()
+        self._header = b""
+        self.max_bytes = max_bytes
+        self.size = 0
+    
+    async def write(self, chunk: bytes):
+        """Check and append the next bytes of the upload."""
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(f"File size exceeds {self.max_bytes // 1048576}MB limit")
+        
+        if len(self._header) < len(PDF_MAGIC):
+            self._header += chunk[:len(PDF_MAGIC) - len(self._header)]
+            if not PDF_MAGIC.startswith(self._header):
+                raise UploadRejected("File content is not a PDF")
+        
+        self._digest.update(chunk)
+        await run_in_threadpool(self._file.write, chunk)
+    
+    def finish(self) -> StoredUpload:
+        """Close the file once the whole upload was written."""
+        self._file.close()
+        if self.size == 0:
+            raise UploadRejected("File is empty")
+        if self._header != PDF_MAGIC:
+            raise UploadRejected("File content is not a PDF")
+        return StoredUpload(path=self.path, size=self.size, sha256=self._digest.hexdigest())
+    
+    def discard(self):
+        """Close and remove the partial file."""
+        self._file.close()
+        os.remove(self.path)
+
+
+async def save_pdf_upload(
+    upload,
+    directory: Optional[str] = None,
+    max_bytes: int = MAX_PDF_SIZE,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Stream an uploaded PDF to a unique temporary file.
+    
+    The upload is copied in fixed-size chunks, so memory stays constant
+    however large the file is. The size limit is enforced and the SHA-256
+    computed as bytes are copied, and the ``%PDF`` header is checked on the
+    first bytes. The file is removed if any check fails.
+    
+    Args:
+        upload: FastAPI UploadFile (anything with ``async read(size)``)
+        directory: Directory for the file (system temp directory if None)
+        max_bytes: Largest accepted upload
+        chunk_size: Bytes copied per step
+        
+    Returns:
+        StoredUpload: Path, size and SHA-256 of the stored file
+        
+    Raises:
+        UploadRejected: If the upload is empty, too large or not a PDF
+    """
+    writer = _PDFWriter(directory, max_bytes)
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            await writer.write(chunk)
+        return writer.finish()
+    except BaseException:
+        writer.discard()
+        raise
+
+
+async def save_pdf_request(
+    request,
+    field: str = "file",
+    directory: Optional[str] = None,
+    max_bytes: int = MAX_PDF_SIZE
+) -> Tuple[str, StoredUpload]:
+    """
+    Stream the PDF of a multipart/form-data request straight to a temporary file.
+    
+    The body is parsed as it arrives instead of being spooled by the
+    framework first, so the file is written to disk once. The request is
+    cut off as soon as its body passes ``max_bytes`` plus the multipart
+    overhead, including chunked uploads that send no Content-Length; the
+    file itself gets the same checks as ``save_pdf_upload``. Other form
+    fields are skipped.
+    
+    Args:
+        request: Starlette request (anything with ``headers`` and ``stream()``)
+        field: Form field holding the file
+        directory: Directory for the file (system temp directory if None)
+        max_bytes: Largest accepted upload
+        
+    Returns:
+        Tuple[str, StoredUpload]: The uploaded file name and the stored file
+        
+    Raises:
+        UploadRejected: If the body is not multipart, has no PDF in ``field``,
+            or the file is empty, too large or not a PDF
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadRejected("Expected a multipart/form-data upload")
+    
+    # The parser calls back synchronously; events are handled after each write
+    events: List[Tuple[str, object]] = []
+    headers: Dict[bytes, bytes] = {}
+    header = [b"", b""]
+    
+    def on_header_field(data: bytes, start: int, end: int):
+        header[0] += data[start:end]
+    
+    def on_header_value(data: bytes, start: int, end: int):
+        header[1] += data[start:end]
+    
+    def on_header_end():
+        headers[header[0].lower()] = header[1]
+        header[:] = [b"", b""]
+    
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+        headers.clear()
+    
+    def on_part_data(data: bytes, start: int, end: int):
+        events.append(("data", data[start:end]))
+    
+    def on_part_end():
+        events.append(("end", None))
+    
+    parser = MultipartParser(boundary, {
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end
+    })
+    
+    max_body_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+    received = 0
+    writer, file_name, in_file = None, None, False
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body_bytes:
+                raise UploadRejected(f"File size exceeds {max_bytes // 1048576}MB limit")
+            parser.write(chunk)
+            
+            for kind, value in events:
+                if kind == "headers":
+                    _, disposition = parse_options_header(value.get(b"content-disposition", b""))
+                    in_file = (
+                        writer is None
+                        and disposition.get(b"name") == field.encode()
+                        and b"filename" in disposition
+                    )
+                    if in_file:
+                        file_name = disposition[b"filename"].decode("utf-8", "replace")
+                        if not file_name.lower().endswith(".pdf"):
+                            raise UploadRejected("Only PDF files are accepted")
+                        writer = _PDFWriter(directory, max_bytes)
+                elif kind == "data" and in_file:
+                    await writer.write(value)
+                elif kind == "end":
+                    in_file = False
+            events.clear()
+        
+        parser.finalize()
+        if writer is None:
+            raise UploadRejected(f"No '{field}' file in the upload")
+        return file_name, writer.finish()
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
@@ -6,6 +6,12 @@ import os
 import mimetypes
 from typing import Tuple
 
+# Largest accepted PDF upload (50MB)
+MAX_PDF_SIZE = 52428800
+
+# Every PDF file starts with this header
+PDF_MAGIC = b"%PDF"
+
 
 def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     """
@@ -32,7 +38,7 @@ def validate_pdf_file(file_path: str) -> Tuple[bool, str]:
     
     # Check file size (max 50MB)
     file_size = os.path.getsize(file_path)
-    if file_size > 52428800:  # 50MB
+    if file_size > MAX_PDF_SIZE:
         return False, "File size exceeds 50MB limit"
     
     # Check file is not empty
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Quantization Evaluation - Memory and recall@k of the flat index storage modes
+
+Stores the same embeddings in a FlatIndex with float32, float16 and int8
+codes and, for each mode and rescoring factor, reports the bytes every
+search scans, recall@k against the float32 results and search latency.
+Embeddings come from an existing Chroma store or flat index when given,
+otherwise from synthetic clustered vectors; queries are stored vectors
+with noise added.
+
+Usage:
+    python benchmarks/quantization_eval.py --chroma ./chroma_db --k 5
+    python benchmarks/quantization_eval.py --flat-index ./flat_index --rescore-factors 1,2,4
+    python benchmarks/quantization_eval.py --vectors 30000 --dimensions 1536
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from app.engine.flat_index import QUANTIZATIONS, FlatIndex
+
+
+def load_chroma(path: str) -> np.ndarray:
+    """Read every stored embedding of the langchain collection of a Chroma store."""
+    import chromadb
+    from chromadb.config import Settings
+
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    collection = client.get_collection("langchain")
+    return np.asarray(collection.get(include=["embeddings"])["embeddings"], dtype=np.float32)
+
+
+def load_flat_index(path: str, batch_size: int = 5000) -> np.ndarray:
+    """Read every stored embedding of a flat index."""
+    index = FlatIndex(path)
+    vectors, offset = [], 0
+    while True:
+        batch = index.get(include=["embeddings"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        vectors.extend(batch["embeddings"])
+        offset += len(batch["ids"])
+    index.close()
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def synthetic_vectors(count: int, dimensions: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered vectors, so near neighbours are close as with real embeddings."""
+    centers = rng.normal(size=(max(1, count // 50), dimensions))
+    assignment = rng.integers(0, len(centers), size=count)
+    return (centers[assignment] + 0.6 * rng.normal(size=(count, dimensions))).astype(np.float32)
+
+
+def search(index: FlatIndex, queries: np.ndarray, k: int) -> tuple:
+    """Return the result IDs of each query and the per-query latencies in ms."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        raw = index.query([query.tolist()], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(raw["ids"][0])
+    return results, latencies
+
+
+def recall(results: List[List[str]], truth: List[List[str]]) -> float:
+    return statistics.mean(
+        len(set(found) & set(expected)) / len(expected)
+        for found, expected in zip(results, truth) if expected
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluation of the flat index quantization modes")
+    parser.add_argument("--chroma", help="Chroma persist directory to read embeddings from")
+    parser.add_argument("--flat-index", help="Flat index directory to read embeddings from")
+    parser.add_argument("--vectors", type=int, default=20000, help="Synthetic vectors when no store is given")
+    parser.add_argument("--dimensions", type=int, default=1536, help="1536 = text-embedding-3-small")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.5, help="Noise added to the sampled query vectors")
+    parser.add_argument("--k", type=int, default=int(os.getenv("RETRIEVAL_K", 5)))
+    parser.add_argument("--rescore-factors", default="1,4", help="Comma-separated rescoring factors")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    if args.chroma:
+        vectors, origin = load_chroma(args.chroma), args.chroma
+    elif args.flat_index:
+        vectors, origin = load_flat_index(args.flat_index), args.flat_index
+    else:
+        vectors, origin = synthetic_vectors(args.vectors, args.dimensions, rng), "vectores sintéticos"
+    if not len(vectors):
+        print(f"No hay embeddings en {origin}")
+        sys.exit(1)
+
+    sample = vectors[rng.integers(0, len(vectors), size=args.queries)]
+    queries = sample + args.noise * np.abs(sample).mean() * rng.normal(size=sample.shape)
+    factors = [int(factor) for factor in args.rescore_factors.split(",")]
+
+    print("=== EVALUACIÓN DE CUANTIZACIÓN ===")
+    print(f"Embeddings: {origin} ({len(vectors)} x {vectors.shape[1]}), {args.queries} consultas, k={args.k}")
+    print(f"{'Modo':<9} {'Rescore':>8} {'Búsqueda MB':>12} {'B/vector':>9} {'Ahorro':>7} {'Recall@k':>9} {'p50 ms':>8}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = FlatIndex(directory)
+        for start in range(0, len(vectors), 5000):
+            batch = vectors[start:start + 5000]
+            index.add(ids=[str(start + i) for i in range(len(batch))], embeddings=batch)
+        truth, _ = search(index, queries, args.k)
+        index.close()
+
+        for quantization in QUANTIZATIONS:
+            for factor in factors if quantization != QUANTIZATIONS[0] else [1]:
+                # Reopening with another quantization re-encodes the stored vectors
+                index = FlatIndex(directory, quantization=quantization, rescore_factor=factor)
+                search(index, queries[:10], args.k)
+                results, latencies = search(index, queries, args.k)
+                usage = index.memory_usage()
+                index.close()
+                print(
+                    f"{quantization:<9} {factor if quantization != QUANTIZATIONS[0] else '-':>8} "
+                    f"{usage['search_bytes'] / 1e6:>12.1f} {usage['search_bytes'] / usage['rows']:>9.0f} "
+                    f"{usage['full_bytes'] / usage['search_bytes']:>6.1f}x {recall(results, truth):>9.3f} "
+                    f"{statistics.median(latencies):>8.2f}"
+                )
+
+    print("")
+    print("Búsqueda MB: datos que recorre cada búsqueda (lo que queda residente en el page cache);")
+    print("los float32 completos quedan en disco y solo se leen para los candidatos re-puntuados.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Query Load Test - Throughput of POST /query under increasing concurrency
+
+Runs N concurrent users per level against /query while probing /health,
+so the report shows whether throughput scales with users and whether the
+event loop stays responsive.
+
+Usage:
+    python benchmarks/query_load_test.py --url http://localhost:8000 --levels 1,5,10,25
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import httpx
+
+DEFAULT_QUESTIONS = [
+    "¿Cuáles son los requisitos de admisión?",
+    "¿Cuál es el costo de la maestría?",
+    "¿Cuándo cierran las inscripciones?",
+    "¿Qué documentos necesito para inscribirme?",
+]
+
+
+async def run_user(client: httpx.AsyncClient, url: str, requests: int, latencies: List[float], errors: List[int]):
+    """Send sequential queries as a single user."""
+    for i in range(requests):
+        question = DEFAULT_QUESTIONS[i % len(DEFAULT_QUESTIONS)]
+        start = time.perf_counter()
+        try:
+            response = await client.post(f"{url}/query", json={"question": question, "return_sources": False})
+            if response.status_code != 200:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def probe_health(client: httpx.AsyncClient, url: str, stop: asyncio.Event, latencies: List[float]):
+    """Measure /health latency while the load runs."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(f"{url}/health")
+        except httpx.HTTPError:
+            pass
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.2)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run_level(url: str, users: int, requests: int, timeout: float) -> dict:
+    """Run one concurrency level and return its statistics."""
+    latencies: List[float] = []
+    health_latencies: List[float] = []
+    errors: List[int] = []
+    limits = httpx.Limits(max_connections=users + 2, max_keepalive_connections=users + 2)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_health(client, url, stop, health_latencies))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(client, url, requests, latencies, errors) for _ in range(users)))
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await prober
+
+    return {
+        "users": users,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "avg_ms": statistics.mean(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "health_p95_ms": percentile(health_latencies, 0.95) if health_latencies else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test for POST /query")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--levels", default="1,5,10,25", help="Comma-separated concurrent user counts")
+    parser.add_argument("--requests-per-user", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print("=== PRUEBA DE CARGA - POST /query ===")
+    print(f"Endpoint: {args.url}/query")
+    print(f"{'Usuarios':>8} {'Requests':>8} {'Errores':>7} {'req/s':>8} {'Prom ms':>9} {'P95 ms':>9} {'/health P95':>12} {'Escala':>7}")
+
+    baseline = None
+    for users in levels:
+        stats = await run_level(args.url, users, args.requests_per_user, args.timeout)
+        baseline = baseline or stats["throughput_rps"]
+        print(
+            f"{stats['users']:>8} {stats['requests']:>8} {stats['errors']:>7} "
+            f"{stats['throughput_rps']:>8.2f} {stats['avg_ms']:>9.0f} {stats['p95_ms']:>9.0f} "
+            f"{stats['health_p95_ms']:>12.0f} {stats['throughput_rps'] / baseline:>6.1f}x"
+        )
+
+    print("")
+    print("Si el throughput crece con los usuarios, las consultas se atienden en paralelo;")
+    print("si se mantiene plano, el event loop las está serializando.")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Splitter Benchmark - LinearTextSplitter vs RecursiveCharacterTextSplitter
+
+Splits the same pages with both splitters, checks that they produce the
+same chunks (text and metadata, in order) and reports the throughput of
+each. Uses real PDFs when given, otherwise synthetic regulation pages.
+
+Usage:
+    python benchmarks/splitter_benchmark.py --pdf docs/reglamento.pdf --chunk-size 1000 --chunk-overlap 200
+    python benchmarks/splitter_benchmark.py --pages 500
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain.schema import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from app.engine.ingest import iter_pdf_pages
+from app.engine.text_splitter import LinearTextSplitter
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+WORDS = (
+    "el la de los las del alumno aspirante programa maestría doctorado posgrado "
+    "artículo reglamento deberá cumplir requisitos establecidos créditos semestre "
+    "comité académico tesis evaluación inscripción colegiatura beca título grado"
+).split()
+
+
+def synthetic_pages(count: int, seed: int = 7) -> List[Document]:
+    """Build regulation-like pages: articles, short lines and some long paragraphs."""
+    rng = random.Random(seed)
+    pages = []
+    for number in range(count):
+        paragraphs = []
+        for article in range(rng.randint(3, 8)):
+            lines = [
+                " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 60 if rng.random() < 0.9 else 400)))
+                for _ in range(rng.randint(1, 5))
+            ]
+            paragraphs.append(f"Artículo {number}.{article}\n" + "\n".join(lines))
+        pages.append(Document(
+            page_content="\n\n".join(paragraphs),
+            metadata={"source": "sintetico.pdf", "page": number}
+        ))
+    return pages
+
+
+def time_split(splitter, pages: List[Document], repeat: int) -> tuple:
+    """Return the best split time in seconds and the chunks of the last run."""
+    best = float("inf")
+    chunks = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        chunks = splitter.split_documents(pages)
+        best = min(best, time.perf_counter() - start)
+    return best, chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the ingestion text splitters")
+    parser.add_argument("--pdf", action="append", default=[], help="PDF to split (repeatable)")
+    parser.add_argument("--pages", type=int, default=300, help="Synthetic pages when no PDF is given")
+    parser.add_argument("--chunk-size", type=int, default=int(os.getenv("CHUNK_SIZE", 1000)))
+    parser.add_argument("--chunk-overlap", type=int, default=int(os.getenv("CHUNK_OVERLAP", 200)))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.pdf:
+        pages = [page for path in args.pdf for page in iter_pdf_pages(path)]
+        origin = ", ".join(args.pdf)
+    else:
+        pages = synthetic_pages(args.pages)
+        origin = f"{args.pages} páginas sintéticas"
+    characters = sum(len(page.page_content) for page in pages)
+    megabytes = characters / 1_000_000
+
+    settings = dict(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, separators=SEPARATORS)
+    recursive_s, expected = time_split(RecursiveCharacterTextSplitter(**settings), pages, args.repeat)
+    linear_s, actual = time_split(LinearTextSplitter(**settings), pages, args.repeat)
+
+    mismatches = sum(
+        a.page_content != b.page_content or a.metadata != b.metadata
+        for a, b in zip(expected, actual)
+    ) + abs(len(expected) - len(actual))
+
+    print("=== BENCHMARK DEL SPLITTER ===")
+    print(f"Documentos: {origin} ({len(pages)} páginas, {megabytes:.2f} M caracteres)")
+    print(f"chunk_size={args.chunk_size} chunk_overlap={args.chunk_overlap}, mejor de {args.repeat}")
+    print(f"{'Splitter':<32} {'Chunks':>7} {'ms':>9} {'M car/s':>9}")
+    for name, seconds, chunks in (
+        ("RecursiveCharacterTextSplitter", recursive_s, expected),
+        ("LinearTextSplitter", linear_s, actual),
+    ):
+        print(f"{name:<32} {len(chunks):>7} {seconds * 1000:>9.1f} {megabytes / seconds:>9.2f}")
+
+    print("")
+    print(f"Aceleración: {recursive_s / linear_s:.1f}x")
+    if mismatches:
+        print(f"ERROR: {mismatches} chunks difieren entre los dos splitters")
+        sys.exit(1)
+    print("Equivalencia: todos los chunks coinciden (texto y metadata, en orden)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Vector Backend Benchmark - Embedded Chroma, the Chroma server and the flat index
+
+Loads the same random vectors into an embedded (in-process) collection,
+into a collection on a Chroma server reached through the pooled client
+and into a memory-mapped FlatIndex, then reports search latency
+percentiles and throughput of each under a number of concurrent
+searchers. No embeddings API is called.
+
+Each vector is tagged with one of ``--programs`` programs, and every
+backend is also timed with searches filtered to a single program, which
+should only touch that program's share of the vectors.
+
+Usage:
+    docker-compose up -d chromadb
+    python benchmarks/vector_backend_benchmark.py --host localhost --port 8001 --vectors 20000 --concurrency 1,8
+    python benchmarks/vector_backend_benchmark.py --vectors 30000 --programs 20 --concurrency 1
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import chromadb
+from chromadb.config import Settings
+
+from app.engine.flat_index import FlatIndex
+from app.engine.vector_backend import create_http_client
+
+COLLECTION = "vector_backend_benchmark"
+
+
+def random_vectors(count: int, dimensions: int, rng: random.Random) -> List[List[float]]:
+    return [[rng.uniform(-1, 1) for _ in range(dimensions)] for _ in range(count)]
+
+
+def fresh_collection(client):
+    """Create an empty collection on a Chroma client."""
+    try:
+        client.delete_collection(COLLECTION)
+    except Exception:
+        pass
+    return client.create_collection(COLLECTION)
+
+
+def program_of(position: int, programs: int) -> str:
+    return f"programa-{position % programs}"
+
+
+def load_collection(collection, vectors: List[List[float]], programs: int, batch_size: int = 1000):
+    """Add the vectors, spread over ``programs`` programs, to an empty collection (or flat index)."""
+    for start in range(0, len(vectors), batch_size):
+        batch = vectors[start:start + batch_size]
+        collection.add(
+            ids=[f"chunk-{start + i}" for i in range(len(batch))],
+            embeddings=batch,
+            documents=[f"chunk {start + i}" for i in range(len(batch))],
+            metadatas=[
+                {"program": program_of(start + i, programs), "source_file": f"{program_of(start + i, programs)}.pdf"}
+                for i in range(len(batch))
+            ]
+        )
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_searches(
+    collection,
+    queries: List[List[float]],
+    k: int,
+    concurrency: int,
+    where: Optional[dict] = None
+) -> dict:
+    """Search every query with ``concurrency`` threads and time each call."""
+    def search(query):
+        start = time.perf_counter()
+        collection.query(query_embeddings=[query], n_results=k, where=where)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(search, queries))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 0.95),
+        "qps": len(queries) / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of vector backend search latency")
+    parser.add_argument("--host", default=os.getenv("CHROMADB_HOST", "localhost"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("CHROMADB_PORT", 8000)))
+    parser.add_argument("--vectors", type=int, default=10000)
+    parser.add_argument("--dimensions", type=int, default=1536, help="1536 = text-embedding-3-small")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", default="1,8", help="Comma-separated searcher counts")
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--programs", type=int, default=10, help="Programs the vectors are spread over")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    vectors = random_vectors(args.vectors, args.dimensions, rng)
+    queries = random_vectors(args.queries, args.dimensions, rng)
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    backends = []
+    with tempfile.TemporaryDirectory() as directory:
+        embedded = chromadb.PersistentClient(
+            path=os.path.join(directory, "chroma"),
+            settings=Settings(anonymized_telemetry=False)
+        )
+        backends.append(("embedded", lambda: fresh_collection(embedded)))
+        backends.append(("flat", lambda: FlatIndex(os.path.join(directory, "flat"))))
+        try:
+            remote = create_http_client(host=args.host, port=args.port, pool_size=args.pool_size, max_retries=1)
+            remote.heartbeat()
+            backends.append((f"http {args.host}:{args.port}", lambda: fresh_collection(remote)))
+        except Exception as e:
+            print(f"Servidor Chroma no disponible en {args.host}:{args.port} ({e}); se omite http")
+
+        print("=== BENCHMARK DEL BACKEND VECTORIAL ===")
+        print(f"{args.vectors} vectores de {args.dimensions} dimensiones, {args.queries} búsquedas, k={args.k}")
+        print(f"Filtro: program={program_of(0, args.programs)} (1 de {args.programs} programas)")
+        print(f"{'Backend':<28} {'Filtro':>6} {'Hilos':>6} {'p50 ms':>9} {'p95 ms':>9} {'QPS':>9}")
+        for name, open_collection in backends:
+            collection = open_collection()
+            load_collection(collection, vectors, args.programs)
+            for where in (None, {"program": program_of(0, args.programs)}):
+                # Warm up indexes and connections before timing
+                run_searches(collection, queries[:10], args.k, 1, where)
+                for concurrency in levels:
+                    result = run_searches(collection, queries, args.k, concurrency, where)
+                    print(
+                        f"{name:<28} {'sí' if where else 'no':>6} {concurrency:>6} {result['p50']:>9.2f} "
+                        f"{result['p95']:>9.2f} {result['qps']:>9.1f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,7 @@ Tests for API endpoints
 
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import sys
 import os
 
@@ -50,12 +50,12 @@ class TestQueryEndpoint:
     def test_query_with_valid_question(self, client):
         """Test query endpoint with valid input"""
         with patch('app.main.query_engine') as mock_engine:
-            mock_engine.query.return_value = {
+            mock_engine.aquery = AsyncMock(return_value={
                 "success": True,
                 "answer": "Master's programs are available.",
                 "sources": [],
                 "question": "What programs are available?"
-            }
+            })
             mock_engine is not None
             
             response = client.post(
@@ -63,8 +63,9 @@ class TestQueryEndpoint:
                 json={"question": "What programs are available?"}
             )
             
-            # Note: This test may fail if query_engine is not initialized
-            # In production, ensure proper initialization
+            assert response.status_code == 200
+            assert response.json()["answer"] == "Master's programs are available."
+            mock_engine.aquery.assert_awaited_once()
     
     def test_query_with_empty_question(self, client):
         """Test query endpoint with empty question"""
@@ -87,12 +88,12 @@ class TestQueryEndpoint:
     def test_query_with_return_sources_flag(self, client):
         """Test query endpoint with return_sources flag"""
         with patch('app.main.query_engine') as mock_engine:
-            mock_engine.query.return_value = {
+            mock_engine.aquery = AsyncMock(return_value={
                 "success": True,
                 "answer": "Test answer",
                 "sources": [{"source": "test.pdf", "page": 1}],
                 "question": "Test question"
-            }
+            })
             mock_engine is not None
             
             response = client.post(
@@ -104,6 +105,74 @@ class TestQueryEndpoint:
             )
 
 
+class TestQueryBatchEndpoint:
+    """Test suite for batch query endpoint"""
+    
+    def test_batch_returns_results_in_order(self, client):
+        """Test that valid and invalid questions are reported per item"""
+        with patch('app.main.query_engine') as mock_engine:
+            mock_engine.abatch_query = AsyncMock(return_value=[
+                {"success": True, "answer": "Respuesta A", "sources": [], "question": "Pregunta A"},
+                {"success": False, "answer": None, "sources": [], "error": "Error processing query: timeout"}
+            ])
+            
+            response = client.post(
+                "/query/batch",
+                json={"questions": ["Pregunta A", "ab", "Pregunta C"]}
+            )
+            
+            assert response.status_code == 200
+            results = response.json()["results"]
+            assert len(results) == 3
+            assert results[0]["answer"] == "Respuesta A"
+            assert results[1]["success"] is False
+            assert "at least 3 characters" in results[1]["error"]
+            assert "timeout" in results[2]["error"]
+            mock_engine.abatch_query.assert_awaited_once()
+            assert mock_engine.abatch_query.call_args[0][0] == ["Pregunta A", "Pregunta C"]
+    
+    def test_batch_rejects_oversized_batches(self, client):
+        """Test the batch size limit"""
+        response = client.post(
+            "/query/batch",
+            json={"questions": ["Pregunta"] * 51}
+        )
+        
+        assert response.status_code == 400
+
+
+class TestQueryStreamEndpoint:
+    """Test suite for streaming query endpoint"""
+    
+    def test_stream_emits_tokens_then_done(self, client):
+        """Test that tokens are streamed before the final event"""
+        with patch('app.main.query_engine') as mock_engine:
+            mock_engine.stream_query.return_value = iter([
+                {"event": "token", "data": {"text": "La maestría "}},
+                {"event": "token", "data": {"text": "dura 2 años."}},
+                {"event": "done", "data": {"success": True, "sources": [], "timings": {"first_token_ms": 120.0}}}
+            ])
+            
+            response = client.post(
+                "/query/stream",
+                json={"question": "¿Cuánto dura la maestría?"}
+            )
+            
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = [block for block in response.text.split("\n\n") if block]
+            assert events[0].startswith("event: token")
+            assert "La maestría" in events[0]
+            assert events[-1].startswith("event: done")
+            assert "first_token_ms" in events[-1]
+    
+    def test_stream_with_empty_question(self, client):
+        """Test streaming endpoint validation"""
+        response = client.post("/query/stream", json={"question": ""})
+        
+        assert response.status_code == 400
+
+
 class TestIngestEndpoint:
     """Test suite for PDF ingestion endpoint"""
     
@@ -132,6 +201,227 @@ class TestIngestEndpoint:
             assert response.status_code in [200, 400, 422]
 
 
+class FakeUpload:
+    """UploadFile stand-in that records how much each read asked for"""
+    
+    def __init__(self, content):
+        self.content = content
+        self.position = 0
+        self.reads = []
+    
+    async def read(self, size=-1):
+        self.reads.append(size)
+        end = len(self.content) if size < 0 else self.position + size
+        chunk = self.content[self.position:end]
+        self.position += len(chunk)
+        return chunk
+
+
+BOUNDARY = "test-boundary"
+
+
+def multipart_body(content, field="file", file_name="catalogo.pdf", extra_field=False, padding=b""):
+    """Build a multipart/form-data body with one file part"""
+    parts = []
+    if extra_field or padding:
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="program"\r\n\r\n'.encode()
+            + (padding or b"maestria") + b"\r\n"
+        )
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{field}"; filename="{file_name}"\r\n'
+        f'Content-Type: application/pdf\r\n\r\n'.encode() + content + b"\r\n"
+    )
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode()
+
+
+class FakeRequest:
+    """Request stand-in that streams a body in chunks with no Content-Length"""
+    
+    def __init__(self, body, chunk_size=1000):
+        self.body = body
+        self.chunk_size = chunk_size
+        self.sent = 0
+        self.headers = {"content-type": f"multipart/form-data; boundary={BOUNDARY}"}
+    
+    async def stream(self):
+        while self.sent < len(self.body):
+            chunk = self.body[self.sent:self.sent + self.chunk_size]
+            self.sent += len(chunk)
+            yield chunk
+
+
+class TestPDFUpload:
+    """Test suite for streamed PDF uploads"""
+    
+    async def test_upload_is_streamed_and_hashed(self, tmp_path):
+        """Test that the upload is copied in bounded chunks and hashed on the fly"""
+        import hashlib
+        from app.utils import save_pdf_upload
+        
+        content = b"%PDF-1.4" + b"x" * 2500
+        upload = FakeUpload(content)
+        
+        stored = await save_pdf_upload(upload, directory=str(tmp_path), chunk_size=1000)
+        
+        assert stored.size == len(content)
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert open(stored.path, "rb").read() == content
+        assert set(upload.reads) == {1000}
+    
+    async def test_oversized_upload_is_rejected_while_streaming(self, tmp_path):
+        """Test that the size limit stops the copy and removes the partial file"""
+        from app.utils import UploadRejected, save_pdf_upload
+        
+        upload = FakeUpload(b"%PDF-1.4" + b"x" * 10000)
+        
+        with pytest.raises(UploadRejected):
+            await save_pdf_upload(upload, directory=str(tmp_path), max_bytes=3000, chunk_size=1000)
+        
+        assert upload.position <= 4000
+        assert os.listdir(tmp_path) == []
+    
+    async def test_non_pdf_content_is_rejected(self, tmp_path):
+        """Test that the %PDF header is required"""
+        from app.utils import UploadRejected, save_pdf_upload
+        
+        with pytest.raises(UploadRejected):
+            await save_pdf_upload(FakeUpload(b"PK\x03\x04 zip"), directory=str(tmp_path))
+        with pytest.raises(UploadRejected):
+            await save_pdf_upload(FakeUpload(b""), directory=str(tmp_path))
+        
+        assert os.listdir(tmp_path) == []
+    
+    async def test_request_body_is_parsed_as_it_arrives(self, tmp_path):
+        """Test that the PDF part is written once, straight from the request stream"""
+        import hashlib
+        from app.utils import save_pdf_request
+        
+        content = b"%PDF-1.4" + b"x" * 2500
+        request = FakeRequest(multipart_body(content, extra_field=True), chunk_size=700)
+        
+        file_name, stored = await save_pdf_request(request, directory=str(tmp_path))
+        
+        assert file_name == "catalogo.pdf"
+        assert stored.sha256 == hashlib.sha256(content).hexdigest()
+        assert open(stored.path, "rb").read() == content
+        assert os.listdir(tmp_path) == [os.path.basename(stored.path)]
+    
+    async def test_chunked_body_is_cut_off_at_the_limit(self, tmp_path):
+        """Test that a body without Content-Length stops being read past the limit"""
+        from app.utils import UploadRejected, save_pdf_request
+        from app.utils.uploads import MULTIPART_OVERHEAD_BYTES
+        
+        # An oversized text field: the file part itself never reaches the limit
+        body = multipart_body(b"%PDF-1.4", padding=b"x" * (MULTIPART_OVERHEAD_BYTES + 10000))
+        request = FakeRequest(body, chunk_size=1000)
+        
+        with pytest.raises(UploadRejected):
+            await save_pdf_request(request, directory=str(tmp_path), max_bytes=3000)
+        
+        assert request.sent <= MULTIPART_OVERHEAD_BYTES + 4000
+        assert os.listdir(tmp_path) == []
+    
+    async def test_request_without_pdf_is_rejected(self, tmp_path):
+        """Test that a missing file field or a non-PDF file name is refused"""
+        from app.utils import UploadRejected, save_pdf_request
+        
+        with pytest.raises(UploadRejected):
+            await save_pdf_request(FakeRequest(multipart_body(b"%PDF-1.4", field="otro")), directory=str(tmp_path))
+        with pytest.raises(UploadRejected):
+            await save_pdf_request(FakeRequest(multipart_body(b"%PDF-1.4", file_name="a.txt")), directory=str(tmp_path))
+        
+        assert os.listdir(tmp_path) == []
+    
+    def test_endpoint_reports_rejected_upload(self, client, tmp_path):
+        """Test that a renamed non-PDF is refused by the endpoint"""
+        from io import BytesIO
+        
+        with patch('app.main.ingest_engine'), patch('app.main.job_queue') as mock_jobs:
+            mock_jobs.upload_dir = str(tmp_path)
+            
+            response = client.post(
+                "/ingest/pdf",
+                files={"file": ("falso.pdf", BytesIO(b"not a pdf"), "application/pdf")}
+            )
+            
+            assert response.json()["success"] is False
+            assert "not a PDF" in response.json()["error"]
+            mock_jobs.submit.assert_not_called()
+            assert os.listdir(tmp_path) == []
+
+
+class TestIngestionJobEndpoints:
+    """Test suite for background ingestion jobs"""
+    
+    def test_upload_returns_job_id(self, client, tmp_path):
+        """Test that a valid upload is queued and answered with 202"""
+        from io import BytesIO
+        
+        with patch('app.main.ingest_engine'), patch('app.main.job_queue') as mock_jobs:
+            mock_jobs.upload_dir = str(tmp_path)
+            mock_jobs.submit.return_value = "job-123"
+            
+            response = client.post(
+                "/ingest/pdf",
+                files={"file": ("catalogo.pdf", BytesIO(b"%PDF-1.4 test"), "application/pdf")}
+            )
+            
+            assert response.status_code == 202
+            assert response.json()["job_id"] == "job-123"
+            path, name, metadata = mock_jobs.submit.call_args[0]
+            assert metadata["source_file"] == "catalogo.pdf"
+            assert os.path.dirname(path) == str(tmp_path)
+            assert len(mock_jobs.submit.call_args.kwargs["content_hash"]) == 64
+    
+    def test_job_status(self, client):
+        """Test that job status is reported"""
+        with patch('app.main.job_queue') as mock_jobs:
+            mock_jobs.get.return_value = {
+                "job_id": "job-123",
+                "state": "running",
+                "file_name": "catalogo.pdf",
+                "progress": {"stage": "embedding", "pages": 12, "chunks": 40},
+                "result": None,
+                "error": None,
+                "created_at": 1.0,
+                "started_at": 2.0,
+                "finished_at": None,
+                "timings": {"queued_ms": 1000.0, "run_ms": 500.0}
+            }
+            
+            response = client.get("/ingest/jobs/job-123")
+            
+            assert response.status_code == 200
+            assert response.json()["progress"]["chunks"] == 40
+    
+    def test_unknown_job(self, client):
+        """Test that unknown jobs return 404"""
+        with patch('app.main.job_queue') as mock_jobs:
+            mock_jobs.get.return_value = None
+            
+            response = client.get("/ingest/jobs/missing")
+            
+            assert response.status_code == 404
+    
+    def test_watcher_disabled_by_default(self, client):
+        """Test that the watcher status reports it is off without WATCH_DIR"""
+        with patch('app.main.directory_watcher', None):
+            response = client.get("/ingest/watcher")
+            
+            assert response.json() == {"enabled": False}
+    
+    def test_watcher_status(self, client):
+        """Test that the watcher counters are exposed"""
+        with patch('app.main.directory_watcher') as mock_watcher:
+            mock_watcher.stats.return_value = {"mode": "inotify", "batches": 3, "files_removed": 1}
+            
+            response = client.get("/ingest/watcher")
+            
+            assert response.status_code == 200
+            assert response.json() == {"enabled": True, "mode": "inotify", "batches": 3, "files_removed": 1}
+
+
 class TestRootEndpoint:
     """Test suite for root endpoint"""
     
@@ -145,6 +435,20 @@ class TestRootEndpoint:
         assert "version" in data
 
 
+class TestCacheStatsEndpoint:
+    """Test suite for cache statistics endpoint"""
+    
+    def test_cache_stats_reports_counters(self, client):
+        """Test that cache counters are exposed"""
+        with patch('app.main.embedding_cache') as mock_cache:
+            mock_cache.stats.return_value = {"hits": 3, "misses": 1}
+            
+            response = client.get("/cache/stats")
+            
+            assert response.status_code == 200
+            assert response.json()["embeddings"]["hits"] == 3
+
+
 class TestErrorHandling:
     """Test suite for error handling"""
     
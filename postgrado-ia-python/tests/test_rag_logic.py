@@ -5,19 +5,61 @@ Tests for RAG Logic and Query Engine
 import pytest
 import os
 import sys
-from unittest.mock import Mock, patch, MagicMock
+import time
+import numpy as np
+import requests
+from unittest.mock import Mock, patch, MagicMock, AsyncMock
 from pathlib import Path
 
 # Add app to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app.engine.query import RAGQueryEngine
+from app.engine.answer_cache import SemanticAnswerCache
+from app.engine.coalescing import SingleFlight
+from app.engine.context_packer import ContextPacker, TokenCounter
+from app.engine.lexical_index import BM25Index, tokenize
+from app.engine.embedding_cache import CachedDocumentEmbeddings, CachedEmbeddings, EmbeddingCache
+from app.engine.embedding_scheduler import EmbeddingScheduler, RateLimiter, is_retryable_error
+from app.engine.flat_index import FlatIndex, FlatVectorStore, quantize
+from app.engine.ingest import ChunkPlan, PDFChunkStream, PDFIngestionEngine, iter_pdf_pages, load_and_split_pdf
+from app.engine.jobs import IngestionJobQueue
+from app.engine.metadata_index import MetadataIndex, where_filter
+from app.engine.query import NO_DOCUMENTS_RESPONSE, RAGQueryEngine
+from app.engine.resources import EngineResources
+from app.engine.text_splitter import LinearTextSplitter
+from app.engine.vector_backend import PooledSession, create_http_client
+from app.engine.watcher import DirectoryWatcher
+from app.engine.retrieval import (
+    RetrievalResult,
+    RetrievedChunk,
+    chunks_from_query_result,
+    distance_to_similarity,
+    is_staged,
+    maximal_marginal_relevance,
+    reciprocal_rank_fusion,
+)
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+
+def make_query_result(*docs, distances=None):
+    """Build a raw Chroma collection.query response from (content, metadata) pairs"""
+    distances = distances or [0.2] * len(docs)
+    return {
+        "ids": [[f"chunk-{i}" for i in range(len(docs))]],
+        "documents": [[content for content, _ in docs]],
+        "metadatas": [[metadata for _, metadata in docs]],
+        "distances": [distances]
+    }
 
 
 @pytest.fixture
 def mock_vector_store():
     """Create a mock vector store"""
-    return MagicMock()
+    store = MagicMock()
+    store._collection.metadata = {"hnsw:space": "l2"}
+    return store
 
 
 @pytest.fixture
@@ -50,24 +92,47 @@ class TestRAGQueryEngine:
     def test_retrieve_context_with_valid_query(self, rag_query_engine, mock_vector_store):
         """Test context retrieval with a valid query"""
         # Mock the similarity search
-        mock_doc = MagicMock()
-        mock_doc.page_content = "Master's program in Computer Science"
-        mock_vector_store.similarity_search.return_value = [mock_doc]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Master's program in Computer Science", {})
+        )
         
         context = rag_query_engine._retrieve_context("What is the master's program?")
         
         assert context is not None
         assert "Master's program" in context
-        mock_vector_store.similarity_search.assert_called_once()
+        mock_vector_store._collection.query.assert_called_once()
     
     def test_retrieve_context_no_results(self, rag_query_engine, mock_vector_store):
         """Test context retrieval when no documents are found"""
-        mock_vector_store.similarity_search.return_value = []
+        mock_vector_store._collection.query.return_value = make_query_result()
         
         context = rag_query_engine._retrieve_context("Unknown topic")
         
         assert context == ""
     
+    def test_retrieve_returns_ids_scores_and_timings(self, rag_query_engine, mock_vector_store):
+        """Test that a single retrieval pass carries ids, scores and timings"""
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Admission requirements", {"source": "admission.pdf", "page": 2}),
+            ("Tuition fees", {"source": "fees.pdf", "page": 4}),
+            distances=[0.2, 0.6]
+        )
+        
+        result = rag_query_engine._retrieve("Admission requirements")
+        
+        assert isinstance(result, RetrievalResult)
+        assert result.ids == ["chunk-0", "chunk-1"]
+        assert result.scores == pytest.approx([0.9, 0.7])
+        assert "embed_ms" in result.timings
+        assert "search_ms" in result.timings
+        rag_query_engine.embeddings.embed_query.assert_called_once()
+    
+    def test_distance_to_similarity_spaces(self):
+        """Test conversion of Chroma distances into cosine similarity"""
+        assert distance_to_similarity(0.0, "l2") == 1.0
+        assert distance_to_similarity(2.0, "l2") == 0.0
+        assert distance_to_similarity(0.25, "cosine") == 0.75
+    
     def test_query_with_invalid_input(self, rag_query_engine):
         """Test query handling with invalid input"""
         result = rag_query_engine.query(None)
@@ -78,10 +143,9 @@ class TestRAGQueryEngine:
     def test_query_with_valid_input(self, rag_query_engine, mock_vector_store):
         """Test query with valid input"""
         # Mock the similarity search
-        mock_doc = MagicMock()
-        mock_doc.page_content = "Master's program information"
-        mock_doc.metadata = {"source": "test.pdf", "page": 1}
-        mock_vector_store.similarity_search.return_value = [mock_doc]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Master's program information", {"source": "test.pdf", "page": 1})
+        )
         
         # Mock the LLM response
         mock_response = MagicMock()
@@ -109,10 +173,9 @@ class TestRAGQueryEngine:
     def test_query_response_includes_sources(self, rag_query_engine, mock_vector_store):
         """Test that query response includes source documents"""
         # Mock the similarity search
-        mock_doc = MagicMock()
-        mock_doc.page_content = "Master's program in Business Administration"
-        mock_doc.metadata = {"source": "programs.pdf", "page": 5}
-        mock_vector_store.similarity_search.return_value = [mock_doc]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Master's program in Business Administration", {"source": "programs.pdf", "page": 5})
+        )
         
         # Mock the LLM response
         mock_response = MagicMock()
@@ -124,6 +187,1956 @@ class TestRAGQueryEngine:
             assert result["success"] is True
             assert len(result["sources"]) > 0
             assert result["sources"][0]["source"] == "programs.pdf"
+            assert result["sources"][0]["score"] == pytest.approx(0.9)
+            # Sources reuse the single retrieval pass
+            mock_vector_store._collection.query.assert_called_once()
+
+
+class TestAsyncQuery:
+    """Test suite for the non-blocking query path"""
+    
+    async def test_aquery_uses_async_clients(self, rag_query_engine, mock_vector_store):
+        """Test that aquery awaits the async embeddings and LLM clients"""
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Admission requires a bachelor's degree", {"source": "admission.pdf", "page": 1})
+        )
+        rag_query_engine.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        rag_query_engine.llm.ainvoke = AsyncMock(return_value=MagicMock(content="Se requiere licenciatura."))
+        
+        result = await rag_query_engine.aquery("¿Requisitos de admisión?")
+        
+        assert result["success"] is True
+        assert result["answer"] == "Se requiere licenciatura."
+        assert result["sources"][0]["source"] == "admission.pdf"
+        rag_query_engine.embeddings.aembed_query.assert_awaited_once()
+        rag_query_engine.embeddings.embed_query.assert_not_called()
+        rag_query_engine.llm.ainvoke.assert_awaited_once()
+    
+    async def test_aquery_runs_search_off_the_event_loop(self, rag_query_engine, mock_vector_store):
+        """Test that the vector search runs on the search executor"""
+        import threading
+        
+        search_threads = []
+        
+        def record_thread(**kwargs):
+            search_threads.append(threading.current_thread().name)
+            return make_query_result()
+        
+        mock_vector_store._collection.query.side_effect = record_thread
+        rag_query_engine.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        
+        result = await rag_query_engine.aquery("Unknown topic")
+        
+        assert result["success"] is False
+        assert search_threads[0].startswith("vector-search")
+
+
+class FakeTokenCounter(TokenCounter):
+    """Whitespace tokenizer so tests do not depend on tiktoken downloads"""
+    
+    def __init__(self):
+        self._encoding = None
+    
+    def count(self, text):
+        return len(text.split())
+    
+    def truncate(self, text, max_tokens):
+        return " ".join(text.split()[:max_tokens])
+
+
+def make_chunk(chunk_id, words, score):
+    """Build a retrieved chunk with the given number of words"""
+    return RetrievedChunk(
+        id=chunk_id,
+        document=Document(page_content=" ".join(["palabra"] * words)),
+        score=score
+    )
+
+
+class TestContextPacker:
+    """Test suite for token-budgeted context packing"""
+    
+    def test_packs_by_relevance_within_budget(self):
+        """Test that chunks are added by score and the budget is respected"""
+        packer = ContextPacker(FakeTokenCounter(), max_context_tokens=250, min_chunk_tokens=20)
+        chunks = [
+            make_chunk("low", 100, 0.5),
+            make_chunk("high", 100, 0.9),
+            make_chunk("mid", 100, 0.7),
+        ]
+        
+        packed = packer.pack(chunks)
+        
+        assert [chunk.id for chunk in packed.chunks] == ["high", "mid", "low"]
+        assert packed.truncated == 1
+        assert packed.context_tokens <= 250
+    
+    def test_hybrid_chunks_are_packed_in_fused_order(self):
+        """Test that the fused score, not the similarity, orders hybrid results"""
+        packer = ContextPacker(FakeTokenCounter(), max_context_tokens=250)
+        both = make_chunk("both", 10, 0.6)
+        vector_only = make_chunk("vector_only", 10, 0.9)
+        
+        fused = reciprocal_rank_fusion([[vector_only, both], [both]], limit=2)
+        packed = packer.pack(fused)
+        
+        assert [chunk.id for chunk in packed.chunks] == ["both", "vector_only"]
+        assert [chunk.score for chunk in packed.chunks] == [0.6, 0.9]
+    
+    def test_drops_chunks_when_remainder_is_too_small(self):
+        """Test that a tiny leftover budget drops the chunk instead of truncating it"""
+        packer = ContextPacker(FakeTokenCounter(), max_context_tokens=110, min_chunk_tokens=20)
+        
+        packed = packer.pack([make_chunk("a", 100, 0.9), make_chunk("b", 100, 0.8)])
+        
+        assert [chunk.id for chunk in packed.chunks] == ["a"]
+        assert packed.dropped == 1
+    
+    def test_query_reports_prompt_usage(self, rag_query_engine, mock_vector_store):
+        """Test that the response reports prompt token usage"""
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Requisitos de admisión: título de licenciatura", {"source": "admision.pdf", "page": 1})
+        )
+        rag_query_engine.llm.invoke.return_value = MagicMock(content="Se requiere licenciatura.")
+        
+        result = rag_query_engine.query("¿Requisitos?")
+        
+        assert result["usage"]["context_chunks"] == 1
+        assert result["usage"]["prompt_tokens"] > result["usage"]["context_tokens"] > 0
+        messages = rag_query_engine.llm.invoke.call_args[0][0]
+        assert "título de licenciatura" in messages[0].content
+
+
+@pytest.fixture
+def lexical_index():
+    """BM25 index over a few catalog chunks"""
+    index = BM25Index()
+    index.add(
+        ["software", "datos", "costos"],
+        [
+            "Maestría en Ingeniería de Software 2026: requisitos de admisión",
+            "Maestría en Ciencia de Datos: plan de estudios",
+            "Costo de la maestría por semestre"
+        ],
+        [{"source": "software.pdf"}, {"source": "datos.pdf"}, {"source": "costos.pdf"}]
+    )
+    return index
+
+
+class TestHybridRetrieval:
+    """Test suite for BM25 and hybrid retrieval"""
+    
+    def test_tokenize_strips_accents_and_stopwords(self):
+        """Test Spanish normalization of lexical tokens"""
+        assert tokenize("Maestría en Ingeniería de Software 2026") == [
+            "maestria", "ingenieria", "software", "2026"
+        ]
+    
+    def test_bm25_ranks_exact_names_first(self, lexical_index):
+        """Test that exact program names win lexically"""
+        results = lexical_index.search("ingeniería de software 2026", k=2)
+        
+        assert results[0][0] == "software"
+        assert len(results) == 1
+    
+    def test_bm25_remove(self, lexical_index):
+        """Test that removed chunks are no longer returned"""
+        assert lexical_index.remove(["software"]) == 1
+        assert lexical_index.search("software", k=3) == []
+        assert len(lexical_index) == 2
+    
+    def test_reciprocal_rank_fusion_rewards_agreement(self):
+        """Test that chunks ranked by both retrievers come first"""
+        a, b, c = (make_chunk(name, 1, score) for name, score in zip("abc", [0.9, 0.8, 0.7]))
+        
+        fused = reciprocal_rank_fusion([[a, b], [c, b]], limit=3)
+        
+        assert fused[0].id == "b"
+        assert {chunk.id for chunk in fused} == {"a", "b", "c"}
+        assert {chunk.id: chunk.score for chunk in fused} == {"a": 0.9, "b": 0.8, "c": 0.7}
+        assert fused[0].fused_score == pytest.approx(1 / 62 + 1 / 62)
+        assert fused[0].rank_score == fused[0].fused_score
+    
+    def test_hybrid_mode_merges_lexical_candidates(self, rag_query_engine, mock_vector_store, lexical_index):
+        """Test that hybrid retrieval adds lexical matches missed by vector search"""
+        rag_query_engine.retrieval_mode = "hybrid"
+        rag_query_engine.lexical_index = lexical_index
+        rag_query_engine.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Calendario académico", {"source": "calendario.pdf"})
+        )
+        
+        mock_vector_store._collection.get.return_value = {"ids": ["software"], "embeddings": [[0.6, 0.8]]}
+        
+        result = rag_query_engine._retrieve("Maestría en Ingeniería de Software 2026")
+        
+        assert result.ids[0] in {"software", "chunk-0"}
+        assert "software" in result.ids
+        assert "lexical_ms" in result.timings
+        scores = {chunk.id: chunk.score for chunk in result.chunks}
+        assert scores["chunk-0"] == pytest.approx(0.9)
+        assert scores["software"] == pytest.approx(0.22)
+        assert all(chunk.fused_score is not None for chunk in result.chunks)
+    
+    def test_slow_embedding_falls_back_to_lexical(self, rag_query_engine, mock_vector_store, lexical_index):
+        """Test that a slow embedding call is abandoned for BM25 retrieval"""
+        rag_query_engine.lexical_index = lexical_index
+        rag_query_engine.embedding_timeout = 0.05
+        rag_query_engine.embeddings.embed_query.side_effect = lambda text: time.sleep(0.5) or [0.1]
+        
+        result = rag_query_engine._retrieve("costo de la maestría")
+        
+        assert result.embedding_timed_out is True
+        assert result.ids[0] == "costos"
+        mock_vector_store._collection.query.assert_not_called()
+
+
+class TestMMRDiversification:
+    """Test suite for maximal marginal relevance re-selection"""
+    
+    def test_mmr_skips_near_duplicates(self):
+        """Test that a near-duplicate of the top chunk is passed over"""
+        query = [1.0, 0.0, 0.0]
+        candidates = [
+            [0.95, 0.31, 0.0],
+            [0.94, 0.34, 0.0],
+            [0.80, 0.0, 0.60],
+        ]
+        
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+        assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+    
+    def test_engine_fetches_pool_and_reselects(self, rag_query_engine, mock_vector_store):
+        """Test that the engine fetches mmr_fetch_k candidates with embeddings"""
+        rag_query_engine.mmr_lambda = 0.5
+        rag_query_engine.mmr_fetch_k = 3
+        rag_query_engine.retrieval_k = 2
+        rag_query_engine.embeddings.embed_query.return_value = [1.0, 0.0, 0.0]
+        raw = make_query_result(
+            ("Página 3, párrafo 1", {}),
+            ("Página 3, párrafo 1 (solapado)", {}),
+            ("Página 7, costos", {}),
+            distances=[0.1, 0.12, 0.4]
+        )
+        raw["embeddings"] = [[[0.95, 0.31, 0.0], [0.94, 0.34, 0.0], [0.80, 0.0, 0.60]]]
+        mock_vector_store._collection.query.return_value = raw
+        
+        result = rag_query_engine._retrieve("costos")
+        
+        assert result.ids == ["chunk-0", "chunk-2"]
+        call = mock_vector_store._collection.query.call_args.kwargs
+        assert call["n_results"] == 3
+        assert "embeddings" in call["include"]
+        assert "mmr_ms" in result.timings
+
+
+class TestBatchQuery:
+    """Test suite for batched queries"""
+    
+    async def test_batch_shares_embedding_and_search_calls(self, rag_query_engine, mock_vector_store):
+        """Test that a batch embeds once, searches once and answers every question"""
+        rag_query_engine.embeddings.aembed_queries = AsyncMock(return_value=[[0.1, 0.2], [0.3, 0.4]])
+        mock_vector_store._collection.query.return_value = {
+            "ids": [["a"], ["b"]],
+            "documents": [["Requisitos de admisión"], ["Costo por semestre"]],
+            "metadatas": [[{"source": "admision.pdf"}], [{"source": "costos.pdf"}]],
+            "distances": [[0.2], [0.3]]
+        }
+        rag_query_engine.llm.ainvoke = AsyncMock(side_effect=[
+            MagicMock(content="Respuesta 1"),
+            MagicMock(content="Respuesta 2")
+        ])
+        
+        results = await rag_query_engine.abatch_query(["¿Requisitos?", "¿Costo?"])
+        
+        assert [r["success"] for r in results] == [True, True]
+        assert results[0]["sources"][0]["source"] == "admision.pdf"
+        assert results[1]["sources"][0]["source"] == "costos.pdf"
+        rag_query_engine.embeddings.aembed_queries.assert_awaited_once()
+        mock_vector_store._collection.query.assert_called_once()
+        assert len(mock_vector_store._collection.query.call_args.kwargs["query_embeddings"]) == 2
+    
+    async def test_batch_reports_errors_per_item(self, rag_query_engine, mock_vector_store):
+        """Test that one failed generation does not fail the batch"""
+        rag_query_engine.embeddings.aembed_queries = AsyncMock(return_value=[[0.1], [0.2]])
+        mock_vector_store._collection.query.return_value = {
+            "ids": [["a"], ["b"]],
+            "documents": [["Texto A"], ["Texto B"]],
+            "metadatas": [[{}], [{}]],
+            "distances": [[0.2], [0.3]]
+        }
+        rag_query_engine.llm.ainvoke = AsyncMock(side_effect=[
+            MagicMock(content="Respuesta"),
+            RuntimeError("rate limited")
+        ])
+        
+        results = await rag_query_engine.abatch_query(["Pregunta A", "Pregunta B", None])
+        
+        assert results[0]["success"] is True
+        assert results[1]["success"] is False
+        assert "rate limited" in results[1]["error"]
+        assert results[2]["error"] == "Invalid question format"
+    
+    async def test_cached_embeddings_batch_one_request_for_misses(self, tmp_path):
+        """Test that only cache misses are sent, in a single request"""
+        client = MagicMock()
+        client.aembed_documents = AsyncMock(return_value=[[0.5, 0.5]])
+        embeddings = CachedEmbeddings(client, EmbeddingCache(str(tmp_path / "emb.db")), "model-a")
+        embeddings.cache.put("model-a", "requisitos", [0.1, 0.9])
+        
+        result = await embeddings.aembed_queries(["requisitos", "costo", " costo "])
+        
+        assert result[0] == pytest.approx([0.1, 0.9])
+        assert result[1] == result[2] == [0.5, 0.5]
+        client.aembed_documents.assert_awaited_once_with(["costo"])
+    
+    async def test_cached_embeddings_keep_sqlite_off_the_event_loop(self, tmp_path):
+        """Test that async cache reads and writes run in worker threads"""
+        import threading
+        
+        client = MagicMock()
+        client.aembed_query = AsyncMock(return_value=[0.5, 0.5])
+        client.aembed_documents = AsyncMock(return_value=[[0.1, 0.9]])
+        cache = EmbeddingCache(str(tmp_path / "emb.db"))
+        threads = []
+        for name in ("get", "put", "get_many", "put_many"):
+            method = getattr(cache, name)
+            setattr(cache, name, lambda *args, method=method: threads.append(threading.get_ident()) or method(*args))
+        embeddings = CachedEmbeddings(client, cache, "model-a")
+        
+        await embeddings.aembed_query("requisitos")
+        await embeddings.aembed_queries(["costo"])
+        
+        assert len(threads) == 4
+        assert threading.get_ident() not in threads
+
+
+class TestMetadataFilters:
+    """Test suite for retrieval scoped by program and source file"""
+    
+    @pytest.fixture
+    def metadata_index(self):
+        index = MetadataIndex()
+        index.add(
+            ["a", "b", "c"],
+            [
+                {"program": "maestria_ia", "source_file": "ia.pdf"},
+                {"program": "maestria_ia", "source_file": "ia_costos.pdf"},
+                {"program": "doctorado", "source_file": "doctorado.pdf"}
+            ]
+        )
+        return index
+    
+    def test_index_intersects_filters(self, metadata_index):
+        """Test lookups by one or several fields and re-indexing"""
+        assert metadata_index.chunk_ids({"program": "maestria_ia"}) == {"a", "b"}
+        assert metadata_index.chunk_ids({"program": "maestria_ia", "source_file": "ia.pdf"}) == {"a"}
+        assert metadata_index.chunk_ids({"program": "otro"}) == set()
+        assert metadata_index.chunk_ids({}) is None
+        
+        metadata_index.add(["a"], [{"program": "doctorado"}])
+        assert metadata_index.values("program") == ["doctorado", "maestria_ia"]
+        assert metadata_index.chunk_ids({"source_file": "ia.pdf"}) == set()
+        assert metadata_index.remove(["a", "missing"]) == 1
+        assert metadata_index.chunk_ids({"program": "doctorado"}) == {"c"}
+    
+    def test_where_filter(self):
+        """Test the Chroma clause built from the filters"""
+        assert where_filter({}) is None
+        assert where_filter({"program": "x"}) == {"program": "x"}
+        assert where_filter({"source_file": "a.pdf", "program": "x"}) == {
+            "$and": [{"program": "x"}, {"source_file": "a.pdf"}]
+        }
+    
+    def test_filtered_search_sends_where_clause(self, rag_query_engine, mock_vector_store, metadata_index):
+        """Test that the collection is only searched within the filters"""
+        rag_query_engine.metadata_index = metadata_index
+        rag_query_engine.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Requisitos de admisión", {"program": "maestria_ia"})
+        )
+        
+        retrieval = rag_query_engine._scoped_retrieval("¿Requisitos?", {"program": "maestria_ia"})
+        result = rag_query_engine._retrieve("¿Requisitos?", retrieval)
+        
+        assert result.scope_ids == {"a", "b"}
+        assert mock_vector_store._collection.query.call_args.kwargs["where"] == {"program": "maestria_ia"}
+    
+    def test_empty_scope_skips_embedding_and_search(self, rag_query_engine, mock_vector_store, metadata_index):
+        """Test that filters matching no chunk are answered without any API call"""
+        rag_query_engine.metadata_index = metadata_index
+        
+        result = rag_query_engine.query("¿Cuánto cuesta?", filters={"program": "inexistente"})
+        
+        assert result == NO_DOCUMENTS_RESPONSE
+        rag_query_engine.embeddings.embed_query.assert_not_called()
+        mock_vector_store._collection.query.assert_not_called()
+    
+    def test_shared_store_searches_despite_empty_local_scope(self, rag_query_engine, mock_vector_store, metadata_index):
+        """Test that a shared store's where clause decides when the local index knows no match"""
+        rag_query_engine.metadata_index = metadata_index
+        rag_query_engine.vector_client = MagicMock()
+        rag_query_engine.embeddings.embed_query.return_value = [0.1, 0.2]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Doctorado en IA", {"program": "doctorado_ia"})
+        )
+        
+        response, retrieval = rag_query_engine._prepare("¿Requisitos?", True, {"program": "doctorado_ia"})
+        
+        assert response is None
+        assert retrieval.scope_ids == set()
+        assert [chunk.document.page_content for chunk in retrieval.chunks] == ["Doctorado en IA"]
+        assert mock_vector_store._collection.query.call_args.kwargs["where"] == {"program": "doctorado_ia"}
+    
+    def test_lexical_search_is_scoped(self, lexical_index):
+        """Test that BM25 only scores the allowed chunks"""
+        assert lexical_index.chunk_ids_where({"source": "datos.pdf"}) == {"datos"}
+        assert [chunk_id for chunk_id, _ in lexical_index.search("maestría", k=3, chunk_ids={"costos"})] == ["costos"]
+    
+    def test_ingestion_keeps_index_in_sync(self, metadata_index):
+        """Test that stored and removed chunks update the metadata index"""
+        engine = PDFIngestionEngine.__new__(PDFIngestionEngine)
+        engine.metadata_index = metadata_index
+        engine.lexical_index = None
+        plan = ChunkPlan(
+            source="nuevo.pdf",
+            document_id="nuevo",
+            added=[Document(page_content="x", metadata={"program": "doctorado", "source_file": "nuevo.pdf"})],
+            added_ids=["d"],
+            removed_ids=["c"]
+        )
+        
+        engine._index_chunks(plan)
+        
+        assert metadata_index.chunk_ids({"program": "doctorado"}) == {"d"}
+
+
+class TestRequestCoalescing:
+    """Test suite for single-flight coalescing of identical questions"""
+    
+    async def test_concurrent_identical_questions_share_one_call(self, rag_query_engine, mock_vector_store):
+        """Test that identical in-flight questions trigger one retrieval and one LLM call"""
+        import asyncio
+        
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Inscripciones abiertas hasta el 30 de junio", {"source": "calendario.pdf"})
+        )
+        rag_query_engine.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        
+        async def slow_answer(messages):
+            await asyncio.sleep(0.05)
+            return MagicMock(content="Hasta el 30 de junio.")
+        
+        rag_query_engine.llm.ainvoke = AsyncMock(side_effect=slow_answer)
+        
+        results = await asyncio.gather(
+            rag_query_engine.aquery("¿Cuándo cierran las inscripciones?"),
+            rag_query_engine.aquery("¿Cuándo cierran   las inscripciones?"),
+            rag_query_engine.aquery("¿Cuándo cierran las inscripciones?")
+        )
+        
+        assert [r["answer"] for r in results] == ["Hasta el 30 de junio."] * 3
+        rag_query_engine.llm.ainvoke.assert_awaited_once()
+        mock_vector_store._collection.query.assert_called_once()
+        assert rag_query_engine.coalescer.stats()["coalesced"] == 2
+    
+    async def test_coalesced_callers_get_independent_responses(self, rag_query_engine, mock_vector_store):
+        """Test that mutating one coalesced response leaves the others untouched"""
+        import asyncio
+        
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Inscripciones abiertas", {"source": "calendario.pdf", "page": 1})
+        )
+        rag_query_engine.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        
+        async def slow_answer(messages):
+            await asyncio.sleep(0.05)
+            return MagicMock(content="Abiertas.")
+        
+        rag_query_engine.llm.ainvoke = AsyncMock(side_effect=slow_answer)
+        
+        first, second = await asyncio.gather(
+            rag_query_engine.aquery("¿Inscripciones?"),
+            rag_query_engine.aquery("¿Inscripciones?")
+        )
+        first["sources"].append({"source": "otro.pdf"})
+        first["sources"][0]["page"] = 99
+        
+        assert rag_query_engine.coalescer.stats()["coalesced"] == 1
+        assert len(second["sources"]) == 1
+        assert second["sources"][0]["page"] == 1
+    
+    def test_no_documents_response_is_not_shared(self, rag_query_engine, mock_vector_store):
+        """Test that callers can modify the no-documents response without affecting others"""
+        mock_vector_store._collection.query.return_value = make_query_result()
+        rag_query_engine.embeddings.embed_query.return_value = [0.1, 0.2]
+        
+        result = rag_query_engine.query("Pregunta sin contexto")
+        result["sources"].append({"source": "otro.pdf"})
+        
+        assert NO_DOCUMENTS_RESPONSE["sources"] == []
+        assert rag_query_engine.query("Pregunta sin contexto")["sources"] == []
+    
+    async def test_return_sources_flag_is_part_of_the_key(self, rag_query_engine, mock_vector_store):
+        """Test that requests differing in return_sources are not merged"""
+        import asyncio
+        
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Texto", {"source": "doc.pdf"})
+        )
+        rag_query_engine.embeddings.aembed_query = AsyncMock(return_value=[0.1, 0.2])
+        rag_query_engine.llm.ainvoke = AsyncMock(return_value=MagicMock(content="Respuesta"))
+        
+        with_sources, without_sources = await asyncio.gather(
+            rag_query_engine.aquery("Pregunta", return_sources=True),
+            rag_query_engine.aquery("Pregunta", return_sources=False)
+        )
+        
+        assert with_sources["sources"]
+        assert without_sources["sources"] == []
+        assert rag_query_engine.llm.ainvoke.await_count == 2
+    
+    def test_sync_callers_wait_for_the_leader(self):
+        """Test that threads with the same key share one execution"""
+        import threading
+        
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(1)
+            return {"answer": 42}
+        
+        results = []
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+        leader.start()
+        started.wait(1)
+        follower = threading.Thread(target=lambda: results.append(flight.do("k", compute)))
+        follower.start()
+        while flight.stats()["coalesced"] < 1:
+            time.sleep(0.001)
+        release.set()
+        leader.join()
+        follower.join()
+        
+        assert results == [{"answer": 42}, {"answer": 42}]
+        assert len(calls) == 1
+        assert flight.stats()["in_flight"] == 0
+    
+    def test_errors_propagate_and_are_not_remembered(self):
+        """Test that a failed execution is not reused by later callers"""
+        flight = SingleFlight()
+        
+        with pytest.raises(ValueError):
+            flight.do("k", Mock(side_effect=ValueError("boom")))
+        
+        assert flight.do("k", lambda: "ok") == "ok"
+        assert flight.stats()["executions"] == 2
+
+
+class TestStreamQuery:
+    """Test suite for streamed query responses"""
+    
+    def test_stream_yields_tokens_and_final_event(self, rag_query_engine, mock_vector_store):
+        """Test that generated fragments are streamed before the done event"""
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Tuition: 5,000 per semester", {"source": "fees.pdf", "page": 1})
+        )
+        rag_query_engine.llm.stream.return_value = iter([MagicMock(content="Cuesta "), MagicMock(content="5,000.")])
+        
+        events = list(rag_query_engine.stream_query("¿Cuál es el costo?"))
+        
+        assert [event["event"] for event in events] == ["token", "token", "done"]
+        done = events[-1]["data"]
+        assert done["answer"] == "Cuesta 5,000."
+        assert done["sources"][0]["source"] == "fees.pdf"
+        assert "first_token_ms" in done["timings"]
+    
+    def test_stream_without_documents_emits_error(self, rag_query_engine, mock_vector_store):
+        """Test that a missing context ends the stream with an error event"""
+        mock_vector_store._collection.query.return_value = make_query_result()
+        
+        events = list(rag_query_engine.stream_query("Unknown topic"))
+        
+        assert len(events) == 1
+        assert events[0]["event"] == "error"
+
+
+def fake_pdf_pages(path, metadata=None):
+    """iter_pdf_pages stand-in: two pages per file, fails on files named broken*"""
+    name = os.path.basename(path)
+    if name.startswith("broken"):
+        raise ValueError("invalid PDF")
+    for page in range(2):
+        yield Document(
+            page_content=f"{name} página {page}",
+            metadata={"source": path, "page": page, **(metadata or {})}
+        )
+
+
+class FakeChromaStore:
+    """Chroma stand-in that keeps chunk metadata by ID"""
+    
+    def __init__(self, embedding_function=None):
+        self.embedding_function = embedding_function
+        self.chunks = {}
+        self.added = []
+        self.deleted = []
+        self.persist = MagicMock()
+        self._collection = MagicMock()
+        self.embeddings = {}
+        self._collection.get.side_effect = self._get
+        self._collection.update.side_effect = self._update
+        self._collection.upsert.side_effect = self._upsert
+        self._collection.delete.side_effect = self.delete
+    
+    def _get(self, ids=None, where=None, include=None, limit=None, offset=0):
+        if ids is None:
+            ids = [
+                chunk_id for chunk_id, doc in self.chunks.items()
+                if all(doc.metadata.get(key) == value for key, value in (where or {}).items())
+            ]
+        ids = [chunk_id for chunk_id in ids if chunk_id in self.chunks][offset:]
+        ids = ids[:limit] if limit is not None else ids
+        return {
+            "ids": ids,
+            "metadatas": [dict(self.chunks[i].metadata) for i in ids],
+            "documents": [self.chunks[i].page_content for i in ids],
+            "embeddings": [self.embeddings.get(i) for i in ids]
+        }
+    
+    def _upsert(self, ids, embeddings, documents, metadatas):
+        self.added.append(list(ids))
+        for chunk_id, embedding, text, metadata in zip(ids, embeddings, documents, metadatas):
+            self.chunks[chunk_id] = Document(page_content=text, metadata=dict(metadata))
+            self.embeddings[chunk_id] = embedding
+    
+    def _update(self, ids, metadatas):
+        for chunk_id, metadata in zip(ids, metadatas):
+            self.chunks[chunk_id].metadata = dict(metadata)
+    
+    def add_documents(self, documents, ids):
+        if self.embedding_function is not None:
+            self.embedding_function.embed_documents([doc.page_content for doc in documents])
+        self.added.append(list(ids))
+        for chunk_id, doc in zip(ids, documents):
+            self.chunks[chunk_id] = Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+    
+    def delete(self, ids):
+        self.deleted.append(list(ids))
+        for chunk_id in ids:
+            self.chunks.pop(chunk_id, None)
+
+
+@pytest.fixture
+def ingestion_engine():
+    """Create a PDF ingestion engine with an in-memory vector store"""
+    client = MagicMock()
+    client.embed_documents.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+    with patch('app.engine.ingest.Chroma'):
+        engine = PDFIngestionEngine(vector_db_path="./test_db", embeddings=client)
+    engine.vector_store = FakeChromaStore()
+    return engine
+
+
+class TestParallelIngestion:
+    """Test suite for directory ingestion"""
+    
+    @pytest.fixture
+    def pdf_dir(self, tmp_path):
+        for name in ["a.pdf", "b.pdf", "broken.pdf", "c.PDF", "notas.txt"]:
+            (tmp_path / name).write_bytes(b"%PDF-1.4")
+        return tmp_path
+    
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_directory_stats_per_file(self, ingestion_engine, pdf_dir, workers):
+        """Test that every PDF gets a record with its timing, serial or parallel"""
+        progress = []
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            stats = ingestion_engine.ingest_multiple_pdfs(
+                str(pdf_dir), workers=workers, progress_callback=progress.append
+            )
+        
+        assert stats["total"] == 4
+        assert stats["successful"] == 3
+        assert stats["failed"] == 1
+        assert stats["workers"] == workers
+        records = {record["file"]: record for record in stats["files"]}
+        assert records["a.pdf"]["pages"] == 2
+        assert records["a.pdf"]["chunks"] == 2
+        assert records["a.pdf"]["parse_ms"] >= 0
+        assert records["broken.pdf"]["success"] is False
+        assert "invalid PDF" in records["broken.pdf"]["error"]
+        assert len(progress) == 4
+    
+    def test_single_writer_persists_once(self, ingestion_engine, pdf_dir):
+        """Test that chunks are written from this process and persisted once"""
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            ingestion_engine.ingest_multiple_pdfs(str(pdf_dir), workers=2)
+        
+        store = ingestion_engine.vector_store
+        assert len(store.added) == 3
+        store.persist.assert_called_once()
+        assert all(doc.metadata["file_type"] == "pdf" for doc in store.chunks.values())
+
+
+class TestIncrementalIngestion:
+    """Test suite for hash-based re-ingestion"""
+    
+    @pytest.fixture
+    def pages(self):
+        return {"text": ["Requisitos de admisión", "Costo por semestre"]}
+    
+    @pytest.fixture
+    def loader(self, pages):
+        def page_loader(path, metadata=None):
+            for page, text in enumerate(pages["text"]):
+                yield Document(page_content=text, metadata={"page": page, "source": path, **(metadata or {})})
+        
+        with patch('app.engine.ingest.iter_pdf_pages', page_loader):
+            yield page_loader
+    
+    def test_unchanged_file_is_skipped(self, ingestion_engine, loader, tmp_path):
+        """Test that re-ingesting identical bytes does not parse or embed again"""
+        pdf = tmp_path / "catalogo.pdf"
+        pdf.write_bytes(b"%PDF-1.4 v1")
+        
+        first = ingestion_engine.ingest_file(str(pdf))
+        with patch('app.engine.ingest.iter_pdf_pages') as parse:
+            second = ingestion_engine.ingest_file(str(pdf))
+        
+        assert first["added"] == 2
+        assert second["skipped"] is True
+        assert second["unchanged"] == 2
+        parse.assert_not_called()
+        assert len(ingestion_engine.vector_store.added) == 1
+    
+    def test_changed_file_replaces_only_changed_chunks(self, ingestion_engine, loader, pages, tmp_path):
+        """Test that only new chunks are embedded and stale ones removed"""
+        pdf = tmp_path / "catalogo.pdf"
+        pdf.write_bytes(b"%PDF-1.4 v1")
+        ingestion_engine.ingest_file(str(pdf))
+        original_ids = set(ingestion_engine.vector_store.chunks)
+        listener = Mock()
+        ingestion_engine.add_ingest_listener(listener)
+        
+        pdf.write_bytes(b"%PDF-1.4 v2")
+        pages["text"] = ["Requisitos de admisión", "Costo actualizado por semestre"]
+        record = ingestion_engine.ingest_file(str(pdf))
+        
+        assert (record["added"], record["unchanged"], record["removed"]) == (1, 1, 1)
+        store = ingestion_engine.vector_store
+        assert len(store.chunks) == 2
+        assert len(original_ids & set(store.chunks)) == 1
+        assert len(store.added[-1]) == 1
+        assert len({doc.metadata["file_hash"] for doc in store.chunks.values()}) == 1
+        changed = listener.call_args[0][1]
+        assert len(changed) == 2
+    
+    def test_chunk_ids_are_stable_and_distinct(self):
+        """Test that IDs depend on content, not position, and repeated chunks differ"""
+        from app.engine.ingest import stable_chunk_ids
+        
+        ids = stable_chunk_ids("doc.pdf", ["h1", "h2", "h1"])
+        moved = stable_chunk_ids("doc.pdf", ["h0", "h1", "h2"])
+        
+        assert len(set(ids)) == 3
+        assert ids[0] == moved[1] and ids[1] == moved[2]
+        assert stable_chunk_ids("otro.pdf", ["h1"])[0] != ids[0]
+    
+    def test_reingestion_reuses_chunk_embeddings(self, loader, pages, tmp_path):
+        """Test that unchanged chunk texts are served from the chunk cache"""
+        client = MagicMock()
+        client.embed_documents.side_effect = lambda texts: [[float(len(t)), 1.0] for t in texts]
+        with patch('app.engine.ingest.Chroma'):
+            engine = PDFIngestionEngine(
+                embeddings=client,
+                chunk_embedding_cache=EmbeddingCache(str(tmp_path / "chunks.db"))
+            )
+        engine.vector_store = FakeChromaStore(engine.document_embeddings)
+        (tmp_path / "docs").mkdir()
+        pdf = tmp_path / "docs" / "catalogo.pdf"
+        pdf.write_bytes(b"v1")
+        engine.ingest_multiple_pdfs(str(tmp_path / "docs"))
+        
+        # Rebuild: the collection is lost but the chunk cache survives
+        engine.vector_store = FakeChromaStore(engine.document_embeddings)
+        pages["text"].append("Becas disponibles")
+        pdf.write_bytes(b"v2")
+        stats = engine.ingest_multiple_pdfs(str(tmp_path / "docs"))
+        
+        assert stats["chunks_added"] == 3
+        assert stats["embedding_cache_hits"] == 2
+        assert stats["embedding_cache_misses"] == 1
+        assert stats["embedding_cache_hit_ratio"] == pytest.approx(2 / 3)
+        assert client.embed_documents.call_args_list[-1][0][0] == ["Becas disponibles"]
+    
+    def test_directory_stats_report_chunk_counts(self, ingestion_engine, loader, tmp_path):
+        """Test that directory stats total added, unchanged and skipped files"""
+        for name in ["a.pdf", "b.pdf"]:
+            (tmp_path / name).write_bytes(name.encode())
+        ingestion_engine.ingest_multiple_pdfs(str(tmp_path))
+        
+        (tmp_path / "b.pdf").write_bytes(b"b v2")
+        stats = ingestion_engine.ingest_multiple_pdfs(str(tmp_path))
+        
+        assert stats["skipped"] == 1
+        assert stats["chunks_added"] == 0
+        assert stats["chunks_unchanged"] == 4
+        assert stats["chunks_removed"] == 0
+
+
+class TestStreamingIngestion:
+    """Test suite for page-by-page PDF ingestion"""
+    
+    @pytest.fixture
+    def long_pdf(self, tmp_path):
+        pdf = tmp_path / "reglamento.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        
+        def pages(path, metadata=None):
+            for page in range(5):
+                yield Document(page_content=f"Artículo {page}", metadata={"source": path, "page": page})
+        
+        with patch('app.engine.ingest.iter_pdf_pages', pages):
+            yield str(pdf)
+    
+    def test_pages_are_read_lazily(self, tmp_path):
+        """Test that a page is extracted only when the stream reaches it"""
+        pdf = tmp_path / "reglamento.pdf"
+        pdf.write_bytes(b"%PDF-1.4")
+        pages = [MagicMock() for _ in range(3)]
+        for number, page in enumerate(pages):
+            page.extract_text.return_value = f"Página {number}"
+        
+        with patch('app.engine.ingest.PdfReader') as reader:
+            reader.return_value.pages = pages
+            stream = iter_pdf_pages(str(pdf), {"program": "reglamento"})
+            first = next(stream)
+            
+            assert first.page_content == "Página 0"
+            assert first.metadata == {"source": str(pdf), "page": 0, "program": "reglamento"}
+            pages[1].extract_text.assert_not_called()
+            assert [doc.metadata["page"] for doc in stream] == [1, 2]
+    
+    def test_stream_matches_full_split(self, long_pdf):
+        """Test that streaming yields the same chunks as loading the whole file"""
+        stream = PDFChunkStream(long_pdf, {"program": "reglamento"}, chunk_size=5, chunk_overlap=2)
+        streamed = list(stream)
+        pages, chunks = load_and_split_pdf(long_pdf, {"program": "reglamento"}, 5, 2)
+        
+        assert stream.pages == pages == 5
+        assert stream.chunks == len(chunks) > 5
+        assert [(c.page_content, c.metadata) for c in streamed] == [(c.page_content, c.metadata) for c in chunks]
+    
+    def test_chunks_are_stored_in_batches(self, ingestion_engine, long_pdf):
+        """Test that each batch is written as the PDF is read, with running progress"""
+        ingestion_engine.stream_batch_size = 2
+        progress = []
+        
+        record = ingestion_engine.ingest_file(long_pdf, progress_callback=progress.append)
+        
+        assert record["success"] is True
+        assert (record["pages"], record["chunks"], record["added"]) == (5, 5, 5)
+        assert [len(ids) for ids in ingestion_engine.vector_store.added] == [2, 2, 1]
+        assert [(p["pages"], p["added"]) for p in progress] == [(2, 2), (4, 4), (5, 5)]
+        ingestion_engine.vector_store.persist.assert_called_once()
+    
+    def test_listeners_notified_when_streaming_fails(self, ingestion_engine, long_pdf):
+        """Test that batches stored before a failure still invalidate listeners"""
+        ingestion_engine.stream_batch_size = 2
+        listener = Mock()
+        ingestion_engine.add_ingest_listener(listener)
+        
+        def failing(path, metadata=None):
+            for page in range(3):
+                yield Document(page_content=f"Artículo {page}", metadata={"source": path, "page": page})
+            raise ValueError("truncated PDF")
+        
+        with patch('app.engine.ingest.iter_pdf_pages', failing):
+            record = ingestion_engine.ingest_file(long_pdf)
+        
+        assert record["success"] is False
+        listener.assert_called_once()
+        assert set(listener.call_args[0][1]) == set(ingestion_engine.vector_store.chunks)
+    
+    def test_stale_chunks_removed_after_streaming(self, ingestion_engine, long_pdf, tmp_path):
+        """Test that a shorter new version keeps its chunk IDs and drops the rest last"""
+        ingestion_engine.stream_batch_size = 2
+        ingestion_engine.ingest_file(long_pdf)
+        before = set(ingestion_engine.vector_store.chunks)
+        
+        def shorter(path, metadata=None):
+            for page in range(3):
+                yield Document(page_content=f"Artículo {page}", metadata={"source": path, "page": page})
+        
+        with open(long_pdf, "ab") as f:
+            f.write(b" v2")
+        with patch('app.engine.ingest.iter_pdf_pages', shorter):
+            record = ingestion_engine.ingest_file(long_pdf)
+        
+        assert (record["added"], record["unchanged"], record["removed"]) == (0, 3, 2)
+        assert set(ingestion_engine.vector_store.chunks) < before
+        assert len(ingestion_engine.vector_store.deleted) == 1
+
+
+class TestLinearTextSplitter:
+    """Test suite for the single-pass text splitter"""
+    
+    SEPARATORS = ["\n\n", "\n", " ", ""]
+    
+    @pytest.fixture
+    def regulation(self):
+        article = "El alumno deberá cumplir con los requisitos establecidos en este reglamento"
+        paragraphs = [
+            "\n".join(f"Artículo {n}.{line} {article}" for line in range(n % 4 + 1))
+            for n in range(40)
+        ]
+        paragraphs.insert(7, "x" * 250)
+        paragraphs.insert(20, " ".join([article] * 12))
+        return "\n\n\n".join(paragraphs)
+    
+    @pytest.mark.parametrize("chunk_size,chunk_overlap", [(1000, 200), (200, 50), (120, 119), (60, 0)])
+    def test_chunks_match_recursive_splitter(self, regulation, chunk_size, chunk_overlap):
+        """Test that every chunk boundary matches RecursiveCharacterTextSplitter"""
+        kwargs = dict(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=self.SEPARATORS)
+        
+        expected = RecursiveCharacterTextSplitter(**kwargs).split_text(regulation)
+        
+        assert LinearTextSplitter(**kwargs).split_text(regulation) == expected
+    
+    @pytest.mark.parametrize("text", ["", "   ", "\n\n", "a", "sin separadores" * 30, " \n\n inicio con separador"])
+    def test_edge_cases_match(self, text):
+        """Test that empty, blank and separator-only texts split the same way"""
+        kwargs = dict(chunk_size=20, chunk_overlap=5, separators=self.SEPARATORS)
+        
+        assert LinearTextSplitter(**kwargs).split_text(text) == RecursiveCharacterTextSplitter(**kwargs).split_text(text)
+    
+    def test_page_metadata_preserved(self, regulation):
+        """Test that split_documents copies each page's metadata to its chunks"""
+        pages = [
+            Document(page_content=regulation, metadata={"source": "r.pdf", "page": 0}),
+            Document(page_content="Costo por semestre", metadata={"source": "r.pdf", "page": 1})
+        ]
+        
+        chunks = LinearTextSplitter(chunk_size=300, chunk_overlap=50).split_documents(pages)
+        
+        assert chunks[-1].metadata == {"source": "r.pdf", "page": 1}
+        assert {chunk.metadata["page"] for chunk in chunks[:-1]} == {0}
+        chunks[0].metadata["page"] = 9
+        assert pages[0].metadata["page"] == 0
+    
+    def test_unsupported_options_fall_back(self, regulation):
+        """Test that regex separators use the recursive implementation"""
+        kwargs = dict(chunk_size=200, chunk_overlap=20, separators=[r"\n+", r"\s+"], is_separator_regex=True)
+        
+        splitter = LinearTextSplitter(**kwargs)
+        
+        assert splitter._linear is False
+        assert splitter.split_text(regulation) == RecursiveCharacterTextSplitter(**kwargs).split_text(regulation)
+
+
+class TestDirectoryWatcher:
+    """Test suite for the watched documents folder"""
+    
+    @pytest.fixture
+    def folder(self, tmp_path):
+        folder = tmp_path / "documents"
+        folder.mkdir()
+        for name in ["a.pdf", "b.pdf", "notas.txt"]:
+            (folder / name).write_bytes(b"%PDF-1.4 " + name.encode())
+        return folder
+    
+    @pytest.fixture
+    def watcher(self, ingestion_engine, folder):
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            yield DirectoryWatcher(ingestion_engine, str(folder), debounce_seconds=0.05, poll_interval=0.02)
+    
+    def stored_files(self, engine):
+        return {doc.metadata["source_file"] for doc in engine.vector_store.chunks.values()}
+    
+    def test_sync_ingests_folder_in_one_batch(self, watcher, ingestion_engine, folder):
+        """Test that the initial sync ingests every PDF, tagged with the folder, persisting once"""
+        stats = watcher.sync()
+        
+        assert (stats["total"], stats["successful"]) == (2, 2)
+        assert self.stored_files(ingestion_engine) == {"a.pdf", "b.pdf"}
+        assert all(
+            doc.metadata["source_dir"] == str(folder)
+            for doc in ingestion_engine.vector_store.chunks.values()
+        )
+        ingestion_engine.vector_store.persist.assert_called_once()
+    
+    def test_sync_removes_files_deleted_while_stopped(self, watcher, ingestion_engine, folder):
+        """Test that documents of the folder whose files are gone are removed on sync"""
+        watcher.sync()
+        listener = Mock()
+        ingestion_engine.add_ingest_listener(listener)
+        (folder / "b.pdf").unlink()
+        
+        stats = watcher.sync()
+        
+        assert stats["removed"] == ["b.pdf"]
+        assert stats["skipped"] == 1
+        assert self.stored_files(ingestion_engine) == {"a.pdf"}
+        assert listener.call_count == 1
+    
+    def test_changes_ingest_modified_and_remove_deleted(self, watcher, ingestion_engine, folder):
+        """Test that a batch of events re-ingests changed PDFs, drops deleted ones and ignores the rest"""
+        watcher.sync()
+        (folder / "a.pdf").write_bytes(b"%PDF-1.4 v2")
+        (folder / "b.pdf").unlink()
+        
+        stats = watcher.process_changes([
+            str(folder / "a.pdf"), str(folder / "b.pdf"), str(folder / "notas.txt")
+        ])
+        
+        assert stats["total"] == 1
+        assert stats["files"][0]["skipped"] is False
+        assert stats["removed"] == ["b.pdf"]
+        assert self.stored_files(ingestion_engine) == {"a.pdf"}
+        assert watcher.stats()["files_removed"] == 1
+    
+    def test_watched_file_does_not_touch_upload_with_same_name(self, watcher, ingestion_engine, folder, tmp_path):
+        """Test that watched documents and uploads with the same file name are kept apart"""
+        upload = tmp_path / "a.pdf"
+        upload.write_bytes(b"%PDF-1.4 upload")
+        ingestion_engine.ingest_file(str(upload), {"source_file": "a.pdf"})
+        upload_chunks = set(ingestion_engine.vector_store.chunks)
+        
+        watcher.sync()
+        (folder / "a.pdf").unlink()
+        stats = watcher.process_changes([str(folder / "a.pdf")])
+        
+        assert stats["removed"] == ["a.pdf"]
+        assert set(ingestion_engine.stored_document_ids()) == {"a.pdf", str(folder / "b.pdf")}
+        assert upload_chunks <= set(ingestion_engine.vector_store.chunks)
+    
+    def test_polling_picks_up_new_files(self, watcher, ingestion_engine, folder):
+        """Test that the polling fallback ingests a file added after startup"""
+        watcher.force_polling = True
+        watcher.start()
+        try:
+            deadline = time.time() + 5
+            while watcher.stats()["batches"] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+            (folder / "c.pdf").write_bytes(b"%PDF-1.4 c")
+            while "c.pdf" not in self.stored_files(ingestion_engine) and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            watcher.stop(timeout=5)
+        
+        assert self.stored_files(ingestion_engine) == {"a.pdf", "b.pdf", "c.pdf"}
+        assert watcher.stats()["mode"] == "polling"
+        assert watcher.stats()["running"] is False
+
+
+class TestVectorBackend:
+    """Test suite for the client/server Chroma backend"""
+    
+    def test_pooled_session_defaults(self):
+        """Test that the session pools connections, retries and sets a timeout"""
+        session = PooledSession(pool_size=4, timeout=(1.0, 5.0), max_retries=2)
+        adapter = session.get_adapter("http://chromadb:8000/api/v1/heartbeat")
+        
+        assert adapter._pool_maxsize == 4
+        assert adapter.max_retries.total == 2
+        assert 503 in adapter.max_retries.status_forcelist
+        with patch('requests.Session.request') as request:
+            session.request("GET", "http://chromadb:8000/api/v1/heartbeat")
+            session.request("GET", "http://chromadb:8000/api/v1/heartbeat", timeout=9)
+        assert request.call_args_list[0].kwargs["timeout"] == (1.0, 5.0)
+        assert request.call_args_list[1].kwargs["timeout"] == 9
+    
+    def test_only_idempotent_requests_retry_failed_responses(self):
+        """Test that adds and deletes are not replayed after a 502, unlike reads and upserts"""
+        session = PooledSession()
+        collection = "http://chromadb:8000/api/v1/collections/c1"
+        
+        def retries(method, endpoint):
+            return session.get_adapter(f"{collection}/{endpoint}").max_retries.is_retry(method, 502)
+        
+        assert retries("POST", "query") and retries("POST", "get") and retries("POST", "upsert")
+        assert not retries("POST", "add")
+        assert not retries("POST", "update")
+        assert not retries("POST", "delete")
+        assert retries("GET", "count")
+        assert not session.get_adapter(collection).max_retries.is_retry("DELETE", 502)
+    
+    def test_pinned_chromadb_client_exposes_session(self):
+        """Test that the pinned chromadb client still has the session create_http_client replaces"""
+        import chromadb
+        from chromadb.config import Settings
+        
+        with patch('chromadb.api.client.Client._validate_tenant_database'):
+            client = chromadb.HttpClient(host="localhost", port="8000", settings=Settings(anonymized_telemetry=False))
+            with patch('chromadb.HttpClient', return_value=client):
+                create_http_client()
+        
+        assert isinstance(client._server._session, PooledSession)
+    
+    def test_http_client_requires_session_attribute(self):
+        """Test that a chromadb client without the private session fails loudly"""
+        with patch('chromadb.HttpClient', return_value=MagicMock(spec=[])):
+            with pytest.raises(RuntimeError):
+                create_http_client()
+    
+    def test_http_client_gets_pooled_session(self):
+        """Test that the Chroma client's session is replaced, keeping its headers"""
+        client = MagicMock()
+        client._server._session = requests.Session()
+        client._server._session.headers["Authorization"] = "Bearer t"
+        
+        with patch('chromadb.HttpClient', return_value=client) as http_client:
+            result = create_http_client(host="chromadb", port=8000, pool_size=3)
+        
+        assert result is client
+        assert http_client.call_args.kwargs["host"] == "chromadb"
+        session = client._server._session
+        assert isinstance(session, PooledSession)
+        assert session.headers["Authorization"] == "Bearer t"
+    
+    def test_http_client_retries_connection(self):
+        """Test that connecting retries while the server starts"""
+        client = MagicMock()
+        client._server._session = requests.Session()
+        
+        with patch('chromadb.HttpClient', side_effect=[ConnectionError("down"), client]) as http_client:
+            with patch('app.engine.vector_backend.time.sleep') as sleep:
+                assert create_http_client(max_retries=2) is client
+        assert http_client.call_count == 2
+        sleep.assert_called_once()
+        
+        with patch('chromadb.HttpClient', side_effect=ConnectionError("down")):
+            with patch('app.engine.vector_backend.time.sleep'):
+                with pytest.raises(ConnectionError):
+                    create_http_client(max_retries=1)
+    
+    def test_engines_share_client(self):
+        """Test that both engines open their store through the given client"""
+        client = MagicMock()
+        with patch('app.engine.query.OpenAIEmbeddings'), patch('app.engine.query.ChatOpenAI'):
+            with patch('app.engine.query.Chroma') as query_chroma:
+                RAGQueryEngine(vector_db_path="./unused", vector_client=client)
+        with patch('app.engine.ingest.OpenAIEmbeddings'):
+            with patch('app.engine.ingest.Chroma') as ingest_chroma:
+                PDFIngestionEngine(vector_db_path="./unused", vector_client=client)
+        
+        assert query_chroma.call_args.kwargs["client"] is client
+        assert "persist_directory" not in query_chroma.call_args.kwargs
+        assert ingest_chroma.call_args.kwargs["client"] is client
+    
+    def test_client_mode_skips_persist(self, ingestion_engine):
+        """Test that the Chroma server is not asked to persist"""
+        ingestion_engine.persist()
+        ingestion_engine.vector_store.persist.assert_called_once()
+        
+        ingestion_engine.vector_client = MagicMock()
+        ingestion_engine.persist()
+        ingestion_engine.vector_store.persist.assert_called_once()
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic embeddings: one random unit vector per text"""
+    
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+    
+    def embed_query(self, text):
+        rng = np.random.default_rng(abs(hash(text)) % 2**32)
+        return rng.normal(size=16).tolist()
+
+
+class TestEngineResources:
+    """Test suite for the registry shared by both engines"""
+    
+    def test_engines_share_one_store_and_clients(self, tmp_path):
+        """Test that both engines use the registry's embeddings, vector store and LLM"""
+        resources = EngineResources(HashEmbeddings(), vector_db_path=str(tmp_path / "chroma"), llm=MagicMock())
+        ingest_engine = PDFIngestionEngine(resources=resources)
+        with patch('app.engine.query.ChatOpenAI') as chat:
+            query_engine = RAGQueryEngine(resources=resources)
+        
+        assert ingest_engine.embeddings is query_engine.embeddings is resources.embeddings
+        assert ingest_engine.vector_store is query_engine.vector_store is resources.vector_store
+        assert query_engine.llm is resources.llm
+        chat.assert_not_called()
+        query_engine.close()
+    
+    def test_query_reads_its_writes(self, tmp_path):
+        """Test that chunks ingested through one engine are found by the other at once"""
+        resources = EngineResources(HashEmbeddings(), vector_db_path=str(tmp_path / "chroma"), llm=MagicMock())
+        ingest_engine = PDFIngestionEngine(resources=resources)
+        query_engine = RAGQueryEngine(resources=resources, retrieval_k=1)
+        pdf_path = tmp_path / "a.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            ingest_engine.ingest_file(str(pdf_path))
+        
+        result = query_engine._retrieve("a.pdf página 1")
+        assert result.chunks[0].document.page_content == "a.pdf página 1"
+        
+        ingest_engine.remove_document("a.pdf")
+        assert query_engine._retrieve("a.pdf página 1").chunks == []
+        query_engine.close()
+    
+    def test_store_created_by_ingestion_is_visible_to_queries(self, tmp_path):
+        """Test that a store created on first ingestion replaces the registry's"""
+        resources = EngineResources(HashEmbeddings(), vector_db_path=str(tmp_path / "chroma"), llm=MagicMock())
+        query_engine = RAGQueryEngine(resources=resources)
+        ingest_engine = PDFIngestionEngine(resources=resources)
+        with patch('app.engine.resources.Chroma', side_effect=RuntimeError("unavailable")):
+            assert query_engine.vector_store is None
+        
+        ingest_engine.vector_store = FakeChromaStore()
+        
+        assert query_engine.vector_store is ingest_engine.vector_store
+        query_engine.close()
+
+
+class TestFlatIndex:
+    """Test suite for the memory-mapped flat vector index"""
+    
+    @pytest.fixture
+    def vectors(self):
+        return np.random.default_rng(0).normal(size=(50, 8)).astype(np.float32)
+    
+    @pytest.fixture
+    def index(self, tmp_path, vectors):
+        index = FlatIndex(str(tmp_path / "flat"))
+        index.add(
+            ids=[f"c{i}" for i in range(len(vectors))],
+            embeddings=vectors.tolist(),
+            documents=[f"texto {i}" for i in range(len(vectors))],
+            metadatas=[{"document_id": f"doc{i % 5}", "page": i} for i in range(len(vectors))]
+        )
+        return index
+    
+    def test_query_matches_brute_force(self, index, vectors):
+        """Test that top-k equals an exact cosine ranking, in Chroma's format"""
+        queries = np.random.default_rng(1).normal(size=(3, 8))
+        raw = index.query(queries.tolist(), n_results=4)
+        
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        similarities = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ unit.T
+        for i in range(3):
+            expected = np.argsort(-similarities[i])[:4]
+            assert raw["ids"][i] == [f"c{j}" for j in expected]
+            assert raw["distances"][i] == pytest.approx(1 - similarities[i][expected], abs=1e-5)
+            assert raw["metadatas"][i][0]["page"] == expected[0]
+        
+        chunks = chunks_from_query_result(raw, index.metadata["hnsw:space"])
+        assert chunks[0].score == pytest.approx(similarities[0].max(), abs=1e-5)
+    
+    def test_upsert_and_delete_hide_dead_rows(self, index, vectors):
+        """Test that replaced and deleted chunks are never returned"""
+        index.upsert(ids=["c0"], embeddings=[(-vectors[0]).tolist()], documents=["nuevo"])
+        index.delete(ids=["c1"])
+        
+        raw = index.query([(-vectors[0]).tolist()], n_results=50)
+        assert raw["ids"][0][0] == "c0"
+        assert raw["documents"][0][0] == "nuevo"
+        assert "c1" not in raw["ids"][0]
+        assert len(raw["ids"][0]) == 49
+        assert index.count() == 49
+    
+    def test_get_filters_and_updates_metadata(self, index):
+        """Test get by ID or metadata and in-place metadata updates"""
+        stored = index.get(where={"document_id": "doc2"}, include=["metadatas"])
+        assert stored["ids"] == [f"c{i}" for i in range(2, 50, 5)]
+        
+        index.update(ids=["c2"], metadatas=[{"document_id": "doc9"}])
+        assert index.get(ids=["c2", "c3"])["metadatas"][0] == {"document_id": "doc9"}
+        assert index.get(limit=2, offset=10)["ids"] == ["c10", "c11"]
+        
+        index.delete(where={"document_id": "doc3"})
+        assert index.get(where={"document_id": "doc3"})["ids"] == []
+    
+    def test_growth_and_compaction_keep_results(self, tmp_path):
+        """Test that the file grows past its capacity and compacts dead rows"""
+        index = FlatIndex(str(tmp_path / "flat"))
+        rng = np.random.default_rng(2)
+        vectors = rng.normal(size=(3000, 8))
+        index.add(ids=[str(i) for i in range(3000)], embeddings=vectors.tolist())
+        index.delete(ids=[str(i) for i in range(2000)])
+        
+        assert index.count() == 1000
+        assert len([name for name in os.listdir(index.path) if name.endswith(".npy")]) == 1
+        raw = index.query([vectors[2500].tolist()], n_results=1, include=["embeddings"])
+        assert raw["ids"] == [["2500"]]
+        assert raw["embeddings"][0][0] == pytest.approx(vectors[2500] / np.linalg.norm(vectors[2500]), abs=1e-5)
+    
+    def test_other_instance_sees_appends(self, index, vectors):
+        """Test that a second process-like reader picks up new rows"""
+        reader = FlatIndex(index.path)
+        assert reader.count() == 50
+        
+        index.add(ids=["extra"], embeddings=[[1.0] + [0.0] * 7], documents=["extra"])
+        
+        assert reader.count() == 51
+        assert reader.query([[1.0] + [0.0] * 7], n_results=1)["ids"] == [["extra"]]
+    
+    def test_int8_codes_round_trip(self, vectors):
+        """Test that int8 codes with per-vector scales approximate the vectors"""
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        codes, scales = quantize(unit, "int8")
+        
+        assert codes.dtype == np.int8
+        assert np.abs(codes).max(axis=1).tolist() == [127] * len(unit)
+        assert codes * scales[:, None] == pytest.approx(unit, abs=scales.max())
+        assert quantize(unit, "float16")[0].dtype == np.float16
+    
+    @pytest.mark.parametrize("quantization", ["float16", "int8"])
+    def test_quantized_search_rescores_exactly(self, index, vectors, quantization):
+        """Test that a re-encoded index returns float32 results and exact distances"""
+        queries = np.random.default_rng(1).normal(size=(3, 8)).tolist()
+        expected = index.query(queries, n_results=5)
+        
+        quantized = FlatIndex(index.path, quantization=quantization, rescore_factor=4)
+        raw = quantized.query(queries, n_results=5)
+        
+        assert raw["ids"] == expected["ids"]
+        assert raw["distances"] == [pytest.approx(d, abs=1e-6) for d in expected["distances"]]
+        usage = quantized.memory_usage()
+        assert usage["quantization"] == quantization
+        assert usage["search_bytes"] < usage["full_bytes"]
+        assert any(name.startswith("codes-") for name in os.listdir(index.path))
+    
+    def test_quantized_index_grows_and_deletes(self, tmp_path):
+        """Test that appends past the capacity and deletes keep codes in step"""
+        index = FlatIndex(str(tmp_path / "flat"), quantization="int8", rescore_factor=2)
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(1500, 8))
+        index.add(ids=[str(i) for i in range(1000)], embeddings=vectors[:1000].tolist())
+        index.add(ids=[str(i) for i in range(1000, 1500)], embeddings=vectors[1000:].tolist())
+        index.delete(ids=["1400"])
+        
+        assert index.query([vectors[1200].tolist()], n_results=1)["ids"] == [["1200"]]
+        assert "1400" not in index.query([vectors[1400].tolist()], n_results=3)["ids"][0]
+        assert index.memory_usage()["search_bytes"] == 1500 * (8 + 4)
+    
+    def test_filtered_query_scores_only_matching_rows(self, tmp_path, vectors):
+        """Test that program filters return the exact top-k within the program"""
+        for quantization in ("none", "int8"):
+            index = FlatIndex(str(tmp_path / f"flat-{quantization}"), quantization=quantization)
+            index.add(
+                ids=[f"c{i}" for i in range(len(vectors))],
+                embeddings=vectors.tolist(),
+                metadatas=[{"program": f"p{i % 3}", "source_file": f"f{i % 2}.pdf"} for i in range(len(vectors))]
+            )
+            query = vectors[3].tolist()
+            
+            raw = index.query([query], n_results=4, where={"program": "p0"})
+            assert raw["ids"][0][0] == "c3"
+            assert all(metadata["program"] == "p0" for metadata in raw["metadatas"][0])
+            
+            raw = index.query([query], n_results=50, where=where_filter({"program": "p0", "source_file": "f1.pdf"}))
+            assert sorted(raw["ids"][0]) == sorted(f"c{i}" for i in range(3, 50, 6))
+            
+            index.delete(ids=["c3"])
+            assert "c3" not in index.query([query], n_results=4, where={"program": "p0"})["ids"][0]
+    
+    def test_engines_use_flat_index(self, tmp_path):
+        """Test ingesting into the flat index and searching it from the query engine"""
+        index = FlatIndex(str(tmp_path / "flat"))
+        embeddings = HashEmbeddings()
+        ingest_engine = PDFIngestionEngine(embeddings=embeddings, flat_index=index)
+        with patch('app.engine.query.ChatOpenAI'):
+            query_engine = RAGQueryEngine(embeddings=embeddings, flat_index=index, retrieval_k=1)
+        
+        assert isinstance(ingest_engine.vector_store, FlatVectorStore)
+        pdf_path = tmp_path / "a.pdf"
+        pdf_path.write_bytes(b"%PDF-1.4")
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            record = ingest_engine.ingest_file(str(pdf_path))
+        
+        assert record["added"] == 2
+        assert ingest_engine.stored_document_ids() == ["a.pdf"]
+        result = query_engine._retrieve("a.pdf página 1")
+        assert result.chunks[0].document.page_content == "a.pdf página 1"
+        assert result.chunks[0].score == pytest.approx(1.0, abs=1e-5)
+        
+        ingest_engine.remove_document("a.pdf")
+        assert index.count() == 0
+        query_engine.close()
+
+
+class ProviderError(Exception):
+    """Embeddings client error carrying an HTTP status"""
+    
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class TestBulkIngestion:
+    """Test suite for all-or-nothing bulk ingestion"""
+    
+    @pytest.fixture
+    def engine(self, tmp_path):
+        client = MagicMock()
+        client.embed_documents.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+        with patch('app.engine.ingest.Chroma'):
+            engine = PDFIngestionEngine(embeddings=client, lexical_index=BM25Index())
+        engine.vector_store = FakeChromaStore()
+        return engine
+    
+    @pytest.fixture
+    def pdfs(self, tmp_path):
+        paths = []
+        for name in ["a.pdf", "b.pdf", "c.pdf"]:
+            (tmp_path / name).write_bytes(name.encode())
+            paths.append(str(tmp_path / name))
+        return paths
+    
+    def test_ingest_many_embeds_once_and_persists_once(self, engine, pdfs):
+        """Test that staged files are embedded together and persisted once"""
+        listener = Mock()
+        engine.add_ingest_listener(listener)
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            stats = engine.ingest_many(pdfs)
+        
+        assert stats["success"] is True
+        assert stats["state"] == "committed"
+        assert stats["chunks_added"] == 6
+        engine.embeddings.embed_documents.assert_called_once()
+        engine.vector_store.persist.assert_called_once()
+        assert len(engine.vector_store.chunks) == 6
+        assert len(engine.lexical_index) == 6
+        assert listener.call_count == 3
+    
+    def test_failed_file_stores_nothing(self, engine, pdfs, tmp_path):
+        """Test that a parse failure rolls back the whole import"""
+        broken = tmp_path / "broken.pdf"
+        broken.write_bytes(b"x")
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            stats = engine.ingest_many(pdfs + [str(broken)])
+        
+        assert stats["success"] is False
+        assert "invalid PDF" in stats["error"]
+        assert stats["state"] == "rolled back"
+        assert engine.vector_store.chunks == {}
+        engine.embeddings.embed_documents.assert_not_called()
+        assert len(engine.lexical_index) == 0
+    
+    def test_failed_commit_restores_previous_version(self, engine, pdfs):
+        """Test that a write failure undoes added chunks and restores deleted ones"""
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            engine.ingest_many(pdfs[:1])
+        before = {chunk_id: doc.page_content for chunk_id, doc in engine.vector_store.chunks.items()}
+        
+        def renamed_pages(path, metadata=None):
+            yield Document(page_content="nuevo contenido", metadata={"source": path, "page": 0})
+        
+        with open(pdfs[0], "wb") as f:
+            f.write(b"a v2")
+        engine.vector_store.persist.side_effect = [IOError("disk full"), None]
+        
+        with patch('app.engine.ingest.iter_pdf_pages', renamed_pages):
+            with pytest.raises(IOError):
+                with engine.transaction() as txn:
+                    txn.add(pdfs[0])
+        
+        assert txn.state == "rolled back"
+        after = {chunk_id: doc.page_content for chunk_id, doc in engine.vector_store.chunks.items()}
+        assert after == before
+    
+    def test_import_becomes_visible_in_one_update(self, engine, pdfs):
+        """Test that staged chunks stay hidden until a single update shows them all"""
+        store = engine.vector_store
+        flips = []
+        
+        def update(ids, metadatas):
+            assert all(engine._document_locks[os.path.basename(path)].locked() for path in pdfs)
+            flips.append([is_staged(store.chunks[chunk_id].metadata) for chunk_id in ids])
+            store._update(ids, metadatas)
+        
+        store._collection.update.side_effect = update
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            engine.ingest_many(pdfs)
+        
+        assert flips == [[True] * 6]
+        assert not any(is_staged(doc.metadata) for doc in store.chunks.values())
+    
+    def test_failed_undo_leaves_import_hidden(self, engine, pdfs):
+        """Test that chunks a failed rollback leaves behind are hidden until re-ingested"""
+        store = engine.vector_store
+        store.persist.side_effect = IOError("disk full")
+        store._collection.delete.side_effect = IOError("disk full")
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            stats = engine.ingest_many(pdfs)
+        
+        assert stats["success"] is False
+        assert len(store.chunks) == 6
+        assert all(is_staged(doc.metadata) for doc in store.chunks.values())
+        raw = store._collection.get()
+        assert chunks_from_query_result({
+            "ids": [raw["ids"]],
+            "documents": [raw["documents"]],
+            "metadatas": [raw["metadatas"]],
+            "distances": [[0.0] * len(raw["ids"])]
+        }) == []
+        assert BM25Index().load_from_collection(store._collection) == 0
+        
+        store.persist.side_effect = None
+        store._collection.delete.side_effect = store.delete
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            stats = engine.ingest_many(pdfs)
+        
+        assert stats["success"] is True
+        assert stats["chunks_unchanged"] == 6
+        assert not any(is_staged(doc.metadata) for doc in store.chunks.values())
+    
+    def test_commit_replans_document_changed_since_add(self, engine, pdfs):
+        """Test that a version stored between add and commit is replaced, not kept"""
+        def other_pages(path, metadata=None):
+            yield Document(page_content="otra versión", metadata={"source": path, "page": 0})
+        
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            with engine.transaction() as txn:
+                txn.add(pdfs[0])
+                with open(pdfs[0], "wb") as f:
+                    f.write(b"a v2")
+                with patch('app.engine.ingest.iter_pdf_pages', other_pages):
+                    assert engine.ingest_file(pdfs[0])["added"] == 1
+        
+        contents = sorted(doc.page_content for doc in engine.vector_store.chunks.values())
+        assert contents == ["a.pdf página 0", "a.pdf página 1"]
+        assert txn.records[0]["removed"] == 1
+    
+    def test_same_document_cannot_be_staged_twice(self, engine, pdfs):
+        """Test that a transaction rejects duplicate documents"""
+        with patch('app.engine.ingest.iter_pdf_pages', fake_pdf_pages):
+            with pytest.raises(ValueError):
+                with engine.transaction() as txn:
+                    txn.add(pdfs[0])
+                    txn.add(pdfs[0])
+        
+        assert engine.vector_store.chunks == {}
+
+
+def wait_for_job(job_queue, job_id, timeout=5.0):
+    """Poll a job until it leaves the queued/running states"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = job_queue.get(job_id)
+        if job["state"] not in ("queued", "running"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+class TestIngestionJobs:
+    """Test suite for background ingestion jobs"""
+    
+    @pytest.fixture
+    def engine(self):
+        engine = MagicMock()
+        
+        def ingest_file(path, metadata, progress_callback=None):
+            record = {"file": os.path.basename(path), "success": True, "pages": 3,
+                      "chunks": 7, "added": 5, "unchanged": 2, "removed": 0}
+            progress_callback(dict(record))
+            return record
+        
+        engine.ingest_file.side_effect = ingest_file
+        return engine
+    
+    def make_upload(self, tmp_path, name="catalogo.pdf"):
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-1.4")
+        return str(path)
+    
+    def test_job_reports_progress_and_timings(self, engine, tmp_path):
+        """Test that a submitted job runs in the background and records its outcome"""
+        jobs = IngestionJobQueue(engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"), workers=1)
+        jobs.start()
+        
+        job_id = jobs.submit(self.make_upload(tmp_path), "catalogo.pdf", {"program": "catalogo"})
+        job = wait_for_job(jobs, job_id)
+        jobs.shutdown()
+        
+        assert job["state"] == "succeeded"
+        assert job["progress"] == {"stage": "done", "pages": 3, "chunks": 7, "chunks_embedded": 5}
+        assert job["result"]["unchanged"] == 2
+        assert set(job["timings"]) == {"queued_ms", "run_ms"}
+        assert os.listdir(tmp_path / "uploads") == []
+        assert engine.ingest_file.call_args[0][1] == {"program": "catalogo"}
+    
+    def test_failed_ingestion_marks_job_failed(self, engine, tmp_path):
+        """Test that an unsuccessful ingestion is reported with its error"""
+        engine.ingest_file.side_effect = None
+        engine.ingest_file.return_value = {"success": False, "pages": 0, "chunks": 0,
+                                           "added": 0, "error": "invalid PDF"}
+        jobs = IngestionJobQueue(engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"), workers=1)
+        jobs.start()
+        
+        job = wait_for_job(jobs, jobs.submit(self.make_upload(tmp_path), "roto.pdf"))
+        jobs.shutdown()
+        
+        assert job["state"] == "failed"
+        assert job["error"] == "invalid PDF"
+    
+    def test_pending_jobs_resume_after_restart(self, engine, tmp_path):
+        """Test that jobs queued before a restart are run by the next queue"""
+        db_path = str(tmp_path / "jobs.db")
+        upload_dir = str(tmp_path / "uploads")
+        stopped = IngestionJobQueue(engine, db_path, upload_dir)
+        job_id = stopped.submit(self.make_upload(tmp_path), "catalogo.pdf")
+        stopped.shutdown()
+        
+        restarted = IngestionJobQueue(engine, db_path, upload_dir, workers=1)
+        assert restarted.get(job_id)["state"] == "queued"
+        restarted.start()
+        job = wait_for_job(restarted, job_id)
+        restarted.shutdown()
+        
+        assert job["state"] == "succeeded"
+    
+    def test_only_jobs_with_stale_heartbeat_are_reclaimed(self, engine, tmp_path):
+        """Test that a restart leaves running jobs of live owners alone and resumes abandoned ones"""
+        db_path = str(tmp_path / "jobs.db")
+        upload_dir = str(tmp_path / "uploads")
+        other = IngestionJobQueue(engine, db_path, upload_dir)
+        live = other.submit(self.make_upload(tmp_path, "a.pdf"), "a.pdf", content_hash="a")
+        abandoned = other.submit(self.make_upload(tmp_path, "b.pdf"), "b.pdf", content_hash="b")
+        now = time.time()
+        for job_id, heartbeat in [(live, now), (abandoned, now - 600)]:
+            other._conn.execute(
+                "UPDATE ingestion_jobs SET state = 'running', owner = 'other', heartbeat_at = ? WHERE id = ?",
+                (heartbeat, job_id)
+            )
+        other._conn.commit()
+        
+        jobs = IngestionJobQueue(engine, db_path, upload_dir, workers=1, stale_after=60)
+        jobs.start()
+        job = wait_for_job(jobs, abandoned)
+        still_running = jobs.get(live)
+        jobs.shutdown()
+        other.shutdown()
+        
+        assert job["state"] == "succeeded"
+        assert still_running["state"] == "running"
+        assert engine.ingest_file.call_count == 1
+    
+    def test_claimed_job_is_not_run_twice(self, engine, tmp_path):
+        """Test that a job already claimed by another queue is skipped"""
+        db_path = str(tmp_path / "jobs.db")
+        upload_dir = str(tmp_path / "uploads")
+        first = IngestionJobQueue(engine, db_path, upload_dir)
+        second = IngestionJobQueue(engine, db_path, upload_dir)
+        job_id = first.submit(self.make_upload(tmp_path), "catalogo.pdf")
+        
+        first._run(job_id)
+        second._run(job_id)
+        
+        assert engine.ingest_file.call_count == 1
+        assert second.get(job_id)["state"] == "succeeded"
+        first.shutdown()
+        second.shutdown()
+    
+    def test_shutdown_keeps_store_open_for_running_workers(self, engine, tmp_path):
+        """Test that a worker outliving the shutdown timeout can still record its outcome"""
+        import threading
+        
+        release = threading.Event()
+        ingest_file = engine.ingest_file.side_effect
+        engine.ingest_file.side_effect = lambda *args, **kwargs: release.wait(5) and ingest_file(*args, **kwargs)
+        jobs = IngestionJobQueue(engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"), workers=1)
+        jobs.start()
+        job_id = jobs.submit(self.make_upload(tmp_path), "catalogo.pdf")
+        while jobs.get(job_id)["state"] != "running":
+            time.sleep(0.01)
+        
+        jobs.shutdown(timeout=0.05)
+        release.set()
+        job = wait_for_job(jobs, job_id)
+        jobs.shutdown(timeout=5)
+        
+        assert job["state"] == "succeeded"
+    
+    def test_duplicate_upload_joins_in_flight_job(self, engine, tmp_path):
+        """Test that an identical upload reuses the queued job"""
+        jobs = IngestionJobQueue(engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+        
+        first = jobs.submit(self.make_upload(tmp_path, "a.pdf"), "catalogo.pdf", content_hash="abc")
+        second = jobs.submit(self.make_upload(tmp_path, "b.pdf"), "catalogo.pdf", content_hash="abc")
+        other = jobs.submit(self.make_upload(tmp_path, "c.pdf"), "catalogo.pdf", content_hash="def")
+        
+        assert second == first
+        assert other != first
+        assert len(os.listdir(tmp_path / "uploads")) == 2
+        assert not (tmp_path / "b.pdf").exists()
+    
+    def test_concurrent_jobs_for_one_document_are_serialized(self, ingestion_engine, tmp_path):
+        """Test that two versions of a file ingested at once leave only one version stored"""
+        def slow_pages(path, metadata=None):
+            content = open(path, "rb").read().decode()
+            for page in range(3):
+                time.sleep(0.02)
+                yield Document(page_content=f"{content} página {page}", metadata={"source": path, **(metadata or {})})
+        
+        jobs = IngestionJobQueue(ingestion_engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"), workers=2)
+        with patch('app.engine.ingest.iter_pdf_pages', slow_pages):
+            jobs.start()
+            job_ids = []
+            for version in ["v1", "v2"]:
+                path = tmp_path / f"{version}.pdf"
+                path.write_bytes(version.encode())
+                job_ids.append(jobs.submit(str(path), "catalogo.pdf", {"source_file": "catalogo.pdf"}, version))
+            finished = [wait_for_job(jobs, job_id) for job_id in job_ids]
+            jobs.shutdown(timeout=5)
+        
+        assert [job["state"] for job in finished] == ["succeeded", "succeeded"]
+        stored = ingestion_engine.vector_store.chunks.values()
+        assert len(stored) == 3
+        assert len({doc.metadata["file_hash"] for doc in stored}) == 1
+    
+    def test_unknown_job(self, engine, tmp_path):
+        """Test that unknown IDs return None"""
+        jobs = IngestionJobQueue(engine, str(tmp_path / "jobs.db"), str(tmp_path / "uploads"))
+        
+        assert jobs.get("missing") is None
+
+
+class TestEmbeddingScheduler:
+    """Test suite for batched, rate-limited chunk embedding"""
+    
+    def make_scheduler(self, client, **kwargs):
+        sleeps = []
+        scheduler = EmbeddingScheduler(
+            client,
+            token_counter=FakeTokenCounter(),
+            backoff_base=0.5,
+            sleep=sleeps.append,
+            **kwargs
+        )
+        return scheduler, sleeps
+    
+    def test_batches_are_capped_by_size_and_tokens(self):
+        """Test that batches respect both the chunk and the token caps"""
+        client = MagicMock()
+        client.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+        scheduler, _ = self.make_scheduler(client, max_batch_size=3, max_batch_tokens=3)
+        texts = ["uno", "dos", "tres", "a b c", "cuatro", "cinco", "seis"]
+        
+        embeddings = scheduler.embed_documents(texts)
+        
+        assert embeddings == [[float(len(t))] for t in texts]
+        sent = sorted(call.args[0] for call in client.embed_documents.call_args_list)
+        assert sent == sorted([["uno", "dos", "tres"], ["a b c"], ["cuatro", "cinco", "seis"]])
+    
+    def test_only_the_failed_batch_is_retried(self):
+        """Test that a 429 resends the failed batch and not the ones that succeeded"""
+        client = MagicMock()
+        failures = {"c": 2}
+        
+        def embed(texts):
+            if texts[0] in failures and failures[texts[0]]:
+                failures[texts[0]] -= 1
+                raise ProviderError(429)
+            return [[1.0] for _ in texts]
+        
+        client.embed_documents.side_effect = embed
+        scheduler, sleeps = self.make_scheduler(client, max_batch_size=2)
+        
+        embeddings = scheduler.embed_documents(["a", "b", "c", "d", "e"])
+        
+        assert len(embeddings) == 5
+        sent = [call.args[0] for call in client.embed_documents.call_args_list]
+        assert sent.count(["a", "b"]) == 1
+        assert sent.count(["c", "d"]) == 3
+        assert scheduler.stats()["retries"] == 2
+        assert len(sleeps) == 2 and 0.25 <= sleeps[0] <= 0.5
+    
+    def test_client_errors_are_not_retried(self):
+        """Test that a 400 fails immediately"""
+        client = MagicMock()
+        client.embed_documents.side_effect = ProviderError(400)
+        scheduler, _ = self.make_scheduler(client)
+        
+        with pytest.raises(ProviderError):
+            scheduler.embed_documents(["texto"])
+        
+        assert client.embed_documents.call_count == 1
+    
+    def test_retryable_errors(self):
+        """Test the classification of provider errors"""
+        assert is_retryable_error(ProviderError(429))
+        assert is_retryable_error(ProviderError(503))
+        assert is_retryable_error(TimeoutError())
+        assert not is_retryable_error(ProviderError(401))
+        assert not is_retryable_error(ValueError("bad input"))
+    
+    def test_rate_limiter_waits_for_the_window(self):
+        """Test that requests beyond the per-minute caps wait for the window to slide"""
+        now = [0.0]
+        sleeps = []
+        
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        
+        limiter = RateLimiter(requests_per_minute=2, tokens_per_minute=100, clock=lambda: now[0], sleep=sleep)
+        
+        assert limiter.acquire(10) == 0.0
+        assert limiter.acquire(10) == 0.0
+        assert limiter.acquire(10) == pytest.approx(60.0)
+        assert limiter.acquire(90) == pytest.approx(0.0)
+        now[0] += 1
+        assert limiter.acquire(50) > 0
+    
+    def test_ingestion_embeds_through_the_scheduler(self):
+        """Test that the ingestion vector store uses the scheduler as embedding function"""
+        scheduler = EmbeddingScheduler(MagicMock(), token_counter=FakeTokenCounter())
+        with patch('app.engine.ingest.OpenAIEmbeddings'):
+            with patch('app.engine.ingest.Chroma') as mock_chroma:
+                engine = PDFIngestionEngine(embedding_scheduler=scheduler)
+        
+        assert engine.document_embeddings is scheduler
+        assert mock_chroma.call_args.kwargs["embedding_function"] is scheduler
+
+
+class TestSemanticAnswerCache:
+    """Test suite for the semantic answer cache"""
+    
+    def test_lookup_hits_within_distance(self):
+        """Test that a close embedding is served from the cache"""
+        cache = SemanticAnswerCache(max_distance=0.05)
+        cache.store([1.0, 0.0, 0.0], {"success": True, "answer": "cached"})
+        
+        assert cache.lookup([0.99, 0.05, 0.0])["answer"] == "cached"
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+    
+    def test_lru_eviction_respects_max_entries(self):
+        """Test that the least recently used entry is evicted first"""
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.store([1.0, 0.0, 0.0], {"answer": "a"})
+        cache.store([0.0, 1.0, 0.0], {"answer": "b"})
+        cache.lookup([1.0, 0.0, 0.0])
+        cache.store([0.0, 0.0, 1.0], {"answer": "c"})
+        
+        assert cache.lookup([1.0, 0.0, 0.0])["answer"] == "a"
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.stats()["evictions"] == 1
+    
+    def test_expired_entries_are_not_served(self):
+        """Test TTL expiration"""
+        cache = SemanticAnswerCache(ttl_seconds=0.0)
+        cache.store([1.0, 0.0], {"answer": "old"})
+        
+        time.sleep(0.01)
+        assert cache.lookup([1.0, 0.0]) is None
+    
+    def test_invalidation_by_source_and_chunk(self):
+        """Test that ingest changes invalidate the answers built from them"""
+        cache = SemanticAnswerCache()
+        cache.store([1.0, 0.0], {"answer": "fees"}, sources=["/tmp/fees.pdf"], chunk_ids=["c1"])
+        cache.store([0.0, 1.0], {"answer": "dates"}, sources=["/tmp/dates.pdf"], chunk_ids=["c2"])
+        
+        cache.on_chunks_changed("/tmp/fees.pdf", ["c9"])
+        
+        assert cache.lookup([1.0, 0.0]) is None
+        assert cache.lookup([0.0, 1.0])["answer"] == "dates"
+        assert cache.invalidate(chunk_ids=["c2"]) == 1
+    
+    def test_query_served_from_cache_skips_retrieval(self, rag_query_engine, mock_vector_store):
+        """Test that a cached answer bypasses retrieval and the LLM"""
+        rag_query_engine.answer_cache = SemanticAnswerCache()
+        rag_query_engine.embeddings.embed_query.return_value = [1.0, 0.0]
+        rag_query_engine.answer_cache.store(
+            [1.0, 0.0],
+            {"success": True, "answer": "Cached answer", "sources": [{"source": "a.pdf"}]}
+        )
+        
+        result = rag_query_engine.query("¿Cuáles son los requisitos de admisión?", return_sources=False)
+        
+        assert result["cached"] is True
+        assert result["answer"] == "Cached answer"
+        assert result["sources"] == []
+        mock_vector_store._collection.query.assert_not_called()
+
+
+class TestEmbeddingCache:
+    """Test suite for the persistent query-embedding cache"""
+    
+    def test_repeated_query_is_embedded_once(self, tmp_path):
+        """Test that normalized repeats are served from memory"""
+        client = MagicMock()
+        client.embed_query.return_value = [0.1, 0.2, 0.3]
+        embeddings = CachedEmbeddings(client, EmbeddingCache(str(tmp_path / "emb.db")), "model-a")
+        
+        first = embeddings.embed_query("Costo de la maestría")
+        second = embeddings.embed_query("  Costo de la   maestría ")
+        
+        assert second == pytest.approx(first)
+        client.embed_query.assert_called_once_with("Costo de la maestría")
+        assert embeddings.cache.stats()["memory_hits"] == 1
+    
+    def test_embeddings_persist_across_instances(self, tmp_path):
+        """Test that the SQLite store survives a restart"""
+        db_path = str(tmp_path / "emb.db")
+        cache = EmbeddingCache(db_path)
+        cache.put("model-a", "requisitos", [0.5, 0.25])
+        cache.close()
+        
+        reopened = EmbeddingCache(db_path)
+        
+        assert reopened.get("model-a", "requisitos") == pytest.approx([0.5, 0.25])
+        assert reopened.get("model-b", "requisitos") is None
+        assert reopened.stats()["disk_hits"] == 1
+        assert reopened.stats()["misses"] == 1
+    
+    def test_bulk_lookup_and_store(self, tmp_path):
+        """Test that chunk embeddings round-trip through the batch methods"""
+        db_path = str(tmp_path / "chunks.db")
+        cache = EmbeddingCache(db_path, max_memory_entries=1)
+        cache.put_many("model-a", ["uno", "dos"], [[1.0, 0.0], [0.0, 1.0]])
+        
+        found = cache.get_many("model-a", ["dos", "tres", "uno"])
+        
+        assert found[0] == pytest.approx([0.0, 1.0])
+        assert found[1] is None
+        assert found[2] == pytest.approx([1.0, 0.0])
+        stats = cache.stats()
+        assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+    
+    def test_document_embeddings_send_only_misses(self, tmp_path):
+        """Test that cached chunk texts are not sent to the embeddings client"""
+        client = MagicMock()
+        client.embed_documents.return_value = [[0.3, 0.3]]
+        cache = EmbeddingCache(str(tmp_path / "chunks.db"))
+        cache.put("model-a", "chunk A", [0.1, 0.1])
+        embeddings = CachedDocumentEmbeddings(client, cache, "model-a")
+        
+        result = embeddings.embed_documents(["chunk A", "chunk B", "chunk B"])
+        
+        assert result[0] == pytest.approx([0.1, 0.1])
+        assert result[1] == result[2] == [0.3, 0.3]
+        client.embed_documents.assert_called_once_with(["chunk B"])
+        assert embeddings.counters() == (2, 1)
+    
+    def test_engine_uses_shared_embeddings(self):
+        """Test that an injected embeddings client is used as-is"""
+        shared = MagicMock()
+        with patch('app.engine.query.OpenAIEmbeddings') as mock_embeddings:
+            with patch('app.engine.query.Chroma'):
+                with patch('app.engine.query.ChatOpenAI'):
+                    engine = RAGQueryEngine(embeddings=shared)
+                    
+                    assert engine.embeddings is shared
+                    mock_embeddings.assert_not_called()
 
 
 class TestSystemPromptSafety:
@@ -147,10 +2160,9 @@ class TestSystemPromptSafety:
     def test_response_respects_context_only_instruction(self, rag_query_engine, mock_vector_store):
         """Test that responses are based only on provided context"""
         # Mock documents
-        mock_doc = MagicMock()
-        mock_doc.page_content = "Deadline for applications: March 31, 2024"
-        mock_doc.metadata = {"source": "calendar.pdf"}
-        mock_vector_store.similarity_search.return_value = [mock_doc]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Deadline for applications: March 31, 2024", {"source": "calendar.pdf"})
+        )
         
         # Mock LLM that tries to hallucinate
         mock_response = MagicMock()
@@ -170,10 +2182,9 @@ class TestPerformanceMetrics:
         """Test that query latency is tracked"""
         import time
         
-        mock_doc = MagicMock()
-        mock_doc.page_content = "Test content"
-        mock_doc.metadata = {"source": "test.pdf"}
-        mock_vector_store.similarity_search.return_value = [mock_doc]
+        mock_vector_store._collection.query.return_value = make_query_result(
+            ("Test content", {"source": "test.pdf"})
+        )
         
         mock_response = MagicMock()
         mock_response.content = "Test response"